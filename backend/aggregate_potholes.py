@@ -0,0 +1,104 @@
+# aggregate_potholes.py
+# Incremental job: folds new pothole detections into
+# road_segments.static_hazard_score (see crud.aggregate_pothole_detections).
+# Only segments with new detections, or whose score is due to decay, are
+# written. Run it from cron (e.g. hourly):
+#
+#   python aggregate_potholes.py
+#
+# --import loads backfill_potholes.py output first (safe to repeat):
+#
+#   python aggregate_potholes.py --import detections/survey_2024 --detected-at 2024-11-02
+#
+# Imported rows are keyed by --source (default: the directory name) plus
+# image path and box, so give surveys with the same layout distinct names.
+#
+# Detections inserted in the last --settle-seconds are left for the next run;
+# pass --settle-seconds 0 when nothing else is writing them.
+
+import argparse
+import glob
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import polars as pl
+
+import crud
+from database import SessionLocal
+from services import pothole_batch
+
+IMPORT_CHUNK = 5000
+
+
+def read_parts(directory: str) -> pl.DataFrame:
+    parts = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+    csvs = sorted(glob.glob(os.path.join(directory, "part-*.csv")))
+    # Explicit schema: a CSV part without detections has nothing to infer types from
+    frames = [pl.read_parquet(p) for p in parts] + [pl.read_csv(p, schema=pothole_batch.SCHEMA) for p in csvs]
+    return pl.concat(frames) if frames else pl.DataFrame()
+
+
+def import_detections(db, directory: str, detected_at: datetime, city_id: int, source: str) -> int:
+    """Image paths in the parts are relative to their archive, so keys are prefixed with `source`."""
+    frame = read_parts(directory)
+    if frame.is_empty():
+        return 0
+    frame = frame.drop_nulls(["lat", "lon"])
+    inserted = 0
+    for chunk in frame.iter_slices(IMPORT_CHUNK):
+        inserted += crud.create_pothole_detections_bulk(db, [{
+            "lat": row["lat"],
+            "lon": row["lon"],
+            "confidence": row["confidence"],
+            "detected_at": detected_at,
+            # Same archive + image + box on a re-import -> same key -> skipped
+            "source_key": f"{source}/{row['image']}#{row['x1']:.0f},{row['y1']:.0f},{row['x2']:.0f},{row['y2']:.0f}",
+        } for row in chunk.iter_rows(named=True)], city_id)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update road segment hazard scores from pothole detections")
+    parser.add_argument("--import", dest="import_dir", help="backfill_potholes.py output directory to load first")
+    parser.add_argument("--detected-at", type=datetime.fromisoformat,
+                        help="when the imported images were taken (default: now)")
+    parser.add_argument("--source", help="name of the imported survey, unique across imports "
+                                         "(default: the --import directory's name)")
+    parser.add_argument("--city-id", type=int, default=1, help="city of imported detections")
+    parser.add_argument("--batch-size", type=int, default=10000, help="detections per transaction")
+    parser.add_argument("--snap-m", type=float, default=crud.POTHOLE_SNAP_METERS)
+    parser.add_argument("--half-life-days", type=float, default=crud.POTHOLE_HALF_LIFE_DAYS)
+    parser.add_argument("--settle-seconds", type=float, default=crud.POTHOLE_SETTLE_SECONDS,
+                        help="skip detections inserted this recently (0 if nothing else is writing)")
+    parser.add_argument("--decay-after-hours", type=float, default=24,
+                        help="re-decay segments without new detections for this long")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.import_dir:
+            detected_at = args.detected_at or datetime.now(timezone.utc)
+            if detected_at.tzinfo is None:
+                detected_at = detected_at.replace(tzinfo=timezone.utc)
+            source = args.source or os.path.basename(os.path.normpath(args.import_dir))
+            inserted = import_detections(db, args.import_dir, detected_at, args.city_id, source)
+            print(f"Imported {inserted} new detection(s) from {args.import_dir}")
+
+        started = time.perf_counter()
+        totals = crud.aggregate_pothole_detections(
+            db, batch_size=args.batch_size, snap_m=args.snap_m, half_life_days=args.half_life_days,
+            settle_seconds=args.settle_seconds
+        )
+        decayed = crud.decay_segment_scores(
+            db, stale_after=timedelta(hours=args.decay_after_hours), half_life_days=args.half_life_days
+        )
+        print(f"{totals['detections']} new detection(s), {totals['snapped']} matched to a road; "
+              f"{totals['segments']} segment score(s) updated, {decayed} lowered by decay "
+              f"in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
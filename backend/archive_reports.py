@@ -0,0 +1,37 @@
+# archive_reports.py
+# Retention job: moves expired hazard reports from 'reports' into
+# 'reports_archive' so live queries never scan old history.
+# Run it from cron (e.g. every 15 minutes):
+#
+#   python archive_reports.py --older-than-minutes 60
+
+import argparse
+import time
+from datetime import timedelta
+
+import crud
+from database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive expired hazard reports")
+    parser.add_argument("--older-than-minutes", type=int, default=60,
+                        help="only archive reports that expired at least this long ago")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        moved = crud.archive_expired_reports(
+            db,
+            older_than=timedelta(minutes=args.older_than_minutes),
+            batch_size=args.batch_size
+        )
+        print(f"Archived {moved} expired report(s) in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
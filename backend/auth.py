@@ -0,0 +1,84 @@
+# auth.py
+# Signed session tokens and a small cache of user ids known to exist.
+#
+# Token format:  <user_id>.<expires_unix>.<signature>
+# where signature = base64url(HMAC-SHA256(SECRET_KEY, "<user_id>.<expires_unix>")).
+# Verifying needs no database access, and changing the user id or expiry
+# invalidates the signature, so clients can't pose as other users.
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from services import metrics
+from services.cache import TTLCache, MISSING
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SECRET_KEY = os.getenv("TRAFFIX_SECRET_KEY")
+if not SECRET_KEY:
+    # Tokens would then only be valid for this process; fine for local dev only
+    logger.warning("TRAFFIX_SECRET_KEY is not set; using a random per-process key")
+    SECRET_KEY = secrets.token_urlsafe(32)
+
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Shared secret for trusted ingestion services (dashcam fleets, partner
+# feeds) that file reports on behalf of many users. Unset: no such access.
+FLEET_KEY = os.getenv("TRAFFIX_FLEET_KEY")
+
+# User ids recently confirmed to exist (login, signup, DB lookups)
+known_user_ids = TTLCache(max_size=10000, ttl=600)
+metrics.watch_cache("known_user_ids", known_user_ids.stats)
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def create_token(user_id: int, ttl: Optional[int] = None) -> str:
+    expires = int(time.time()) + (TOKEN_TTL_SECONDS if ttl is None else ttl)
+    payload = f"{user_id}.{expires}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token: str) -> Optional[int]:
+    """Returns the user id for a valid, unexpired token, else None."""
+    try:
+        user_id, expires, signature = token.split(".")
+        payload = f"{user_id}.{expires}"
+        # Bytes: compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+            return None
+        if int(expires) < time.time():
+            return None
+        return int(user_id)
+    except (ValueError, AttributeError):
+        return None
+
+
+def verify_fleet_key(key: Optional[str]) -> bool:
+    if not FLEET_KEY or not key:
+        return False
+    return hmac.compare_digest(key.encode(), FLEET_KEY.encode())
+
+
+def remember_user(user_id: int):
+    known_user_ids.set(user_id, True)
+
+
+def forget_user(user_id: int):
+    known_user_ids.pop(user_id)
+
+
+def is_known_user(user_id: int) -> bool:
+    return known_user_ids.get(user_id) is not MISSING
@@ -0,0 +1,55 @@
+# backfill_potholes.py
+# Pothole detection over a road-survey image archive, in parallel, for
+# backfilling hazard scores. Results go to one Parquet (or CSV) part file per
+# shard plus a manifest; rerunning the same command resumes after a crash.
+#
+#   python backfill_potholes.py /data/survey_2024 --out detections/survey_2024 --geotags /data/survey_2024/geotags.csv
+#   python backfill_potholes.py /data/survey_2024 --out detections/survey_2024 --workers 8 --format csv
+#
+# Read the results with e.g. polars.scan_parquet("detections/survey_2024/*.parquet").
+
+import argparse
+import os
+
+from services import pothole_batch, pothole_detection
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Detect potholes across an image archive with a process pool")
+    parser.add_argument("root", help="image directory (searched recursively)")
+    parser.add_argument("--out", required=True, help="directory for part files and manifest.jsonl")
+    parser.add_argument("--geotags", help="CSV of name,lat,lon (name relative to root); default: EXIF GPS")
+    parser.add_argument("--model", default=pothole_detection.MODEL_PATH)
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--workers", type=int, default=cores, help="processes; 0 runs in this process")
+    parser.add_argument("--threads", type=int,
+                        help="torch threads per worker (default: cores / workers, at least 1)")
+    parser.add_argument("--batch-size", type=int, default=8, help="images per predict call")
+    parser.add_argument("--shard-size", type=int, default=pothole_batch.SHARD_SIZE,
+                        help="images per part file / checkpoint; keep it fixed when resuming")
+    parser.add_argument("--format", choices=("parquet", "csv"), default="parquet")
+    args = parser.parse_args()
+
+    config = pothole_batch.BatchConfig(
+        root=args.root,
+        out_dir=args.out,
+        model_path=args.model,
+        conf=args.conf,
+        imgsz=args.imgsz,
+        batch_size=args.batch_size,
+        # Split the cores between workers so they don't oversubscribe the CPU
+        threads_per_worker=args.threads or max(1, cores // max(1, args.workers)),
+        output_format=args.format,
+        geotags=pothole_detection.read_geotags(args.geotags) if args.geotags else None
+    )
+    summary = pothole_batch.run_batch(config, args.workers, args.shard_size)
+    print(f"{summary.images} image(s) in {summary.elapsed_seconds:.1f}s ({summary.images_per_second:.1f}/s), "
+          f"{summary.detections} detection(s); {summary.completed_shards} shard(s) done, "
+          f"{summary.skipped_shards} already done, {summary.failed_shards} failed, "
+          f"{summary.stale_shards} outdated part(s) replaced")
+
+
+if __name__ == "__main__":
+    main()
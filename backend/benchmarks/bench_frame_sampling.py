@@ -0,0 +1,118 @@
+# benchmarks/bench_frame_sampling.py
+# Frames decoded vs frames sent to the pothole model, and wall-clock time per
+# minute of footage, for:
+#   all      - every frame goes to the model
+#   sampled  - decimated to --sample-fps
+#   changed  - decimated, then only frames that changed (dHash ChangeFilter)
+#
+#   python benchmarks/bench_frame_sampling.py --video dashcam.mp4 --model pothole.pt
+#   python benchmarks/bench_frame_sampling.py --synthetic-seconds 60 --infer-ms 80
+#
+# Without --model the detector is a no-op, so the time is decode + sampling
+# only, and a projection adds --infer-ms for every frame that would be inferred
+# (measure yours with --model on a short clip).
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+from services import pothole_detection
+
+
+class NullDetector:
+    def detect(self, images):
+        return [[] for _ in images]
+
+
+def synthetic_dashcam(path: str, seconds: float, fps: float = 30.0, size=(1280, 720), seed: int = 0):
+    """
+    A textured road scrolling toward the camera at a varying speed, with
+    stops (the picture barely changes) and sensor noise on every frame.
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    road = cv2.resize(rng.integers(60, 200, (h // 8, w // 8), dtype=np.uint8), (w, h * 4),
+                      interpolation=cv2.INTER_LINEAR)
+    road = cv2.cvtColor(road, cv2.COLOR_GRAY2BGR)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    offset = 0.0
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        # ~20 s cycles: drive for 14 s (up to 15 px/frame), stopped for 6 s
+        speed = 0.0 if (t % 20) > 14 else 15 * (0.5 + 0.5 * np.sin(t / 3))
+        offset = (offset + speed) % (road.shape[0] - h)
+        frame = road[int(offset):int(offset) + h].astype(np.int16)
+        frame += rng.integers(-6, 7, frame.shape, dtype=np.int16)
+        writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    writer.release()
+
+
+def video_seconds(path: str) -> float:
+    capture = cv2.VideoCapture(path)
+    frames, fps = capture.get(cv2.CAP_PROP_FRAME_COUNT), capture.get(cv2.CAP_PROP_FPS) or 30.0
+    capture.release()
+    return frames / fps
+
+
+def run_mode(path: str, detector, sample_fps, change_filter, imgsz: int, batch_size: int):
+    counted = []
+
+    def counting(frames):
+        for frame in frames:
+            counted.append(1)
+            yield frame
+
+    # Count what the decoder hands over before any filtering
+    frames = counting(pothole_detection.iter_video(path, sample_fps=sample_fps))
+    frames = pothole_detection.sample_frames(frames, change_filter, max_side=imgsz)
+    pipeline = pothole_detection.DetectionPipeline(detector, lambda reports: None, user_id=0, batch_size=batch_size)
+    stats = pipeline.run(frames)
+    return len(counted), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashcam frame sampling for pothole detection")
+    parser.add_argument("--video", help="video file (default: a synthetic dashcam clip)")
+    parser.add_argument("--synthetic-seconds", type=float, default=60.0)
+    parser.add_argument("--model", help="pothole YOLO weights; without it inference is projected from --infer-ms")
+    parser.add_argument("--infer-ms", type=float, default=80.0, help="assumed CPU ms per inferred frame")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--sample-fps", type=float, default=10.0)
+    parser.add_argument("--max-hash-distance", type=int, default=pothole_detection.DEFAULT_MAX_HASH_DISTANCE)
+    args = parser.parse_args()
+
+    path = args.video
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "dashcam.mp4")
+        synthetic_dashcam(path, args.synthetic_seconds)
+    minutes = video_seconds(path) / 60
+    detector = pothole_detection.PotholeDetector(args.model, imgsz=args.imgsz) if args.model else NullDetector()
+
+    modes = {
+        "all": (None, None),
+        "sampled": (args.sample_fps, None),
+        "changed": (args.sample_fps, pothole_detection.ChangeFilter(args.max_hash_distance)),
+    }
+    print(f"{minutes * 60:.0f}s of footage: {path}")
+    header = f"{'mode':<10}{'decoded':>9}{'inferred':>10}{'s/min':>9}"
+    print(header + ("" if args.model else f"{'projected s/min':>17}"))
+    for name, (sample_fps, change_filter) in modes.items():
+        started = time.perf_counter()
+        decoded, stats = run_mode(path, detector, sample_fps, change_filter, args.imgsz, args.batch_size)
+        per_minute = (time.perf_counter() - started) / minutes
+        line = f"{name:<10}{decoded:>9}{stats.frames:>10}{per_minute:>9.2f}"
+        if not args.model:
+            line += f"{per_minute + stats.frames / minutes * args.infer_ms / 1000:>17.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
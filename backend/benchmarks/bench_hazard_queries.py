@@ -0,0 +1,105 @@
+# benchmarks/bench_hazard_queries.py
+# Compares the old per-row ST_Y/ST_X lookups used by /hazards/live against the
+# single set-based query in crud.get_live_report_points.
+#
+# Needs the PostGIS database from database.py. All seeded rows are created in
+# one transaction that is rolled back at the end, so nothing is left behind.
+#
+#   python benchmarks/bench_hazard_queries.py --sizes 10000 100000
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+from sqlalchemy.sql import func
+
+import crud
+from database import SessionLocal, engine
+
+
+class QueryCounter:
+    """Counts statements sent to the database while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+
+def seed_reports(db, n: int) -> int:
+    """Inserts a bench city and n live reports spread over Delhi. Returns the city id."""
+    city_id = db.execute(
+        text("INSERT INTO cities (name, country) VALUES (:name, 'India') RETURNING id"),
+        {"name": f"bench-{time.time_ns()}"}
+    ).scalar()
+    db.execute(text("""
+        INSERT INTO reports (city_id, location, report_type, created_at, expires_at)
+        SELECT :city_id,
+               ST_SetSRID(ST_MakePoint(77.0 + random() * 0.4, 28.4 + random() * 0.4), 4326)::geography,
+               'Traffic', NOW(), NOW() + INTERVAL '1 hour'
+        FROM generate_series(1, :n)
+    """), {"city_id": city_id, "n": n})
+    return city_id
+
+
+def legacy_path(db, city_id: int) -> int:
+    """The original /hazards/live loop: one SELECT for the rows + two per row."""
+    rows = 0
+    for rep in crud.get_live_reports(db, city_id=city_id):
+        db.query(func.ST_Y(func.ST_AsText(rep.location))).scalar()
+        db.query(func.ST_X(func.ST_AsText(rep.location))).scalar()
+        rows += 1
+    return rows
+
+
+def set_based_path(db, city_id: int) -> int:
+    return sum(1 for _ in crud.get_live_report_points(db, city_id=city_id))
+
+
+def measure(fn, db, city_id):
+    with QueryCounter() as counter:
+        started = time.perf_counter()
+        rows = fn(db, city_id)
+        elapsed = time.perf_counter() - started
+    return rows, counter.count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live hazard coordinate queries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="skip the 2N+1 path above this many rows (it is very slow)")
+    args = parser.parse_args()
+
+    print(f"{'reports':>9} {'path':<10} {'queries':>9} {'seconds':>9}")
+    for n in args.sizes:
+        db = SessionLocal()
+        try:
+            city_id = seed_reports(db, n)
+            db.flush()
+            paths = [("set-based", set_based_path)]
+            if n <= args.legacy_max:
+                paths.insert(0, ("legacy", legacy_path))
+            for name, fn in paths:
+                rows, queries, elapsed = measure(fn, db, city_id)
+                assert rows == n, f"{name} returned {rows} rows, expected {n}"
+                print(f"{n:>9} {name:<10} {queries:>9} {elapsed:>9.3f}")
+        finally:
+            db.rollback()
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
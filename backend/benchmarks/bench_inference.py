@@ -0,0 +1,84 @@
+# benchmarks/bench_inference.py
+# Per-call latency of the congestion model: the original one-row pandas
+# DataFrame path vs services.inference (NumPy + Booster.inplace_predict),
+# plus throughput of the MicroBatcher under concurrent requests.
+#
+#   python benchmarks/bench_inference.py --calls 5000 --concurrency 500
+
+import sys
+import os
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from services.inference import CongestionModel, MicroBatcher, feature_matrix
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'congestion_model.pkl')
+
+
+def random_rows(n: int):
+    rng = np.random.default_rng(42)
+    return [
+        (int(rng.integers(0, 11)), int(rng.integers(0, 6)), int(rng.integers(0, 2)), int(rng.integers(0, 24)))
+        for _ in range(n)
+    ]
+
+
+def per_call_us(fn, rows) -> float:
+    fn(rows[0])  # warm-up
+    started = time.perf_counter()
+    for row in rows:
+        fn(row)
+    return (time.perf_counter() - started) / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark congestion model inference paths")
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = random_rows(args.calls)
+    sklearn_model = joblib.load(MODEL_PATH)
+    model = CongestionModel(MODEL_PATH)
+
+    def dataframe_path(row):
+        df = pd.DataFrame({
+            "static_hazard_score": [row[0]],
+            "active_reports": [row[1]],
+            "is_raining": [row[2]],
+            "hour_of_day": [row[3]]
+        })
+        return sklearn_model.predict(df)[0]
+
+    def numpy_path(row):
+        return model.predict(feature_matrix(row))[0]
+
+    df_us = per_call_us(dataframe_path, rows)
+    np_us = per_call_us(numpy_path, rows)
+    print(f"{'path':<22} {'us/call':>10}")
+    print(f"{'pandas DataFrame':<22} {df_us:>10.1f}")
+    print(f"{'numpy inplace_predict':<22} {np_us:>10.1f}   ({df_us / np_us:.1f}x faster)")
+
+    async def batched():
+        batcher = MicroBatcher(model)
+        started = time.perf_counter()
+        for i in range(0, len(rows), args.concurrency):
+            await asyncio.gather(*[batcher.predict(r) for r in rows[i:i + args.concurrency]])
+        elapsed = time.perf_counter() - started
+        await batcher.close()
+        return elapsed, batcher.batches
+
+    elapsed, batches = asyncio.run(batched())
+    print(f"{'micro-batched':<22} {elapsed / len(rows) * 1e6:>10.1f}   "
+          f"({len(rows)} rows in {batches} predict calls, {args.concurrency} concurrent)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_report_history.py
+# Shows how live-report queries behave as expired history grows, with the
+# GiST/composite indexes and after archiving expired rows.
+#
+# Seeds a scratch city with a fixed number of live reports plus growing
+# amounts of expired history, then times:
+#   - live reports for the city        (crud.get_live_report_points)
+#   - reports within 300 m of a route  (reports_near_route below)
+# All work happens in one transaction that is rolled back at the end.
+#
+#   python benchmarks/bench_report_history.py --history 100000 1000000 3000000
+
+import sys
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from sqlalchemy.sql import func
+
+import crud
+import models
+from database import SessionLocal
+
+ROUTE = {"type": "LineString", "coordinates": [[77.05, 28.45], [77.20, 28.60], [77.35, 28.75]]}
+
+SEED_SQL = text("""
+    INSERT INTO reports (city_id, location, report_type, created_at, expires_at)
+    SELECT :city_id,
+           ST_SetSRID(ST_MakePoint(77.0 + random() * 0.4, 28.4 + random() * 0.4), 4326)::geography,
+           'Traffic', NOW() - :age, NOW() - :age + INTERVAL '15 minutes'
+    FROM generate_series(1, :n)
+""")
+
+
+def reports_near_route(db, route_geometry: dict, city_id: int) -> int:
+    """Live reports within 300 m of the route (GEOGRAPHY ST_DWithin, so meters)."""
+    route_line = func.ST_SetSRID(func.ST_GeomFromGeoJSON(json.dumps(route_geometry)), 4326)
+    return db.query(models.Report).filter(
+        models.Report.city_id == city_id,
+        models.Report.expires_at > datetime.utcnow(),
+        func.ST_DWithin(models.Report.location, route_line, 300)
+    ).count()
+
+
+def timed(fn, repeat: int = 5) -> float:
+    fn()  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live queries against growing report history")
+    parser.add_argument("--live", type=int, default=2000, help="live reports in the scratch city")
+    parser.add_argument("--history", type=int, nargs="+", default=[100_000, 1_000_000, 3_000_000],
+                        help="cumulative expired rows to test at")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        city_id = db.execute(
+            text("INSERT INTO cities (name, country) VALUES (:name, 'India') RETURNING id"),
+            {"name": f"bench-{time.time_ns()}"}
+        ).scalar()
+        db.execute(SEED_SQL, {"city_id": city_id, "n": args.live, "age": timedelta(0)})
+
+        live_query = lambda: sum(1 for _ in crud.get_live_report_points(db, city_id))
+        route_query = lambda: reports_near_route(db, ROUTE, city_id)
+
+        print(f"{'expired rows':>13} {'live ms':>9} {'route ms':>9}")
+        seeded = 0
+        for target in sorted(args.history):
+            db.execute(SEED_SQL, {"city_id": city_id, "n": target - seeded, "age": timedelta(days=2)})
+            seeded = target
+            db.execute(text("ANALYZE reports"))
+            print(f"{seeded:>13} {timed(live_query):>9.1f} {timed(route_query):>9.1f}")
+
+        # The archive statement is the same one archive_reports.py runs, just
+        # without committing so the benchmark can roll everything back
+        started = time.perf_counter()
+        db.execute(crud._ARCHIVE_BATCH_SQL, {"cutoff": datetime.utcnow() - timedelta(hours=1),
+                                             "batch_size": seeded})
+        archive_s = time.perf_counter() - started
+        db.execute(text("ANALYZE reports"))
+        print(f"{'archived':>13} {timed(live_query):>9.1f} {timed(route_query):>9.1f}"
+              f"   ({seeded} rows moved in {archive_s:.1f}s)")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
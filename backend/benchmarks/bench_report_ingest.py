@@ -0,0 +1,85 @@
+# benchmarks/bench_report_ingest.py
+# Throughput of the single-report path (crud.create_new_report: one INSERT +
+# commit + refresh per report) vs the bulk path behind /report/bulk
+# (crud.create_reports_bulk: multi-row INSERT ... RETURNING, one commit).
+#
+# Needs the PostGIS database from database.py. Rows go into a scratch city
+# that is deleted again at the end.
+#
+#   python benchmarks/bench_report_ingest.py --reports 2000 --batch-size 500
+
+import sys
+import os
+import time
+import random
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+
+import crud
+from database import SessionLocal
+
+
+def random_reports(n: int, user_id: int):
+    return [{
+        "report_type": random.choice(["Pothole", "Accident", "Traffic"]),
+        "lat": 28.4 + random.random() * 0.4,
+        "lon": 77.0 + random.random() * 0.4,
+        "user_id": user_id
+    } for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single vs bulk report ingestion")
+    parser.add_argument("--reports", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    # Set by the setup below; cleanup only removes what was created
+    city_id = user_id = None
+    try:
+        tag = f"bench-{time.time_ns()}"
+        city_id = db.execute(
+            text("INSERT INTO cities (name, country) VALUES (:name, 'India') RETURNING id"), {"name": tag}
+        ).scalar()
+        user_id = db.execute(
+            text("INSERT INTO users (email, password_hash) VALUES (:email, 'x') RETURNING id"),
+            {"email": f"{tag}@example.com"}
+        ).scalar()
+        db.commit()
+
+        reports = random_reports(args.reports, user_id)
+
+        started = time.perf_counter()
+        for r in reports:
+            crud.create_new_report(db, r["report_type"], r["lat"], r["lon"], user_id, city_id)
+        single_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(0, len(reports), args.batch_size):
+            batch = reports[i:i + args.batch_size]
+            crud.get_existing_user_ids(db, {r["user_id"] for r in batch})
+            crud.create_reports_bulk(db, batch, city_id)
+        bulk_s = time.perf_counter() - started
+
+        print(f"{'path':<28} {'seconds':>8} {'reports/s':>10}")
+        print(f"{'single (/report/fast)':<28} {single_s:>8.2f} {args.reports / single_s:>10.0f}")
+        print(f"{f'bulk, {args.batch_size}/batch':<28} {bulk_s:>8.2f} {args.reports / bulk_s:>10.0f}"
+              f"   ({single_s / bulk_s:.1f}x)")
+    finally:
+        db.rollback()
+        if city_id is not None:
+            db.execute(text("DELETE FROM reports WHERE city_id = :c"), {"c": city_id})
+        if user_id is not None:
+            db.execute(text("DELETE FROM users WHERE id = :u"), {"u": user_id})
+        if city_id is not None:
+            db.execute(text("DELETE FROM cities WHERE id = :c"), {"c": city_id})
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
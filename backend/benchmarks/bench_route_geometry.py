@@ -0,0 +1,68 @@
+# benchmarks/bench_route_geometry.py
+# Response size and JSON encode/decode time for a route response with the
+# full OSRM geometry vs services.geometry's simplified GeoJSON and encoded
+# polyline formats, with and without gzip.
+#
+#   python benchmarks/bench_route_geometry.py --points 4000 --routes 3
+
+import sys
+import os
+import gzip
+import json
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from services.geometry import display_geometry
+
+
+def synthetic_route(n: int, seed: int):
+    """A street-like walk across Delhi: mostly straight runs with turns, ~10 m steps."""
+    rng = np.random.default_rng(seed)
+    heading = rng.uniform(0, 2 * np.pi)
+    lon, lat = 77.20, 28.61
+    coords = []
+    for _ in range(n):
+        if rng.random() < 0.02:
+            heading += rng.choice([-1, 1]) * np.pi / 2 + rng.normal(0, 0.1)
+        heading += rng.normal(0, 0.01)
+        lon += 1e-4 * np.cos(heading)
+        lat += 1e-4 * np.sin(heading)
+        # OSRM returns 5-6 decimals
+        coords.append([round(lon, 6), round(lat, 6)])
+    return {"type": "LineString", "coordinates": coords}
+
+
+def timed_ms(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route geometry formats")
+    parser.add_argument("--points", type=int, default=4000)
+    parser.add_argument("--routes", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    routes = [synthetic_route(args.points, seed) for seed in range(args.routes)]
+
+    print(f"{'format':<12}{'bytes':>10}{'gzip':>10}{'build ms':>10}{'encode ms':>11}{'decode ms':>11}")
+    for fmt in ("geojson", "simplified", "polyline"):
+        def build():
+            return {"routes": [{"risk_score": 0, "geometry": display_geometry(r, fmt)} for r in routes]}
+        payload = build()
+        body = json.dumps(payload).encode()
+        build_ms = timed_ms(build, args.repeat)
+        encode_ms = timed_ms(lambda: json.dumps(payload).encode(), args.repeat)
+        decode_ms = timed_ms(lambda: json.loads(body), args.repeat)
+        print(f"{fmt:<12}{len(body):>10}{len(gzip.compress(body)):>10}{build_ms:>10.2f}{encode_ms:>11.2f}{decode_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# benchmarks/load_test.py
+# End-to-end load test: drives a running API at a fixed request rate and
+# reports latency percentiles and throughput per endpoint.
+#
+# Requests are sent on a fixed schedule (open loop) whether or not earlier
+# ones have finished, and latency is measured from the scheduled send time,
+# so a slow server shows up as growing latency instead of a lower send rate.
+#
+#   # upstream stub + API on the stub (needs Postgres, like the API itself)
+#   python benchmarks/load_test.py --start-stub --start-app --rps 50 --duration 30
+#
+#   # against an API that is already running
+#   python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --rps 20 --mix route=1
+#
+# --max-p95-ms / --max-error-rate make it exit non-zero, for use as a CI gate.
+
+import sys
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+from benchmarks.stub_upstreams import stub_env
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Central Delhi, for the hazard map endpoints
+DELHI_VIEW = "77.10,28.55,77.30,28.70"
+
+
+def address_pool(size: int) -> List[str]:
+    # The stub geocodes any string, so these only need to be distinct
+    return [f"Load Test Place {i}" for i in range(size)]
+
+
+def scenarios(addresses: List[str], rng: random.Random, batch_size: int) -> Dict[str, Callable]:
+    """Endpoint name -> function building (method, path, json body, params) for one request."""
+    def pair():
+        start, end = rng.sample(addresses, 2)
+        return {"start_address": start, "end_address": end}
+
+    return {
+        "route": lambda: ("POST", "/route/predict-risk", pair(), None),
+        "route_polyline": lambda: ("POST", "/route/predict-risk", {**pair(), "geometry_format": "polyline"}, None),
+        "route_batch": lambda: ("POST", "/route/predict-risk/batch",
+                                {"pairs": [pair() for _ in range(batch_size)]}, None),
+        "hazards": lambda: ("GET", "/hazards/live", None, {"bbox": DELHI_VIEW}),
+        "clusters": lambda: ("GET", "/hazards/live/clusters", None, {"bbox": DELHI_VIEW, "zoom": 12}),
+        "static": lambda: ("GET", "/hazards/static", None, None),
+    }
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'route=6,hazards=3' -> {'route': 6.0, 'hazards': 3.0}"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest-rank, so p99 of 100 samples is the 99th value, not an interpolation
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.skipped = 0
+
+    def record(self, name: str, status: str, latency_s: float):
+        self.statuses[name][status] += 1
+        if status.startswith("2"):
+            self.latencies[name].append(latency_s * 1000)
+
+    def summary(self, elapsed_s: float) -> Dict[str, dict]:
+        rows = {}
+        for name in sorted(self.statuses):
+            statuses = self.statuses[name]
+            total = sum(statuses.values())
+            ok = sorted(self.latencies[name])
+            rows[name] = {
+                "requests": total,
+                "ok": len(ok),
+                "error_rate": (total - len(ok)) / total if total else 0.0,
+                "throughput_rps": len(ok) / elapsed_s,
+                "p50_ms": percentile(ok, 50),
+                "p95_ms": percentile(ok, 95),
+                "p99_ms": percentile(ok, 99),
+                "max_ms": ok[-1] if ok else float("nan"),
+                "statuses": dict(statuses),
+            }
+        return rows
+
+
+async def run_load(base_url: str, rps: float, duration: float, mix: Dict[str, float], build: Dict[str, Callable],
+                   rng: random.Random, timeout: float, max_in_flight: int, warmup: float) -> Tuple[Results, float]:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    results = Results()
+    in_flight = set()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one(name: str, scheduled: float, measured: bool):
+            method, path, body, params = build[name]()
+            try:
+                resp = await client.request(method, path, json=body, params=params)
+                await resp.aread()  # streaming endpoints count until their last byte
+                status = str(resp.status_code)
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if measured:
+                results.record(name, status, time.perf_counter() - scheduled)
+
+        started = time.perf_counter()
+        total = int((warmup + duration) * rps)
+        for i in range(total):
+            scheduled = started + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = rng.choices(names, weights)[0]
+            measured = i >= warmup * rps
+            if len(in_flight) >= max_in_flight:
+                # The client itself is saturated; a dropped request is a failed one,
+                # so it counts against the endpoint's error rate
+                if measured:
+                    results.skipped += 1
+                    results.record(name, "not_sent", 0.0)
+                continue
+            task = asyncio.create_task(one(name, scheduled, measured=measured))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = time.perf_counter() - started - warmup
+
+    return results, elapsed
+
+
+def print_table(summary: Dict[str, dict], skipped: int):
+    print(f"{'endpoint':<16}{'reqs':>7}{'ok':>7}{'err%':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, row in summary.items():
+        print(f"{name:<16}{row['requests']:>7}{row['ok']:>7}{row['error_rate'] * 100:>7.1f}{row['throughput_rps']:>8.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+        failures = {s: n for s, n in row["statuses"].items() if not s.startswith("2")}
+        if failures:
+            print(f"{'':<16}failures: {failures}")
+    if skipped:
+        print(f"{skipped} requests not sent: --max-in-flight reached")
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_process(args: List[str], env: Optional[dict] = None) -> subprocess.Popen:
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env={**os.environ, **(env or {})})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-rate load test for the Traffix API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds first (fills caches, pools)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("route=6,hazards=2,clusters=1,route_batch=1"),
+                        help="endpoint weights, e.g. route=6,hazards=2 (see scenarios())")
+    parser.add_argument("--addresses", type=int, default=200,
+                        help="distinct addresses; fewer means more geocode/route cache hits")
+    parser.add_argument("--batch-size", type=int, default=10, help="pairs per route_batch request")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-stub", action="store_true", help="run benchmarks/stub_upstreams.py too")
+    parser.add_argument("--stub-port", type=int, default=9000)
+    parser.add_argument("--stub-args", default="", help="extra stub_upstreams.py arguments, e.g. '--latency-ms 80'")
+    parser.add_argument("--start-app", action="store_true", help="run uvicorn main:app on --base-url, using the stub")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --start-app")
+    parser.add_argument("--json", help="also write the summary to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if any endpoint's p95 is above this")
+    parser.add_argument("--max-error-rate", type=float, help="exit 1 if any endpoint's error rate is above this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    build = scenarios(address_pool(args.addresses), rng, args.batch_size)
+    unknown = set(args.mix) - set(build)
+    if unknown:
+        parser.error(f"unknown endpoints in --mix: {sorted(unknown)}; known: {sorted(build)}")
+
+    processes = []
+    try:
+        stub_url = f"http://127.0.0.1:{args.stub_port}"
+        if args.start_stub:
+            processes.append(start_process(
+                [sys.executable, "benchmarks/stub_upstreams.py", "--port", str(args.stub_port), *args.stub_args.split()]
+            ))
+            wait_until_up(f"{stub_url}/_stub/config")
+        if args.start_app:
+            port = httpx.URL(args.base_url).port or 8000
+            processes.append(start_process(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers),
+                 "--log-level", "warning"],
+                # In-memory geocode cache so runs don't reuse each other's results
+                env={**stub_env(stub_url), "GEOCODE_CACHE_DB": ""}
+            ))
+            wait_until_up(f"{args.base_url}/")
+
+        print(f"{args.rps:g} req/s for {args.duration:g}s (+{args.warmup:g}s warm-up) against {args.base_url}")
+        results, elapsed = asyncio.run(run_load(
+            args.base_url, args.rps, args.duration, args.mix, build, rng,
+            args.timeout, args.max_in_flight, args.warmup
+        ))
+    finally:
+        for proc in processes:
+            proc.terminate()
+        for proc in processes:
+            proc.wait(timeout=10)
+
+    summary = results.summary(elapsed)
+    print_table(summary, results.skipped)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rps": args.rps, "duration": args.duration, "endpoints": summary,
+                       "skipped": results.skipped}, f, indent=2)
+
+    failed = []
+    for name, row in summary.items():
+        if args.max_p95_ms is not None and not row["p95_ms"] <= args.max_p95_ms:
+            failed.append(f"{name}: p95 {row['p95_ms']:.1f} ms > {args.max_p95_ms:g} ms")
+        if args.max_error_rate is not None and row["error_rate"] > args.max_error_rate:
+            failed.append(f"{name}: error rate {row['error_rate']:.3f} > {args.max_error_rate:g}")
+    if results.skipped and (args.max_p95_ms is not None or args.max_error_rate is not None):
+        # Latency of requests that were never sent is unknown, so p95 alone can't pass
+        failed.append(f"{results.skipped} requests not sent: --max-in-flight reached")
+    if failed:
+        print("FAILED:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# benchmarks/stub_upstreams.py
+# Deterministic local stand-in for Nominatim, OSRM and OpenWeather, so the API
+# can be load-tested without touching the public services.
+#
+# Answers depend only on the request (addresses hash to fixed points in Delhi,
+# routes are generated from their endpoints), while latency, jitter, HTTP 503s
+# and hangs are injected per service from a seeded RNG.
+#
+#   python benchmarks/stub_upstreams.py --port 9000 --latency-ms 40 --jitter-ms 20 --error-rate 0.01
+#   python benchmarks/stub_upstreams.py --service osrm:latency_ms=150,error_rate=0.05
+#
+# Point the API at it with the variables printed on startup (see stub_env()).
+# GET/POST /_stub/config reads/changes the injection settings at runtime and
+# GET /_stub/stats returns request counts per service.
+
+import json
+import math
+import random
+import asyncio
+import hashlib
+import argparse
+from dataclasses import dataclass, asdict, fields
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Body, Query, Response
+
+# Area addresses are geocoded into (roughly the NCT of Delhi)
+DELHI_BBOX = (76.95, 28.45, 77.35, 28.85)  # min_lon, min_lat, max_lon, max_lat
+
+# OSRM overview=full returns a point every ~10-30 m on city streets
+ROUTE_POINT_SPACING_M = 20
+AVERAGE_SPEED_MPS = 8.0
+METERS_PER_DEG_LAT = 111_320.0
+
+SERVICES = ("nominatim", "osrm", "weather")
+
+
+@dataclass
+class ServiceConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0   # share of requests answered with HTTP 503
+    hang_rate: float = 0.0    # share of requests held for hang_seconds first
+    hang_seconds: float = 10.0
+
+
+def stub_env(base_url: str) -> Dict[str, str]:
+    """Environment variables that point the API's upstream clients at this stub."""
+    base_url = base_url.rstrip("/")
+    return {
+        "NOMINATIM_URL": f"{base_url}/search",
+        "OSRM_BASE_URL": f"{base_url}/route/v1/driving/",
+        "OPENWEATHER_URL": f"{base_url}/data/2.5/weather",
+        "OPENWEATHER_API_KEY": "stub",
+    }
+
+
+def _unit(*parts) -> float:
+    """Deterministic float in [0, 1) from the given values."""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64
+
+
+def geocode(query: str, not_found_rate: float) -> List[dict]:
+    if _unit("missing", query) < not_found_rate:
+        return []
+    min_lon, min_lat, max_lon, max_lat = DELHI_BBOX
+    lat = min_lat + _unit("lat", query) * (max_lat - min_lat)
+    lon = min_lon + _unit("lon", query) * (max_lon - min_lon)
+    return [{"lat": f"{lat:.7f}", "lon": f"{lon:.7f}", "display_name": query, "importance": 0.5}]
+
+
+def _distance_m(a, b) -> float:
+    kx = METERS_PER_DEG_LAT * math.cos(math.radians((a[1] + b[1]) / 2))
+    return math.hypot((b[0] - a[0]) * kx, (b[1] - a[1]) * METERS_PER_DEG_LAT)
+
+
+def _route(start, end, bend: float) -> dict:
+    """A smooth curve from start to end, bowed sideways by `bend` (share of its length)."""
+    straight = _distance_m(start, end)
+    n = max(2, int(straight / ROUTE_POINT_SPACING_M) + 1)
+    # Sideways offset, perpendicular to the start->end line in degree space
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    coords = []
+    for i in range(n):
+        t = i / (n - 1)
+        offset = bend * math.sin(math.pi * t)
+        coords.append([round(start[0] + dx * t - dy * offset, 6), round(start[1] + dy * t + dx * offset, 6)])
+    distance = sum(_distance_m(a, b) for a, b in zip(coords, coords[1:]))
+    return {
+        "distance": round(distance, 1),
+        "duration": round(distance / AVERAGE_SPEED_MPS, 1),
+        "geometry": {"type": "LineString", "coordinates": coords},
+        "weight": round(distance / AVERAGE_SPEED_MPS, 1),
+        "weight_name": "routability",
+        "legs": []
+    }
+
+
+def routes(start, end, alternatives: bool) -> List[dict]:
+    bends = [0.0, 0.08, -0.12] if alternatives else [0.0]
+    return [_route(start, end, b) for b in bends]
+
+
+@lru_cache(maxsize=4096)
+def _osrm_body(coordinates: str, alternatives: bool) -> bytes:
+    # Encoded once per distinct request: FastAPI's own encoder on thousands of
+    # coordinates would make the stub, not the API, the bottleneck
+    (lon1, lat1), (lon2, lat2) = [tuple(map(float, c.split(","))) for c in coordinates.split(";")]
+    payload = {"code": "Ok", "routes": routes((lon1, lat1), (lon2, lat2), alternatives), "waypoints": []}
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def weather(lat: float, lon: float, rain_rate: float) -> dict:
+    cell = (round(lat, 1), round(lon, 1))
+    raining = _unit("rain", *cell) < rain_rate
+    return {
+        "weather": [{"main": "Rain" if raining else "Clear"}],
+        "main": {"temp": round(20 + 15 * _unit("temp", *cell), 1)},
+        "coord": {"lat": lat, "lon": lon}
+    }
+
+
+def create_app(config: Dict[str, ServiceConfig], seed: int = 0, not_found_rate: float = 0.0,
+               rain_rate: float = 0.3) -> FastAPI:
+    app = FastAPI(title="Traffix upstream stub")
+    rng = random.Random(seed)
+    stats = {name: {"requests": 0, "errors": 0, "hangs": 0} for name in SERVICES}
+
+    async def inject(service: str) -> Optional[Response]:
+        """Applies latency/failures for one request; returns an error response to send instead, if any."""
+        cfg = config[service]
+        stats[service]["requests"] += 1
+        delay = cfg.latency_ms + (rng.uniform(-cfg.jitter_ms, cfg.jitter_ms) if cfg.jitter_ms else 0.0)
+        if cfg.hang_rate and rng.random() < cfg.hang_rate:
+            stats[service]["hangs"] += 1
+            delay = cfg.hang_seconds * 1000
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if cfg.error_rate and rng.random() < cfg.error_rate:
+            stats[service]["errors"] += 1
+            return Response(status_code=503, content="stub: injected failure")
+        return None
+
+    @app.get("/search")
+    async def nominatim_search(q: str):
+        failure = await inject("nominatim")
+        return failure or geocode(q, not_found_rate)
+
+    @app.get("/route/v1/driving/{coordinates}")
+    async def osrm_route(coordinates: str, alternatives: str = "false"):
+        failure = await inject("osrm")
+        if failure:
+            return failure
+        try:
+            body = _osrm_body(coordinates, alternatives == "true")
+        except ValueError:
+            return Response(status_code=400, content='{"code":"InvalidQuery"}', media_type="application/json")
+        return Response(body, media_type="application/json")
+
+    @app.get("/data/2.5/weather")
+    async def openweather(lat: float, lon: float, appid: Optional[str] = None):
+        failure = await inject("weather")
+        return failure or weather(lat, lon, rain_rate)
+
+    @app.get("/_stub/config")
+    def get_config():
+        return {name: asdict(cfg) for name, cfg in config.items()}
+
+    @app.post("/_stub/config")
+    def set_config(changes: Dict[str, Dict[str, float]] = Body(...)):
+        """e.g. {"osrm": {"error_rate": 0.2}} — unknown services/fields are ignored."""
+        for name, values in changes.items():
+            if name in config:
+                for field in fields(ServiceConfig):
+                    if field.name in values:
+                        setattr(config[name], field.name, float(values[field.name]))
+        return get_config()
+
+    @app.get("/_stub/stats")
+    def get_stats(reset: bool = Query(False)):
+        snapshot = {name: dict(s) for name, s in stats.items()}
+        if reset:
+            for s in stats.values():
+                s.update(requests=0, errors=0, hangs=0)
+        return snapshot
+
+    return app
+
+
+def parse_service_override(value: str):
+    """'osrm:latency_ms=150,error_rate=0.05' -> ('osrm', {'latency_ms': 150.0, 'error_rate': 0.05})"""
+    name, _, settings = value.partition(":")
+    if name not in SERVICES:
+        raise argparse.ArgumentTypeError(f"unknown service {name!r}, expected one of {SERVICES}")
+    known = {f.name for f in fields(ServiceConfig)}
+    values = {}
+    for item in filter(None, settings.split(",")):
+        key, _, number = item.partition("=")
+        if key not in known:
+            raise argparse.ArgumentTypeError(f"unknown setting {key!r}, expected one of {sorted(known)}")
+        values[key] = float(number)
+    return name, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Nominatim/OSRM/OpenWeather stub for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="base latency for every service")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--service", type=parse_service_override, action="append", default=[],
+                        help="per-service override, e.g. osrm:latency_ms=150,error_rate=0.05")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="share of addresses that don't geocode")
+    parser.add_argument("--rain-rate", type=float, default=0.3, help="share of weather cells where it rains")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = {
+        name: ServiceConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.hang_rate)
+        for name in SERVICES
+    }
+    for name, values in args.service:
+        for key, number in values.items():
+            setattr(config[name], key, number)
+
+    import uvicorn
+
+    print("Point the API at this stub with:")
+    for key, value in stub_env(f"http://{args.host}:{args.port}").items():
+        print(f"  export {key}={value}")
+    app = create_app(config, seed=args.seed, not_found_rate=args.not_found_rate, rain_rate=args.rain_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,71 @@
 # crud.py
-from sqlalchemy.orm import Session
+from sqlalchemy import ARRAY, Text, bindparam, cast, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Query, Session
 from sqlalchemy.sql import func
-from datetime import datetime, timedelta
+from geoalchemy2 import Geometry, Geography
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+import functools
+import hashlib
 import json
+import time
+import types
 
 import models
-import hashing
+from services import metrics, spatial_index
+from services.cache import TTLCache, MISSING
 
+def _timed(fn):
+    """
+    Records each call in traffix_db_query_seconds{query=<function name>}.
+    Lazy results (yield_per queries, generators) only run when iterated, so
+    those are timed until their last row has been read.
+    """
+    histogram = metrics.DB_QUERY_SECONDS.labels(fn.__name__)
+
+    def read_rows(rows, started):
+        try:
+            yield from rows
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        if isinstance(result, (Query, types.GeneratorType)):
+            return read_rows(result, started)
+        histogram.observe(time.perf_counter() - started)
+        return result
+
+    return wrapper
+
+@_timed
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, email: str, password: str):
-    hashed_password = hashing.Hash.get_password_hash(password)
+@_timed
+def create_user(db: Session, email: str, password_hash: str):
+    # Hashing happens before this call, on hashing.hashing_pool
     new_user = models.User(
         email=email,
-        password_hash=hashed_password
+        password_hash=password_hash
     )
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
     return new_user
 
+@_timed
+def update_password_hash(db: Session, user: models.User, password_hash: str):
+    user.password_hash = password_hash
+    db.commit()
+
+# How long a live report stays on the map
+REPORT_TTL = timedelta(minutes=15)
+
+@_timed
 def create_new_report(db: Session, report_type: str, lat: float, lon: float, user_id: int, city_id: int):
     point = func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)
 
@@ -30,14 +75,58 @@ def create_new_report(db: Session, report_type: str, lat: float, lon: float, use
         location=point,
         report_type=report_type,
         created_at=datetime.utcnow(),
-        expires_at=datetime.utcnow() + timedelta(minutes=15)
+        expires_at=datetime.utcnow() + REPORT_TTL
     )
 
     db.add(new_report)
     db.commit()
     db.refresh(new_report)
+
+    # Keep the in-memory route index in step without waiting for the next resync
+    spatial_index.live_reports.add(
+        new_report.id, city_id, report_type, lat, lon, new_report.expires_at
+    )
     return new_report
 
+@_timed
+def get_existing_user_ids(db: Session, user_ids: Iterable[int]) -> Set[int]:
+    """Which of `user_ids` exist, in one query."""
+    ids = set(user_ids)
+    if not ids:
+        return set()
+    rows = db.query(models.User.id).filter(models.User.id.in_(ids)).all()
+    return {row.id for row in rows}
+
+@_timed
+def create_reports_bulk(db: Session, reports: List[dict], city_id: int) -> List[int]:
+    """
+    Inserts many reports (dicts with report_type, lat, lon, user_id) in ONE
+    transaction using multi-row INSERT ... RETURNING. Returns the new ids in
+    the same order as `reports`. Callers validate user ids beforehand.
+    """
+    if not reports:
+        return []
+    now = datetime.utcnow()
+    expires_at = now + REPORT_TTL
+    rows = [{
+        "user_id": r["user_id"],
+        "city_id": city_id,
+        # EWKT; GeoAlchemy2 wraps the bound value in ST_GeogFromText
+        "location": f"SRID=4326;POINT({r['lon']} {r['lat']})",
+        "report_type": r["report_type"],
+        "created_at": now,
+        "expires_at": expires_at
+    } for r in reports]
+
+    stmt = insert(models.Report).returning(models.Report.id, sort_by_parameter_order=True)
+    ids = list(db.scalars(stmt, rows))
+    db.commit()
+
+    for report_id, r in zip(ids, reports):
+        spatial_index.live_reports.add(report_id, city_id, r["report_type"], r["lat"], r["lon"], expires_at)
+    return ids
+
+@_timed
 def get_live_reports(db: Session, city_id: int):
     now = datetime.utcnow()
     return db.query(models.Report).filter(
@@ -45,36 +134,476 @@ def get_live_reports(db: Session, city_id: int):
         models.Report.expires_at > now
     ).all()
 
+@_timed
 def get_static_hazards(db: Session, city_id: int):
     return db.query(models.FloodHotspot).filter(models.FloodHotspot.city_id == city_id).all()
 
-def get_sample_road_score(db: Session, city_id: int):
-    seg = db.query(models.RoadSegment).filter(
-        models.RoadSegment.city_id == city_id,
-        models.RoadSegment.id == 1
-    ).first()
-    return seg.static_hazard_score if seg else 5
+# Rows are streamed from a server-side cursor in chunks of this size
+POINT_QUERY_CHUNK = 1000
+
+def _as_point_geometry(column):
+    # ST_X / ST_Y only accept geometry, so cast the geography column inside the query
+    return cast(column, Geometry(srid=4326))
+
+def _in_bbox(column, bbox):
+    # Stays on the geography column so the GiST index is used
+    envelope = func.ST_MakeEnvelope(bbox.min_lon, bbox.min_lat, bbox.max_lon, bbox.max_lat, 4326)
+    return func.ST_Intersects(column, cast(envelope, Geography(srid=4326)))
 
-def get_reports_near_route(db: Session, route_geometry: dict, city_id: int):
+def _page(query, id_column, location_column, bbox=None, after_id=None, limit=None):
+    """Optional viewport filter plus keyset pagination (id > after_id ORDER BY id)."""
+    if bbox is not None:
+        query = query.filter(_in_bbox(location_column, bbox))
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    if limit is not None:
+        query = query.order_by(id_column).limit(limit)
+    return query.yield_per(POINT_QUERY_CHUNK)
+
+def _clusters(db: Session, location_column, bbox, cell_deg: float, *filters):
     """
-    Finds count of reports within 300 meters of the given route.
-    Uses GEOGRAPHY-based ST_DWithin (correct for meters).
+    Buckets points into a cell_deg grid (ST_SnapToGrid) and returns
+    (lat, lon, count) rows, placed at the mean position of each bucket.
     """
-    if not route_geometry:
-        return 0
-
-    route_json = json.dumps(route_geometry)
-    # Convert GeoJSON to PostGIS geometry and set SRID
-    route_line = func.ST_SetSRID(func.ST_GeomFromGeoJSON(route_json), 4326)
+    point = _as_point_geometry(location_column)
+    cell = func.ST_SnapToGrid(point, cell_deg)
+    query = db.query(
+        func.avg(func.ST_Y(point)).label("lat"),
+        func.avg(func.ST_X(point)).label("lon"),
+        func.count().label("count")
+    ).filter(*filters)
+    if bbox is not None:
+        query = query.filter(_in_bbox(location_column, bbox))
+    return query.group_by(cell).all()
 
+@_timed
+def get_live_report_points(db: Session, city_id: int, bbox=None, after_id: Optional[int] = None,
+                           limit: Optional[int] = None):
+    """
+    Returns (id, report_type, lat, lon) rows for live reports in ONE query.
+    Coordinates are projected inside PostGIS, so there are no per-row round trips.
+    bbox (services.viewport.BBox) limits the rows to the visible map area;
+    after_id/limit page through them in id order.
+    """
     now = datetime.utcnow()
-    count_query = db.query(models.Report).filter(
+    point = _as_point_geometry(models.Report.location)
+    query = db.query(
+        models.Report.id,
+        models.Report.report_type,
+        func.ST_Y(point).label("lat"),
+        func.ST_X(point).label("lon")
+    ).filter(
         models.Report.city_id == city_id,
-        models.Report.expires_at > now,
-        func.ST_DWithin(
-            models.Report.location,
-            route_line,
-            300
+        models.Report.expires_at > now
+    )
+    return _page(query, models.Report.id, models.Report.location, bbox, after_id, limit)
+
+@_timed
+def get_live_report_clusters(db: Session, city_id: int, cell_deg: float, bbox=None):
+    now = datetime.utcnow()
+    return _clusters(db, models.Report.location, bbox, cell_deg,
+                     models.Report.city_id == city_id, models.Report.expires_at > now)
+
+@_timed
+def get_active_report_entries(db: Session):
+    """
+    Returns every live report (all cities) with projected coordinates and
+    expiry, in the shape spatial_index.LiveReportIndex.load() expects.
+    """
+    now = datetime.utcnow()
+    point = _as_point_geometry(models.Report.location)
+    return db.query(
+        models.Report.id,
+        models.Report.city_id,
+        models.Report.report_type,
+        func.ST_Y(point).label("lat"),
+        func.ST_X(point).label("lon"),
+        models.Report.expires_at
+    ).filter(
+        models.Report.expires_at > now
+    ).yield_per(POINT_QUERY_CHUNK)
+
+@_timed
+def get_static_hazard_points(db: Session, city_id: int, bbox=None, after_id: Optional[int] = None,
+                             limit: Optional[int] = None):
+    """
+    Returns (id, description, lat, lon) rows for flood hotspots in ONE query.
+    Takes the same bbox/after_id/limit arguments as get_live_report_points.
+    """
+    point = _as_point_geometry(models.FloodHotspot.location)
+    query = db.query(
+        models.FloodHotspot.id,
+        models.FloodHotspot.description,
+        func.ST_Y(point).label("lat"),
+        func.ST_X(point).label("lon")
+    ).filter(
+        models.FloodHotspot.city_id == city_id
+    )
+    return _page(query, models.FloodHotspot.id, models.FloodHotspot.location, bbox, after_id, limit)
+
+@_timed
+def get_static_hazard_clusters(db: Session, city_id: int, cell_deg: float, bbox=None):
+    return _clusters(db, models.FloodHotspot.location, bbox, cell_deg,
+                     models.FloodHotspot.city_id == city_id)
+
+# Road segments within this distance of the route count as "on" the route
+SEGMENT_MATCH_METERS = 15
+
+# Segment scores per route geometry. Road scores are edited rarely, so a few
+# minutes of staleness is fine and repeated commutes skip the spatial join.
+_segment_score_cache = TTLCache(max_size=4096, ttl=600)
+metrics.watch_cache("road_segment_scores", _segment_score_cache.stats)
+
+def _geometry_key(route_geometry: dict) -> str:
+    # ~1 m precision, so the same OSRM route always hashes the same way
+    coords = [(round(x, 5), round(y, 5)) for x, y in route_geometry.get("coordinates", [])]
+    return hashlib.sha1(json.dumps(coords).encode()).hexdigest()
+
+@_timed
+def get_route_segment_scores_many(db: Session, route_geometries: List[dict], city_id: int) -> List[Tuple[Optional[float], Optional[int]]]:
+    """
+    Matches each route against road_segments with an indexed ST_DWithin join and
+    returns (length-weighted, max) static_hazard_score over the matched segments.
+    Each segment is weighted by how many meters of it lie inside the route
+    corridor, so roads that merely cross the route barely count.
+    Every uncached route is matched in ONE query; results are in input order,
+    (None, None) where no segment matches.
+    """
+    results: List[Optional[Tuple[Optional[float], Optional[int]]]] = [None] * len(route_geometries)
+    misses = {}  # cache key -> input positions
+    for i, route_geometry in enumerate(route_geometries):
+        if not route_geometry or not route_geometry.get("coordinates"):
+            results[i] = (None, None)
+            continue
+        key = (city_id, _geometry_key(route_geometry))
+        cached = _segment_score_cache.get(key)
+        if cached is not MISSING:
+            results[i] = cached
+        else:
+            misses.setdefault(key, []).append(i)
+
+    if misses:
+        keys = list(misses)
+        geojsons = [json.dumps(route_geometries[misses[k][0]]) for k in keys]
+        # Each route is parsed and buffered once in a CTE instead of once per segment
+        routes_in = func.unnest(
+            bindparam("route_geojsons", geojsons, type_=ARRAY(Text))
+        ).table_valued("geojson", with_ordinality="idx").render_derived()
+        route_geog = cast(func.ST_SetSRID(func.ST_GeomFromGeoJSON(routes_in.c.geojson), 4326), Geography(srid=4326))
+        route = select(
+            routes_in.c.idx,
+            route_geog.label("line"),
+            cast(func.ST_Buffer(route_geog, SEGMENT_MATCH_METERS), Geometry(srid=4326)).label("corridor")
+        ).cte("route").prefix_with("MATERIALIZED")  # don't let Postgres inline it per joined row
+        overlap_m = func.ST_Length(cast(
+            func.ST_Intersection(cast(models.RoadSegment.path, Geometry(srid=4326)), route.c.corridor),
+            Geography(srid=4326)
+        ))
+
+        rows = db.query(
+            route.c.idx,
+            func.sum(models.RoadSegment.static_hazard_score * overlap_m),
+            func.sum(overlap_m),
+            func.max(models.RoadSegment.static_hazard_score)
+        ).select_from(models.RoadSegment).join(
+            route,
+            # Uses the GiST index on road_segments.path
+            func.ST_DWithin(models.RoadSegment.path, route.c.line, SEGMENT_MATCH_METERS)
+        ).filter(
+            models.RoadSegment.city_id == city_id
+        ).group_by(route.c.idx).all()
+
+        # Routes without any matching segment produce no row
+        scores = {idx: (None, None) for idx in range(1, len(keys) + 1)}
+        for idx, weighted_sum, total_m, max_score in rows:
+            if max_score is None:
+                scores[idx] = (None, None)
+            elif not total_m:
+                scores[idx] = (float(max_score), max_score)
+            else:
+                scores[idx] = (float(weighted_sum) / float(total_m), max_score)
+
+        for idx, key in enumerate(keys, start=1):
+            _segment_score_cache.set(key, scores[idx])
+            for i in misses[key]:
+                results[i] = scores[idx]
+
+    return results
+
+# Moves one batch of expired reports into reports_archive. SKIP LOCKED lets
+# several workers/cron runs share the job without blocking each other.
+_ARCHIVE_BATCH_SQL = text("""
+    WITH moved AS (
+        DELETE FROM reports
+        WHERE id IN (
+            SELECT id FROM reports
+            WHERE expires_at < :cutoff
+            ORDER BY expires_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
         )
+        RETURNING id, user_id, city_id, location, report_type, created_at, expires_at
+    )
+    INSERT INTO reports_archive (id, user_id, city_id, location, report_type, created_at, expires_at)
+    SELECT id, user_id, city_id, location, report_type, created_at, expires_at FROM moved
+""")
+
+@_timed
+def archive_expired_reports(db: Session, older_than: timedelta = timedelta(hours=1), batch_size: int = 50000) -> int:
+    """
+    Moves reports that expired more than `older_than` ago into reports_archive,
+    in batches of `batch_size` (one short transaction each). Returns rows moved.
+    """
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+    while True:
+        result = db.execute(_ARCHIVE_BATCH_SQL, {"cutoff": cutoff, "batch_size": batch_size})
+        db.commit()
+        moved += result.rowcount
+        if result.rowcount < batch_size:
+            return moved
+
+# ----------------- Pothole detections -> road segment scores -----------------
+
+# A detection's weight halves every this many days, so fixed roads fade out
+POTHOLE_HALF_LIFE_DAYS = 90
+# Detections further than this from every road segment are not counted
+POTHOLE_SNAP_METERS = 25
+# Decay-weighted severity at which a segment scores ~6.3 of 10 (1 - 1/e)
+POTHOLE_SEVERITY_SCALE = 3.0
+# Rows younger than this are left for the next run, so ids from insert
+# transactions that are still open can't be skipped past by the watermark.
+# A batch also stops below the first unsettled id: created_at is the insert
+# transaction's start time, so a later transaction can hold a lower id.
+POTHOLE_SETTLE_SECONDS = 60
+POTHOLE_AGGREGATION_JOB = "pothole_segment_scores"
+
+# 0-10 score from decayed severity; never below the segment's manual score
+_POTHOLE_SCORE_SQL = "GREATEST({base}, LEAST(10, ROUND(10 * (1 - EXP(-{severity} / :severity_scale)))))::smallint"
+
+_CLAIM_WATERMARK_SQL = text("""
+    INSERT INTO job_watermarks (job, last_id) VALUES (:job, 0) ON CONFLICT (job) DO NOTHING
+""")
+# Row lock: a second run of the job waits here instead of double counting
+_LOCK_WATERMARK_SQL = text("SELECT last_id FROM job_watermarks WHERE job = :job FOR UPDATE")
+_SET_WATERMARK_SQL = text("UPDATE job_watermarks SET last_id = :last_id, updated_at = NOW() WHERE job = :job")
+
+# One batch of new detections: snap each to its nearest segment (KNN on the
+# GiST index, bounded by ST_DWithin), fold them into the segments' running
+# stats and republish only the scores of those segments.
+_AGGREGATE_POTHOLES_SQL = text("""
+    WITH unsettled AS (
+        SELECT MIN(id) AS first_id
+        FROM pothole_detections
+        WHERE id > :after_id AND created_at > :settled_before
+    ),
+    batch AS (
+        SELECT d.id, d.city_id, d.location, d.confidence, d.detected_at
+        FROM pothole_detections d, unsettled u
+        WHERE d.id > :after_id AND (u.first_id IS NULL OR d.id < u.first_id)
+        ORDER BY d.id
+        LIMIT :batch_size
+    ),
+    snapped AS (
+        SELECT b.id, b.confidence, b.detected_at, nearest.segment_id
+        FROM batch b
+        CROSS JOIN LATERAL (
+            SELECT rs.id AS segment_id
+            FROM road_segments rs
+            WHERE rs.city_id = b.city_id
+              AND ST_DWithin(rs.path, b.location, :snap_m)
+            ORDER BY rs.path <-> b.location
+            LIMIT 1
+        ) nearest
+    ),
+    marked AS (
+        UPDATE pothole_detections d SET segment_id = s.segment_id
+        FROM snapped s
+        WHERE d.id = s.id
+        RETURNING d.id
+    ),
+    per_segment AS (
+        SELECT segment_id,
+               COUNT(*) AS n,
+               SUM(confidence * POWER(0.5, GREATEST(0, EXTRACT(EPOCH FROM (:now - detected_at))) / :half_life_s)) AS severity
+        FROM snapped
+        GROUP BY segment_id
+    ),
+    upserted AS (
+        INSERT INTO segment_hazard_stats AS st (segment_id, detection_count, severity, severity_at, base_score)
+        SELECT p.segment_id, p.n, p.severity, :now, COALESCE(rs.static_hazard_score, 0)
+        FROM per_segment p
+        JOIN road_segments rs ON rs.id = p.segment_id
+        ON CONFLICT (segment_id) DO UPDATE SET
+            detection_count = st.detection_count + EXCLUDED.detection_count,
+            severity = st.severity * POWER(0.5, GREATEST(0, EXTRACT(EPOCH FROM (:now - st.severity_at))) / :half_life_s)
+                       + EXCLUDED.severity,
+            severity_at = EXCLUDED.severity_at
+        RETURNING segment_id, severity, base_score
+    ),
+    scored AS (
+        UPDATE road_segments rs
+        SET static_hazard_score = """ + _POTHOLE_SCORE_SQL.format(base="u.base_score", severity="u.severity") + """
+        FROM upserted u
+        WHERE rs.id = u.segment_id
+        RETURNING rs.id
+    )
+    SELECT (SELECT MAX(id) FROM batch) AS last_id,
+           (SELECT COUNT(*) FROM batch) AS detections,
+           (SELECT COUNT(*) FROM marked) AS snapped,
+           (SELECT COUNT(*) FROM scored) AS segments
+""")
+
+# Segments nobody has re-detected lately: apply the decay since severity_at
+# and rewrite the score only where it changed
+_DECAY_SEGMENT_SCORES_SQL = text("""
+    WITH decayed AS (
+        UPDATE segment_hazard_stats st
+        SET severity = st.severity * POWER(0.5, EXTRACT(EPOCH FROM (:now - st.severity_at)) / :half_life_s),
+            severity_at = :now
+        WHERE st.severity_at < :stale_before AND st.severity > :min_severity
+        RETURNING segment_id, severity, base_score
+    )
+    UPDATE road_segments rs
+    SET static_hazard_score = """ + _POTHOLE_SCORE_SQL.format(base="d.base_score", severity="d.severity") + """
+    FROM decayed d
+    WHERE rs.id = d.segment_id
+      AND rs.static_hazard_score IS DISTINCT FROM """ + _POTHOLE_SCORE_SQL.format(base="d.base_score", severity="d.severity") + """
+""")
+
+@_timed
+def create_pothole_detections_bulk(db: Session, detections: List[dict], city_id: int) -> int:
+    """
+    Inserts detections (dicts with lat, lon, confidence, detected_at, source_key)
+    in one statement. Rows whose source_key is already stored are skipped, so
+    re-importing the same images is harmless. Returns rows inserted.
+    """
+    if not detections:
+        return 0
+    rows = [{
+        "city_id": city_id,
+        "location": f"SRID=4326;POINT({d['lon']} {d['lat']})",
+        "confidence": float(d["confidence"]),
+        "detected_at": d["detected_at"],
+        "source_key": d.get("source_key"),
+    } for d in detections]
+    stmt = pg_insert(models.PotholeDetection).values(rows).on_conflict_do_nothing(index_elements=["source_key"])
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount
+
+def _pothole_params(now: datetime, half_life_days: float) -> dict:
+    return {"now": now, "half_life_s": half_life_days * 86400, "severity_scale": POTHOLE_SEVERITY_SCALE}
+
+@_timed
+def aggregate_pothole_detections(db: Session, batch_size: int = 10000, snap_m: float = POTHOLE_SNAP_METERS,
+                                 half_life_days: float = POTHOLE_HALF_LIFE_DAYS,
+                                 settle_seconds: float = POTHOLE_SETTLE_SECONDS,
+                                 now: Optional[datetime] = None) -> dict:
+    """
+    Folds detections added since the last run into segment_hazard_stats and
+    updates static_hazard_score for the segments they touched. Each batch
+    commits together with the job's watermark, so an interrupted run resumes
+    cleanly. Returns totals: detections, snapped, segments.
+    """
+    now = now or datetime.now(timezone.utc)
+    params = {
+        **_pothole_params(now, half_life_days),
+        "snap_m": snap_m,
+        "batch_size": batch_size,
+        "settled_before": now - timedelta(seconds=settle_seconds),
+    }
+    totals = {"detections": 0, "snapped": 0, "segments": 0}
+    db.execute(_CLAIM_WATERMARK_SQL, {"job": POTHOLE_AGGREGATION_JOB})
+    db.commit()
+    while True:
+        after_id = db.execute(_LOCK_WATERMARK_SQL, {"job": POTHOLE_AGGREGATION_JOB}).scalar()
+        row = db.execute(_AGGREGATE_POTHOLES_SQL, {**params, "after_id": after_id}).one()
+        if not row.detections:
+            db.commit()
+            return totals
+        db.execute(_SET_WATERMARK_SQL, {"job": POTHOLE_AGGREGATION_JOB, "last_id": row.last_id})
+        db.commit()
+        totals["detections"] += row.detections
+        totals["snapped"] += row.snapped
+        totals["segments"] += row.segments
+
+@_timed
+def decay_segment_scores(db: Session, stale_after: timedelta = timedelta(days=1),
+                         half_life_days: float = POTHOLE_HALF_LIFE_DAYS, min_severity: float = 0.01,
+                         now: Optional[datetime] = None) -> int:
+    """
+    Re-applies decay to segments with no new detections for `stale_after`, so
+    their scores drop over time without touching the rest of the network.
+    Segments decayed below min_severity are left alone. Returns scores changed.
+    """
+    now = now or datetime.now(timezone.utc)
+    result = db.execute(_DECAY_SEGMENT_SCORES_SQL, {
+        **_pothole_params(now, half_life_days),
+        "stale_before": now - stale_after,
+        "min_severity": min_severity,
+    })
+    db.commit()
+    return result.rowcount
+
+# ----------------- Training history -----------------
+
+# Rows per chunk read from the server-side cursor by train_model.py
+TRAINING_CHUNK = 100_000
+
+def _stream_chunks(db: Session, stmt, chunk_size: int):
+    # yield_per makes psycopg2 use a named (server-side) cursor, so only one
+    # chunk of the result is ever held on the client
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield rows
+
+def _in_range(column, since: Optional[datetime], until: Optional[datetime]):
+    conditions = []
+    if since is not None:
+        conditions.append(column >= since)
+    if until is not None:
+        conditions.append(column < until)
+    return conditions
+
+@_timed
+def stream_report_history(db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          chunk_size: int = TRAINING_CHUNK):
+    """Yields lists of (city_id, created_at) rows for live and archived reports."""
+    live = select(models.Report.city_id, models.Report.created_at).where(
+        *_in_range(models.Report.created_at, since, until)
+    )
+    archived = select(models.ReportArchive.city_id, models.ReportArchive.created_at).where(
+        *_in_range(models.ReportArchive.created_at, since, until)
+    )
+    yield from _stream_chunks(db, live.union_all(archived), chunk_size)
+
+@_timed
+def stream_weather_observations(db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                                chunk_size: int = TRAINING_CHUNK):
+    """Yields lists of (city_id, observed_at, is_raining) rows."""
+    stmt = select(
+        models.WeatherObservation.city_id,
+        models.WeatherObservation.observed_at,
+        models.WeatherObservation.is_raining
+    ).where(*_in_range(models.WeatherObservation.observed_at, since, until))
+    yield from _stream_chunks(db, stmt, chunk_size)
+
+@_timed
+def stream_route_outcomes(db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          chunk_size: int = TRAINING_CHUNK):
+    """
+    Yields lists of (id, city_id, started_at, static_hazard_score,
+    active_reports, expected_duration_s, actual_duration_s) rows for
+    finished trips.
+    """
+    o = models.RouteOutcome
+    stmt = select(
+        o.id, o.city_id, o.started_at, o.static_hazard_score, o.active_reports,
+        o.expected_duration_s, o.actual_duration_s
+    ).where(
+        o.actual_duration_s.is_not(None),
+        o.expected_duration_s > 0,
+        *_in_range(o.started_at, since, until)
     )
-    return count_query.count()
+    yield from _stream_chunks(db, stmt, chunk_size)
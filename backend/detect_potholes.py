@@ -0,0 +1,98 @@
+# detect_potholes.py
+# Runs pothole detection over a folder of photos, a video file or a camera
+# stream and files every new pothole as a 'Pothole' report.
+#
+#   python detect_potholes.py survey_photos/ --geotags survey_photos/geotags.csv --user-id 1
+#   python detect_potholes.py dashcam.mp4 --track dashcam_gps.csv --user-id 1 --batch-size 16
+#   python detect_potholes.py rtsp://camera/stream --track live_gps.csv --user-id 1
+#
+# Video is sampled at --sample-fps and only frames that changed since the
+# last one sent to the model are run (--max-hash-distance, -1 runs all).
+# Photos are located by --geotags (name,lat,lon) or their EXIF GPS tags;
+# video frames by interpolating --track (t,lat,lon, t in seconds).
+# The model needs a 'pothole' class (--model, default $POTHOLE_MODEL).
+# Each report is also stored in pothole_detections for aggregate_potholes.py.
+
+import argparse
+import os
+from datetime import datetime, timezone
+
+import crud
+from database import SessionLocal
+from services import pothole_detection
+
+
+def frame_source(args, change_filter):
+    # YOLO letterboxes to imgsz anyway; shrinking first keeps queued frames small
+    if os.path.isdir(args.source):
+        geotags = pothole_detection.read_geotags(args.geotags) if args.geotags else None
+        frames = pothole_detection.iter_images(args.source, geotags)
+        return pothole_detection.sample_frames(frames, max_side=args.imgsz)
+    track = pothole_detection.GpsTrack.from_csv(args.track) if args.track else None
+    frames = pothole_detection.iter_video(args.source, track, sample_fps=args.sample_fps)
+    return pothole_detection.sample_frames(frames, change_filter, max_side=args.imgsz)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect potholes and file them as hazard reports")
+    parser.add_argument("source", help="image directory, video file or stream URL")
+    parser.add_argument("--geotags", help="CSV of name,lat,lon for the images in a directory")
+    parser.add_argument("--track", help="CSV of t,lat,lon positions for a video")
+    parser.add_argument("--model", default=pothole_detection.MODEL_PATH)
+    parser.add_argument("--conf", type=float, default=0.4, help="minimum detection confidence")
+    parser.add_argument("--imgsz", type=int, default=640, help="inference size in pixels")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per predict call")
+    parser.add_argument("--queue-size", type=int, default=64, help="decoded frames held ahead of inference")
+    parser.add_argument("--threads", type=int, help="torch CPU threads (default: torch's choice)")
+    parser.add_argument("--sample-fps", type=float, default=10.0,
+                        help="video frames per second of footage to look at (0: every frame)")
+    parser.add_argument("--max-hash-distance", type=int, default=pothole_detection.DEFAULT_MAX_HASH_DISTANCE,
+                        help="video frames within this many dHash bits of the last inferred one are skipped; -1 off")
+    parser.add_argument("--max-gap", type=int, help="run at least every N-th sampled video frame")
+    parser.add_argument("--dedupe-m", type=float, default=pothole_detection.DEDUPE_RADIUS_M,
+                        help="detections this close to an earlier one are not reported again")
+    parser.add_argument("--user-id", type=int, required=True, help="account the reports are filed under")
+    parser.add_argument("--city-id", type=int, default=1)
+    parser.add_argument("--dry-run", action="store_true", help="detect and count, but write nothing")
+    args = parser.parse_args()
+
+    change_filter = None
+    if args.max_hash_distance >= 0:
+        change_filter = pothole_detection.ChangeFilter(args.max_hash_distance, max_gap=args.max_gap)
+    detector = pothole_detection.PotholeDetector(args.model, conf=args.conf, imgsz=args.imgsz, threads=args.threads)
+    db = SessionLocal()
+    try:
+        if not args.dry_run and not crud.get_existing_user_ids(db, [args.user_id]):
+            parser.error(f"user {args.user_id} does not exist")
+
+        source_name = os.path.basename(os.path.normpath(args.source))
+
+        def write_reports(reports):
+            if args.dry_run:
+                return
+            crud.create_reports_bulk(db, reports, args.city_id)
+            now = datetime.now(timezone.utc)
+            crud.create_pothole_detections_bulk(db, [{
+                "lat": r["lat"], "lon": r["lon"], "confidence": r["confidence"], "detected_at": now,
+                "source_key": f"{source_name}/{r['source']}"
+            } for r in reports], args.city_id)
+
+        pipeline = pothole_detection.DetectionPipeline(
+            detector, write_reports, args.user_id,
+            batch_size=args.batch_size, queue_size=args.queue_size, dedupe_radius_m=args.dedupe_m
+        )
+        stats = pipeline.run(frame_source(args, change_filter))
+    finally:
+        db.close()
+
+    if change_filter is not None and change_filter.seen:
+        print(f"{change_filter.seen} sampled frame(s), {change_filter.seen - change_filter.passed} skipped as unchanged")
+    print(f"{stats.frames} frame(s) in {stats.elapsed_seconds:.1f}s: {stats.fps:.1f} fps end to end, "
+          f"{stats.inference_fps:.1f} fps inference ({stats.batches} batches)")
+    print(f"{stats.detections} detection(s); {stats.reports} report(s) "
+          f"{'would be ' if args.dry_run else ''}filed, {stats.duplicates} duplicate(s), "
+          f"{stats.unlocated} without a location")
+
+
+if __name__ == "__main__":
+    main()
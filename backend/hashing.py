@@ -1,10 +1,109 @@
 # hashing.py
 # This file handles all our password security.
 
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
+from services import metrics
+
+# scrypt cost settings. Raising them only affects new hashes; existing ones
+# are upgraded the next time their owner logs in (see verify_and_update).
+SCRYPT_ROUNDS = int(os.getenv("SCRYPT_ROUNDS", "16"))          # log2(N)
+SCRYPT_BLOCK_SIZE = int(os.getenv("SCRYPT_BLOCK_SIZE", "8"))   # r
+SCRYPT_PARALLELISM = int(os.getenv("SCRYPT_PARALLELISM", "1")) # p
+
 # Using scrypt as the hashing scheme
-pwd_context = CryptContext(schemes=["scrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["scrypt"],
+    deprecated="auto",
+    scrypt__rounds=SCRYPT_ROUNDS,
+    scrypt__block_size=SCRYPT_BLOCK_SIZE,
+    scrypt__parallelism=SCRYPT_PARALLELISM
+)
+
+# hashlib.scrypt releases the GIL, so plain threads are enough to keep the
+# work off the event loop and off FastAPI's shared threadpool
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Running + waiting hashes allowed before new auth requests are turned away
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 16)))
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool's queue is full."""
+
+
+class HashingPool:
+    """
+    Size-limited pool for scrypt work. Requests beyond `max_pending` are
+    rejected immediately (HashingBusy) instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            metrics.HASH_REJECTED.inc()
+            raise HashingBusy("Password hashing queue is full")
+
+        with self._lock:
+            self.pending += 1
+        enqueued = time.monotonic()
+
+        def job():
+            wait = time.monotonic() - enqueued
+            with self._lock:
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            metrics.HASH_QUEUE_SECONDS.observe(wait)
+            with metrics.HASH_SECONDS.time():
+                return fn(*args)
+
+        def done(future):
+            # Also runs when a caller is cancelled while the job is still
+            # queued and job() never starts, so the slot is always returned
+            with self._lock:
+                self.pending -= 1
+                if not future.cancelled():
+                    self.completed += 1
+            self._slots.release()
+
+        future = self._executor.submit(job)
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_queue_wait_ms": (self.total_wait / self.completed * 1000) if self.completed else 0.0,
+                "max_queue_wait_ms": self.max_wait * 1000,
+            }
+
+
+hashing_pool = HashingPool()
+
 
 class Hash():
     def get_password_hash(password: str):
@@ -18,3 +117,18 @@ class Hash():
         Checks if the plain password matches the scrambled one from our database.
         """
         return pwd_context.verify(plain_password, hashed_password)
+
+    def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Like verify_password, but also returns a fresh hash when the stored one
+        was made with older scrypt settings (None if it is up to date).
+        """
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+
+    async def get_password_hash_async(password: str) -> str:
+        """get_password_hash, run on the hashing pool. May raise HashingBusy."""
+        return await hashing_pool.run(pwd_context.hash, password)
+
+    async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """verify_and_update, run on the hashing pool. May raise HashingBusy."""
+        return await hashing_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
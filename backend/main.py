@@ -1,26 +1,116 @@
 # main.py
 # FINAL WORKING VERSION – FULLY FIXED
 
-from fastapi import FastAPI, Depends, HTTPException
-from pydantic import BaseModel, EmailStr
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, EmailStr, ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
-from typing import List, Any, Optional
-import pandas as pd
-import joblib
+from sqlalchemy.exc import IntegrityError
+from typing import List, Any, Literal, Optional
 from datetime import datetime
+import json
+import os
 
-import models, crud, hashing
+import models, crud, hashing, auth
 from database import SessionLocal, engine
-from services import weather, routing
+from services import weather, routing, spatial_index, http_client, inference, hazard_events, viewport, route_cache, geometry, metrics
+from services.timing import StageTimer
 
 # Create tables
 models.Base.metadata.create_all(bind=engine)
 
-# Load AI Model
-ai_model = joblib.load("congestion_model.pkl")
+# Load AI Model (NumPy/inplace_predict wrapper, no pandas per request)
+ai_model = inference.CongestionModel("congestion_model.pkl")
+# Groups feature rows from concurrent requests into one predict call
+congestion_batcher = inference.MicroBatcher(ai_model)
 
-app = FastAPI(title="Traffix Backend API")
+# Every worker rebuilds its report index from Postgres this often, which also
+# picks up reports created through other uvicorn workers
+INDEX_RESYNC_SECONDS = 30
+# How often expired reports are swept out of the index (and streamed as "expire")
+EXPIRY_SWEEP_SECONDS = 5
+# Comment line sent on idle streams so proxies don't time them out
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Pushes index changes (new + expired reports) to /hazards/stream viewers
+hazard_broadcaster = hazard_events.HazardBroadcaster(city_id=1)
+spatial_index.live_reports.add_listener(hazard_broadcaster.on_index_change)
+metrics.HAZARD_STREAM_CLIENTS.set_function(lambda: hazard_broadcaster.subscriber_count)
+
+
+def reload_report_index():
+    db = SessionLocal()
+    try:
+        # Taken before the query runs: reports added meanwhile survive the swap
+        since = spatial_index.live_reports.begin_load()
+        spatial_index.live_reports.load(crud.get_active_report_entries(db), since=since)
+    finally:
+        db.close()
+
+
+async def resync_report_index():
+    while True:
+        await asyncio.sleep(INDEX_RESYNC_SECONDS)
+        try:
+            await run_in_threadpool(reload_report_index)
+        except Exception as e:
+            metrics.BACKGROUND_ERRORS.labels("report_index_resync").inc()
+            print("Error refreshing report index:", e)
+
+
+async def sweep_expired_reports():
+    while True:
+        await asyncio.sleep(EXPIRY_SWEEP_SECONDS)
+        spatial_index.live_reports.expire()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    hazard_broadcaster.attach(asyncio.get_running_loop())
+    await run_in_threadpool(reload_report_index)
+    background = [
+        asyncio.create_task(resync_report_index()),
+        asyncio.create_task(sweep_expired_reports())
+    ]
+    yield
+    for task in background:
+        task.cancel()
+    hazard_broadcaster.close()
+    await congestion_batcher.close()
+    await http_client.close()
+
+
+# Responses that are written line by line as results come in
+STREAMING_PATHS = frozenset({"/route/predict-risk/batch", "/hazards/stream"})
+
+
+class GZipExceptStreams:
+    """
+    GZipMiddleware for every path except STREAMING_PATHS. gzip holds back a
+    streamed body until it has a block worth compressing, so NDJSON lines
+    would only reach the client once the whole batch was done.
+    """
+
+    def __init__(self, app, **gzip_options):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **gzip_options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in STREAMING_PATHS:
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+app = FastAPI(title="Traffix Backend API", lifespan=lifespan)
+# Route geometry compresses ~5-10x; tiny bodies and streams are left alone
+app.add_middleware(GZipExceptStreams, minimum_size=1000)
+# Outermost, so its timings include compression
+app.add_middleware(metrics.MetricsMiddleware)
 
 # ----------------- Pydantic Models -----------------
 
@@ -48,6 +138,21 @@ class ReportResponse(BaseModel):
     lon: float
     class Config: from_attributes = True
 
+class BulkReportItem(ReportCreate):
+    # Only read from fleet-key callers; token callers file as themselves
+    user_id: Optional[int] = None
+
+class BulkReportResult(BaseModel):
+    index: int
+    status: str  # "created" or "rejected"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkReportResponse(BaseModel):
+    created: int
+    rejected: int
+    results: List[BulkReportResult]
+
 class FloodHotspotResponse(BaseModel):
     id: int
     description: str
@@ -58,6 +163,22 @@ class FloodHotspotResponse(BaseModel):
 class RouteRequest(BaseModel):
     start_address: str
     end_address: str
+    # "geojson": full OSRM LineString (default); "simplified": Douglas-Peucker
+    # simplified LineString; "polyline": simplified, as an encoded polyline string
+    geometry_format: Literal["geojson", "simplified", "polyline"] = "geojson"
+
+class RoutePair(BaseModel):
+    start_address: str
+    end_address: str
+
+class RouteBatchRequest(BaseModel):
+    pairs: List[RoutePair]
+    geometry_format: Literal["geojson", "simplified", "polyline"] = "geojson"
+
+class HazardCluster(BaseModel):
+    lat: float
+    lon: float
+    count: int
 
 class RouteData(BaseModel):
     risk_score: int
@@ -69,6 +190,9 @@ class RouteData(BaseModel):
 class RouteResponse(BaseModel):
     original_route: RouteData
     alternative_route: Optional[RouteData] = None
+    # Any further OSRM routes, ranked by risk then duration (the first two
+    # are the fields above; each route is sent once)
+    more_routes: List[RouteData] = []
 
 
 # ----------------- DB Dependency -----------------
@@ -86,41 +210,82 @@ def root():
     return {"message": "Traffix backend running!"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint (latencies, cache hit ratios, pool and queue state)."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # ----------------- USER AUTH -----------------
 
+def hashing_busy() -> HTTPException:
+    # Backpressure: shed auth load instead of letting it queue up behind scrypt
+    return HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+
 @app.post("/users/signup", response_model=UserResponse)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    existing = crud.get_user_by_email(db, user.email)
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(crud.get_user_by_email, db, user.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db, email=user.email, password=user.password)
+    try:
+        password_hash = await hashing.Hash.get_password_hash_async(user.password)
+    except hashing.HashingBusy:
+        raise hashing_busy()
+    new_user = await run_in_threadpool(crud.create_user, db, email=user.email, password_hash=password_hash)
+    auth.remember_user(new_user.id)
+    return new_user
 
 
 @app.post("/users/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, user.email)
-    if not db_user or not hashing.Hash.verify_password(user.password, db_user.password_hash):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(crud.get_user_by_email, db, user.email)
+    if not db_user:
         raise HTTPException(status_code=404, detail="Invalid email or password")
-    return {"message": "Login success", "token": db_user.id}
+    try:
+        valid, new_hash = await hashing.Hash.verify_and_update_async(user.password, db_user.password_hash)
+    except hashing.HashingBusy:
+        raise hashing_busy()
+    if not valid:
+        raise HTTPException(status_code=404, detail="Invalid email or password")
+    if new_hash:
+        # Stored hash used older scrypt settings; upgrade it now that we know the password
+        await run_in_threadpool(crud.update_password_hash, db, db_user, new_hash)
+    auth.remember_user(db_user.id)
+    return {"message": "Login success", "token": auth.create_token(db_user.id), "user_id": db_user.id}
 
 
 # ----------------- HAZARD REPORTING -----------------
 
+def current_user_id(authorization: Optional[str] = Header(None)) -> int:
+    """
+    Reads 'Authorization: Bearer <token>' and returns the signed user id.
+    Checked locally with HMAC, no database round trip.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    user_id = auth.verify_token(token) if scheme.lower() == "bearer" else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return user_id
+
+
 @app.post("/report/fast", response_model=ReportResponse)
-def create_report(report: ReportCreate, user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+def create_report(report: ReportCreate, user_id: int = Depends(current_user_id), db: Session = Depends(get_db)):
+    try:
+        new = crud.create_new_report(
+            db=db,
+            report_type=report.report_type,
+            lat=report.lat,
+            lon=report.lon,
+            user_id=user_id,
+            city_id=1
+        )
+    except IntegrityError:
+        # Token outlived its user (account deleted): the users FK rejects the insert
+        db.rollback()
         raise HTTPException(status_code=404, detail="User not found")
 
-    new = crud.create_new_report(
-        db=db,
-        report_type=report.report_type,
-        lat=report.lat,
-        lon=report.lon,
-        user_id=user_id,
-        city_id=1
-    )
-
     return ReportResponse(
         id=new.id,
         report_type=new.report_type,
@@ -129,115 +294,576 @@ def create_report(report: ReportCreate, user_id: int, db: Session = Depends(get_
     )
 
 
-# ----------------- FIXED /hazards/live -----------------
-
-@app.get("/hazards/live", response_model=List[ReportResponse])
-def get_live_hazards(db: Session = Depends(get_db)):
-    reports = crud.get_live_reports(db, city_id=1)
-    response_list = []
-
-    for rep in reports:
+# Upper bound on items per /report/bulk call, to keep each transaction short
+MAX_BULK_REPORTS = 5000
+# Body size cap, enforced while reading (~400 bytes per item is plenty)
+MAX_BULK_BYTES = MAX_BULK_REPORTS * 400
+
+
+def bulk_submitter(authorization: Optional[str] = Header(None),
+                   x_fleet_key: Optional[str] = Header(None)) -> Optional[int]:
+    """
+    Who may file a /report/bulk batch: a fleet service (X-Fleet-Key header,
+    items carry their own user_id) -> None, or a signed-in user (Bearer
+    token, every item is filed as them) -> their user id.
+    """
+    if x_fleet_key is not None:
+        if not auth.verify_fleet_key(x_fleet_key):
+            raise HTTPException(status_code=401, detail="Invalid fleet key")
+        return None
+    return current_user_id(authorization)
+
+
+def is_ndjson(content_type: str) -> bool:
+    return "ndjson" in content_type or "jsonl" in content_type
+
+
+async def read_bulk_body(request: Request) -> bytes:
+    """
+    Reads the body, stopping with 413 as soon as it is too large. NDJSON
+    bodies are also capped by line count; JSON arrays are counted once parsed,
+    since pretty-printing spreads each report over several lines.
+    """
+    count_lines = is_ndjson(request.headers.get("content-type", ""))
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"At most {MAX_BULK_REPORTS} reports ({MAX_BULK_BYTES} bytes) per request"
+    )
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_BULK_BYTES:
+        raise too_large
+    chunks, size, lines = [], 0, 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if count_lines:
+            # Blank lines count too; a trailing newline is allowed
+            lines += chunk.count(b"\n")
+        if size > MAX_BULK_BYTES or lines > MAX_BULK_REPORTS:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> list:
+    """
+    Returns one entry per submitted item: the decoded JSON object, or a
+    ValueError for NDJSON lines that aren't valid JSON.
+    """
+    if is_ndjson(content_type):
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f"Invalid JSON: {e}"))
+        return items
+
+    data = json.loads(body)
+    if isinstance(data, dict) and isinstance(data.get("reports"), list):
+        data = data["reports"]
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of reports")
+    return data
+
+
+def ingest_bulk_reports(db: Session, raw_items: list, submitter_id: Optional[int] = None) -> BulkReportResponse:
+    """
+    submitter_id: the token's user, who every item is filed as; None for
+    fleet callers, whose items must name their user_id.
+    """
+    results = [None] * len(raw_items)
+    valid = []  # (index, BulkReportItem)
+
+    def reject(i: int, detail: str):
+        results[i] = BulkReportResult(index=i, status="rejected", detail=detail)
+
+    for i, raw in enumerate(raw_items):
+        if isinstance(raw, ValueError):
+            reject(i, str(raw))
+            continue
         try:
-            lat = db.query(func.ST_Y(func.ST_AsText(rep.location))).scalar()
-            lon = db.query(func.ST_X(func.ST_AsText(rep.location))).scalar()
-
-            if lat is None or lon is None:
+            item = BulkReportItem.model_validate(raw)
+        except ValidationError as e:
+            err = e.errors()[0]
+            field = ".".join(str(p) for p in err["loc"])
+            reject(i, f"{field}: {err['msg']}")
+            continue
+        if submitter_id is not None:
+            if item.user_id not in (None, submitter_id):
+                reject(i, "user_id: can only file reports as the signed-in user")
                 continue
-
-            response_list.append(
-                ReportResponse(
-                    id=rep.id,
-                    report_type=rep.report_type,
-                    lat=lat,
-                    lon=lon
-                )
-            )
-        except Exception as e:
-            print("Error converting hazard:", e)
+            item.user_id = submitter_id
+        elif item.user_id is None:
+            reject(i, "user_id: Field required")
             continue
+        valid.append((i, item))
+
+    # Ids seen recently skip the DB; the rest are checked in one query
+    user_ids = {item.user_id for _, item in valid}
+    known_users = {uid for uid in user_ids if auth.is_known_user(uid)}
+    for user_id in crud.get_existing_user_ids(db, user_ids - known_users):
+        auth.remember_user(user_id)
+        known_users.add(user_id)
+
+    def insert(accepted_users: set) -> list:
+        accepted = []
+        for i, item in valid:
+            if item.user_id in accepted_users:
+                accepted.append((i, item))
+            else:
+                reject(i, "User not found")
+        new_ids = crud.create_reports_bulk(db, [item.model_dump() for _, item in accepted], city_id=1)
+        return list(zip(accepted, new_ids))
 
-    return response_list
+    try:
+        created = insert(known_users)
+    except IntegrityError:
+        # A cached user id outlived its account: the users FK failed the batch.
+        # Check every id against the DB and retry without the missing ones.
+        db.rollback()
+        existing = set(crud.get_existing_user_ids(db, known_users))
+        for user_id in known_users - existing:
+            auth.forget_user(user_id)
+        created = insert(existing)
+
+    for (i, _), new_id in created:
+        results[i] = BulkReportResult(index=i, status="created", id=new_id)
+
+    return BulkReportResponse(
+        created=len(created),
+        rejected=len(raw_items) - len(created),
+        results=results
+    )
 
 
-# ----------------- STATIC HAZARDS -----------------
+@app.post("/report/bulk", response_model=BulkReportResponse)
+async def create_reports_bulk(request: Request, submitter_id: Optional[int] = Depends(bulk_submitter),
+                              db: Session = Depends(get_db)):
+    """
+    Accepts a JSON array (or {"reports": [...]}) or an NDJSON body
+    (Content-Type: application/x-ndjson) of reports with report_type, lat
+    and lon. With a Bearer token every report is filed as that user; with
+    an X-Fleet-Key each report names its user_id. Everything valid is
+    inserted in one transaction; the response has a status per item.
+    """
+    body = await read_bulk_body(request)
+    try:
+        raw_items = parse_bulk_body(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(raw_items) > MAX_BULK_REPORTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_REPORTS} reports per request")
 
-@app.get("/hazards/static", response_model=List[FloodHotspotResponse])
-def get_static_hazards(db: Session = Depends(get_db)):
-    spots = crud.get_static_hazards(db, city_id=1)
-    out = []
+    return await run_in_threadpool(ingest_bulk_reports, db, raw_items, submitter_id)
 
-    for s in spots:
-        lat = db.query(func.ST_Y(func.ST_AsText(s.location))).scalar()
-        lon = db.query(func.ST_X(func.ST_AsText(s.location))).scalar()
-        out.append(FloodHotspotResponse(
-            id=s.id,
-            description=s.description,
-            lat=lat,
-            lon=lon
-        ))
 
-    return out
+# ----------------- VIEWPORT + PAGING -----------------
 
+# Largest page /hazards/live and /hazards/static hand out per request
+MAX_HAZARD_PAGE = 5000
 
-# ----------------- ROUTE + AI RISK -----------------
 
-@app.post("/route/predict-risk", response_model=RouteResponse)
-def predict_route_risk(req: RouteRequest, db: Session = Depends(get_db)):
+def viewport_bbox(bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat")):
+    try:
+        return viewport.parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-    start = routing.get_coords_from_address(req.start_address)
-    end = routing.get_coords_from_address(req.end_address)
 
-    if not start:
-        raise HTTPException(404, f"Location not found: {req.start_address}")
-    if not end:
-        raise HTTPException(404, f"Location not found: {req.end_address}")
+def set_next_cursor(response: Response, rows: list, limit: Optional[int]):
+    # A full page means there may be more; the client passes this back as after_id
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-After-Id"] = str(rows[-1].id)
 
-    routes = routing.get_routes_from_osrm(start['lat'], start['lon'], end['lat'], end['lon'])
-    if not routes:
-        raise HTTPException(404, "No route found")
 
-    original = routes[0]["geometry"]
+# ----------------- FIXED /hazards/live -----------------
 
-    report_count = crud.get_reports_near_route(db, original, city_id=1)
-    w = weather.get_current_weather(start["lat"], start["lon"])
-    static_score = crud.get_sample_road_score(db, city_id=1)
-    hour = datetime.now().hour
+@app.get("/hazards/live", response_model=List[ReportResponse])
+def get_live_hazards(
+    response: Response,
+    bbox: Optional[viewport.BBox] = Depends(viewport_bbox),
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HAZARD_PAGE),
+    db: Session = Depends(get_db)
+):
+    """
+    Live reports, optionally only those inside `bbox`. With `limit`, results
+    are ordered by id and the X-Next-After-Id header carries the next cursor.
+    """
+    # id, type and coordinates come back from a single SELECT
+    rows = list(crud.get_live_report_points(db, city_id=1, bbox=bbox, after_id=after_id, limit=limit))
+    set_next_cursor(response, rows, limit)
+    return [
+        ReportResponse(id=row.id, report_type=row.report_type, lat=row.lat, lon=row.lon)
+        for row in rows
+        if row.lat is not None and row.lon is not None
+    ]
+
+
+@app.get("/hazards/live/clusters", response_model=List[HazardCluster])
+def get_live_hazard_clusters(
+    zoom: int = Query(..., ge=0, le=viewport.MAX_ZOOM),
+    bbox: Optional[viewport.BBox] = Depends(viewport_bbox),
+    db: Session = Depends(get_db)
+):
+    """Live reports bucketed into a zoom-sized grid, one (lat, lon, count) per bucket."""
+    rows = crud.get_live_report_clusters(db, city_id=1, cell_deg=viewport.cluster_cell_deg(zoom), bbox=bbox)
+    return [HazardCluster(lat=row.lat, lon=row.lon, count=row.count) for row in rows]
+
+
+# ----------------- LIVE HAZARD STREAM -----------------
+
+@app.get("/hazards/stream")
+async def stream_live_hazards():
+    """
+    Server-Sent Events feed of live hazards:
+      event: snapshot  data: [hazard, ...]   (once, on connect)
+      event: add       data: [hazard, ...]
+      event: expire    data: [id, ...]
+    Hazards have the same fields as /hazards/live.
+    """
+    queue = hazard_broadcaster.subscribe()
+
+    async def events():
+        try:
+            # Served from the in-memory index, no DB read per viewer
+            snapshot = spatial_index.live_reports.snapshot(city_id=1)
+            yield hazard_events.format_sse("snapshot", [hazard_events.hazard_payload(r) for r in snapshot])
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            hazard_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ----------------- STATIC HAZARDS -----------------
+
+@app.get("/hazards/static", response_model=List[FloodHotspotResponse])
+def get_static_hazards(
+    response: Response,
+    bbox: Optional[viewport.BBox] = Depends(viewport_bbox),
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HAZARD_PAGE),
+    db: Session = Depends(get_db)
+):
+    """Flood hotspots; takes the same bbox / after_id / limit parameters as /hazards/live."""
+    rows = list(crud.get_static_hazard_points(db, city_id=1, bbox=bbox, after_id=after_id, limit=limit))
+    set_next_cursor(response, rows, limit)
+    return [
+        FloodHotspotResponse(id=row.id, description=row.description, lat=row.lat, lon=row.lon)
+        for row in rows
+    ]
+
+
+@app.get("/hazards/static/clusters", response_model=List[HazardCluster])
+def get_static_hazard_clusters(
+    zoom: int = Query(..., ge=0, le=viewport.MAX_ZOOM),
+    bbox: Optional[viewport.BBox] = Depends(viewport_bbox),
+    db: Session = Depends(get_db)
+):
+    rows = crud.get_static_hazard_clusters(db, city_id=1, cell_deg=viewport.cluster_cell_deg(zoom), bbox=bbox)
+    return [HazardCluster(lat=row.lat, lon=row.lon, count=row.count) for row in rows]
 
-    df = pd.DataFrame({
-        "static_hazard_score": [static_score],
-        "active_reports": [report_count],
-        "is_raining": [1 if w["is_raining"] else 0],
-        "hour_of_day": [hour]
-    })
 
-    prediction = ai_model.predict(df)[0]
-    high_risk = (prediction == 1) or (report_count > 0)
+# ----------------- ROUTE + AI RISK -----------------
 
+# Static score for routes that match no known road segment
+DEFAULT_ROAD_SCORE = 5
+
+# Finished responses, reused while the reports near their routes and the
+# start point's weather are unchanged
+route_response_cache = route_cache.RouteResponseCache(
+    spatial_index.live_reports,
+    max_size=int(os.getenv("ROUTE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ROUTE_CACHE_TTL", "600"))
+)
+metrics.watch_cache("route_responses", route_response_cache.stats)
+
+
+def route_segment_scores(db: Session, routes: list) -> list:
+    """(length-weighted, max) static_hazard_score for each route's own segments, in one query."""
+    return crud.get_route_segment_scores_many(db, [r["geometry"] for r in routes], city_id=1)
+
+
+def count_route_reports(routes: list):
+    """(HazardStamp, live report count per route), both from the in-memory index."""
+    lines = [(r["geometry"] or {}).get("coordinates", []) for r in routes]
+    # Taken before counting, so a report added meanwhile invalidates cached results
+    stamp = spatial_index.live_reports.stamp(lines, spatial_index.HAZARD_RADIUS_M)
+    counts = [
+        spatial_index.live_reports.count_near_line(line, spatial_index.HAZARD_RADIUS_M, city_id=1)
+        for line in lines
+    ]
+    return stamp, counts
+
+
+def route_feature_rows(segment_scores: list, report_counts: list, w: dict, hour: int) -> list:
+    """
+    One row per OSRM route, in inference.FEATURES order. The model's
+    static_hazard_score is the route's length-weighted segment score.
+    """
+    is_raining = 1 if w["is_raining"] else 0
+    return [
+        (DEFAULT_ROAD_SCORE if weighted is None else round(weighted), count, is_raining, hour)
+        for (weighted, _), count in zip(segment_scores, report_counts)
+    ]
+
+
+def build_route_data(route: dict, high_risk: bool, report_count: int, w: dict,
+                     max_segment_score: Optional[int] = None, geometry_format: str = "geojson") -> RouteData:
     reason = "Risk: Low. Route looks clear."
     if high_risk:
         reason = f"Risk: High. {report_count} report(s). Weather temp {w['temp']}°C"
+        if max_segment_score is not None:
+            reason += f". Worst road segment {max_segment_score}/10"
 
-    orig = routes[0]
-    orig_data = RouteData(
+    return RouteData(
         risk_score=1 if high_risk else 0,
         reason=reason,
-        distance_km=round(orig["distance"] / 1000, 1),
-        duration_min=round(orig["duration"] / 60, 0),
-        geometry=orig["geometry"]
+        distance_km=round(route["distance"] / 1000, 1),
+        duration_min=round(route["duration"] / 60, 0),
+        # Hazard matching above used the full geometry; this copy is only for display
+        geometry=geometry.display_geometry(route["geometry"], geometry_format)
     )
 
-    alt_data = None
-    if len(routes) > 1:
-        alt = routes[1]
-        alt_data = RouteData(
-            risk_score=0,
-            reason="Alternative route",
-            distance_km=round(alt["distance"] / 1000, 1),
-            duration_min=round(alt["duration"] / 60, 0),
-            geometry=alt["geometry"]
-        )
 
-    if high_risk and alt_data:
-        return RouteResponse(original_route=alt_data, alternative_route=orig_data)
+def rank_routes(routes: list, predictions: list, report_counts: list, segment_scores: list, w: dict,
+                geometry_format: str) -> RouteResponse:
+    scored = [
+        (build_route_data(route, high_risk=(pred == 1) or (count > 0), report_count=count, w=w,
+                          max_segment_score=max_score, geometry_format=geometry_format), route["duration"])
+        for route, pred, count, (_, max_score) in zip(routes, predictions, report_counts, segment_scores)
+    ]
+    # Safest first, then fastest among equally risky routes
+    ranked = [data for data, _ in sorted(scored, key=lambda s: (s[0].risk_score, s[1]))]
+    return RouteResponse(
+        original_route=ranked[0],
+        alternative_route=ranked[1] if len(ranked) > 1 else None,
+        more_routes=ranked[2:]
+    )
+
 
-    return RouteResponse(original_route=orig_data, alternative_route=alt_data)
+def json_response(body: bytes, timer: StageTimer) -> Response:
+    return Response(body, media_type="application/json", headers={"Server-Timing": timer.server_timing()})
+
+
+@app.post("/route/predict-risk", response_model=RouteResponse)
+async def predict_route_risk(req: RouteRequest, db: Session = Depends(get_db)):
+    # Independent lookups are fanned out concurrently, so latency tracks the
+    # slowest dependency instead of the sum of all of them:
+    #
+    #   geocode start ──┬── weather(start)
+    #   geocode end   ──┴── route cache ── OSRM ──┬── hazard count (in memory)
+    #                                             └── road segment scores (DB, threadpool)
+    timer = StageTimer()
+
+    async def weather_for_start():
+        coords = await start_task
+        if not coords:
+            return None
+        return await timer.run("weather", weather.get_current_weather(coords["lat"], coords["lon"]))
+
+    start_task = asyncio.create_task(timer.run("geocode_start", routing.get_coords_from_address(req.start_address)))
+    end_task = asyncio.create_task(timer.run("geocode_end", routing.get_coords_from_address(req.end_address)))
+    weather_task = asyncio.create_task(weather_for_start())
+    pending = [start_task, end_task, weather_task]
+
+    try:
+        start, end = await asyncio.gather(start_task, end_task)
+
+        if not start:
+            raise HTTPException(404, f"Location not found: {req.start_address}")
+        if not end:
+            raise HTTPException(404, f"Location not found: {req.end_address}")
+
+        hour = datetime.now().hour
+        cache_key = route_response_cache.key(start, end, hour, req.geometry_format)
+        with timer.stage("route_cache"):
+            cached = route_response_cache.get(cache_key)
+        if cached is not None:
+            w = await weather_task
+            if cached.weather_epoch == weather.weather_cache.epoch(start["lat"], start["lon"]):
+                return json_response(cached.body, timer)
+
+        routes = await timer.run("osrm", routing.get_routes_from_osrm(start['lat'], start['lon'], end['lat'], end['lon']))
+        if not routes:
+            raise HTTPException(404, "No route found")
+
+        segment_task = asyncio.create_task(timer.run("road_score", run_in_threadpool(route_segment_scores, db, routes)))
+        pending.append(segment_task)
+
+        # Answered from the in-memory index, no PostGIS scan on the hot path
+        with timer.stage("hazard_count"):
+            hazard_stamp, report_counts = count_route_reports(routes)
+        w, segment_scores = await asyncio.gather(weather_task, segment_task)
+        weather_epoch = weather.weather_cache.epoch(start["lat"], start["lon"])
+    finally:
+        # Don't leave upstream calls running for a request that already failed
+        for task in pending:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # mark any failure as retrieved
+
+    # All of the routes are scored in one batch
+    rows = route_feature_rows(segment_scores, report_counts, w, hour)
+    predictions = await timer.run("predict", congestion_batcher.predict_many(rows))
+
+    result = rank_routes(routes, predictions, report_counts, segment_scores, w, req.geometry_format)
+    # Encoded once; cache hits send these bytes as they are
+    body = result.model_dump_json().encode()
+    route_response_cache.set(cache_key, body, hazard_stamp, weather_epoch)
+    return json_response(body, timer)
+
+
+# ----------------- BATCH ROUTE RISK -----------------
+
+MAX_BATCH_PAIRS = 200
+# OSRM requests in flight per batch; the public demo server rate-limits hard
+BATCH_OSRM_CONCURRENCY = 8
+
+
+def batch_segment_scores(routes: list) -> list:
+    # The stream outlives the request's get_db() session, so use our own
+    db = SessionLocal()
+    try:
+        return route_segment_scores(db, routes)
+    finally:
+        db.close()
+
+
+def ndjson_line(index: int, status: int, result: Optional[bytes] = None, detail: Optional[str] = None) -> bytes:
+    if result is not None:
+        # result is already-encoded RouteResponse JSON (possibly from the route cache)
+        return b'{"index":%d,"status":%d,"result":%s}\n' % (index, status, result)
+    return (json.dumps({"index": index, "status": status, "detail": detail}) + "\n").encode()
+
+
+@app.post("/route/predict-risk/batch")
+async def predict_route_risk_batch(req: RouteBatchRequest):
+    """
+    Scores many start/end pairs. Streams NDJSON, one line per pair in
+    completion order:
+      {"index": i, "status": 200, "result": <RouteResponse>}
+      {"index": i, "status": 404, "detail": "..."}
+
+    Each distinct address is geocoded once, each distinct start gets one
+    weather lookup and each distinct coordinate pair one OSRM call (at most
+    BATCH_OSRM_CONCURRENCY at a time). Pairs whose routes arrive together
+    are scored together: one segment query and one model predict per wave.
+    """
+    if len(req.pairs) > MAX_BATCH_PAIRS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_PAIRS} pairs per batch")
+
+    hour = datetime.now().hour
+    osrm_slots = asyncio.Semaphore(BATCH_OSRM_CONCURRENCY)
+    geocodes, weathers, osrm_calls = {}, {}, {}
+
+    def shared(tasks: dict, key, make):
+        # One task per distinct key, awaited by every pair that needs it
+        if key not in tasks:
+            tasks[key] = asyncio.create_task(make())
+        return tasks[key]
+
+    async def limited_osrm(start, end):
+        async with osrm_slots:
+            return await routing.get_routes_from_osrm(start["lat"], start["lon"], end["lat"], end["lon"])
+
+    async def resolve(index: int, pair: RoutePair):
+        """Returns (index, ndjson line) when done, or (index, routing context) to be scored."""
+        try:
+            start_task = shared(geocodes, pair.start_address, lambda: routing.get_coords_from_address(pair.start_address))
+            end_task = shared(geocodes, pair.end_address, lambda: routing.get_coords_from_address(pair.end_address))
+            start, end = await start_task, await end_task
+            if not start:
+                return index, ndjson_line(index, 404, detail=f"Location not found: {pair.start_address}")
+            if not end:
+                return index, ndjson_line(index, 404, detail=f"Location not found: {pair.end_address}")
+
+            w = await shared(weathers, pair.start_address, lambda: weather.get_current_weather(start["lat"], start["lon"]))
+            weather_epoch = weather.weather_cache.epoch(start["lat"], start["lon"])
+            cache_key = route_response_cache.key(start, end, hour, req.geometry_format)
+            cached = route_response_cache.get(cache_key)
+            if cached is not None and cached.weather_epoch == weather_epoch:
+                return index, ndjson_line(index, 200, result=cached.body)
+
+            routes = await shared(osrm_calls, cache_key, lambda: limited_osrm(start, end))
+            if not routes:
+                return index, ndjson_line(index, 404, detail="No route found")
+            return index, {"routes": routes, "w": w, "weather_epoch": weather_epoch, "cache_key": cache_key}
+        except Exception as e:
+            metrics.BACKGROUND_ERRORS.labels("batch_route").inc()
+            print("Batch route error:", e)
+            return index, ndjson_line(index, 500, detail="Internal error")
+
+    async def score_wave(ready: list) -> list:
+        """Scores every pair whose routes are in; one line per pair."""
+        all_routes = [r for _, ctx in ready for r in ctx["routes"]]
+        stamps, counts = [], []
+        for _, ctx in ready:
+            stamp, pair_counts = count_route_reports(ctx["routes"])
+            stamps.append(stamp)
+            counts.extend(pair_counts)
+        segment_scores = await run_in_threadpool(batch_segment_scores, all_routes)
+
+        rows, offset = [], 0
+        for _, ctx in ready:
+            n = len(ctx["routes"])
+            rows += route_feature_rows(segment_scores[offset:offset + n], counts[offset:offset + n], ctx["w"], hour)
+            offset += n
+        predictions = await congestion_batcher.predict_many(rows)
+
+        lines, offset = [], 0
+        for (index, ctx), stamp in zip(ready, stamps):
+            n = len(ctx["routes"])
+            window = slice(offset, offset + n)
+            offset += n
+            result = rank_routes(ctx["routes"], predictions[window], counts[window], segment_scores[window],
+                                 ctx["w"], req.geometry_format)
+            body = result.model_dump_json().encode()
+            route_response_cache.set(ctx["cache_key"], body, stamp, ctx["weather_epoch"])
+            lines.append(ndjson_line(index, 200, result=body))
+        return lines
+
+    async def results():
+        pending = {asyncio.create_task(resolve(i, pair)) for i, pair in enumerate(req.pairs)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                ready = []
+                for task in done:
+                    index, outcome = task.result()
+                    if isinstance(outcome, bytes):
+                        yield outcome
+                    else:
+                        ready.append((index, outcome))
+                if ready:
+                    try:
+                        lines = await score_wave(ready)
+                    except Exception as e:
+                        metrics.BACKGROUND_ERRORS.labels("batch_scoring").inc()
+                        print("Batch scoring error:", e)
+                        lines = [ndjson_line(index, 500, detail="Internal error") for index, _ in ready]
+                    for line in lines:
+                        yield line
+        finally:
+            # Client went away or we are done: stop any upstream calls still running
+            for task in [*pending, *geocodes.values(), *weathers.values(), *osrm_calls.values()]:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, SmallInteger, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, SmallInteger, Float, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from geoalchemy2 import Geography
 from sqlalchemy.sql import func
@@ -41,3 +41,90 @@ class Report(Base):
     report_type = Column(String(50), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True))
+
+    # Geography columns get a GiST index from GeoAlchemy2 automatically
+    __table_args__ = (
+        Index("idx_reports_city_expires", "city_id", "expires_at"),
+        # Archiving scans expired rows of every city in expiry order
+        Index("idx_reports_expires_at", "expires_at"),
+    )
+
+class ReportArchive(Base):
+    # Expired rows moved out of 'reports' by crud.archive_expired_reports
+    __tablename__ = "reports_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer)
+    city_id = Column(Integer)
+    location = Column(Geography(geometry_type='POINT', srid=4326, spatial_index=False))
+    report_type = Column(String(50), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class PotholeDetection(Base):
+    # Model detections (detect_potholes.py, backfill_potholes.py); aggregated
+    # into road_segments.static_hazard_score by crud.aggregate_pothole_detections
+    __tablename__ = "pothole_detections"
+    id = Column(BigInteger, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id"))
+    location = Column(Geography(geometry_type='POINT', srid=4326))
+    confidence = Column(Float, nullable=False)
+    detected_at = Column(DateTime(timezone=True), nullable=False)
+    # Where it came from (image path, video frame); re-imports of the same source are skipped
+    source_key = Column(String(512), unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Nearest road segment, filled in by the aggregation job (NULL: none within range)
+    segment_id = Column(Integer, ForeignKey("road_segments.id"))
+
+class SegmentHazardStats(Base):
+    # Running per-segment totals kept by the aggregation job
+    __tablename__ = "segment_hazard_stats"
+    segment_id = Column(Integer, ForeignKey("road_segments.id"), primary_key=True)
+    detection_count = Column(Integer, nullable=False, default=0)
+    # Sum of detection confidences, each halved every half-life since it was seen,
+    # as of severity_at
+    severity = Column(Float, nullable=False, default=0.0)
+    severity_at = Column(DateTime(timezone=True), nullable=False)
+    # The segment's manual score when detections first touched it; the
+    # published score never drops below it
+    base_score = Column(SmallInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("idx_segment_hazard_stats_severity_at", "severity_at"),
+    )
+
+class JobWatermark(Base):
+    # Highest source row id an incremental job has processed
+    __tablename__ = "job_watermarks"
+    job = Column(String(100), primary_key=True)
+    last_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WeatherObservation(Base):
+    # Weather readings kept for model training (train_model.py)
+    __tablename__ = "weather_observations"
+    id = Column(BigInteger, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id"))
+    observed_at = Column(DateTime(timezone=True), nullable=False)
+    is_raining = Column(Boolean, nullable=False)
+    temp = Column(Float)
+
+    __table_args__ = (
+        Index("idx_weather_observations_observed_at", "observed_at"),
+    )
+
+class RouteOutcome(Base):
+    # A predicted route and how long the trip really took; the training label
+    # for train_model.py. Feature values are the ones used at prediction time.
+    __tablename__ = "route_outcomes"
+    id = Column(BigInteger, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id"))
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    static_hazard_score = Column(SmallInteger)   # route's length-weighted segment score
+    active_reports = Column(Integer)             # live reports along the route
+    expected_duration_s = Column(Float)          # OSRM estimate
+    actual_duration_s = Column(Float)            # NULL until the trip is reported back
+
+    __table_args__ = (
+        Index("idx_route_outcomes_started_at", "started_at"),
+    )
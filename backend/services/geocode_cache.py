@@ -0,0 +1,139 @@
+# services/geocode_cache.py
+# Two-tier cache for Nominatim lookups.
+#
+#   1. A bounded in-process LRU with TTL (services.cache.TTLCache)
+#   2. An optional SQLite file shared by every uvicorn worker on the host,
+#      which also survives restarts so deploys don't start with a cold cache
+#
+# "No result" answers are cached too (with a shorter TTL), because Nominatim
+# allows us roughly one request per second and misses cost as much as hits.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+from services import metrics
+from services.cache import TTLCache, MISSING
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL", str(7 * 24 * 3600)))
+NEGATIVE_TTL_SECONDS = float(os.getenv("GEOCODE_NEGATIVE_TTL", "3600"))
+# SQLite file shared by the API workers, e.g. /var/lib/traffix/geocode_cache.db.
+# Unset or empty keeps the cache in memory only.
+CACHE_DB_PATH = os.getenv("GEOCODE_CACHE_DB", "")
+
+# geocode_with_retry appends ", Delhi, India" itself, so user input that already
+# ends with the city/country should share a key with the bare place name
+_REDUNDANT_SUFFIXES = (", india", ", new delhi", ", delhi")
+
+
+def normalize_address(address: str) -> str:
+    key = re.sub(r"\s+", " ", address.strip().lower())
+    key = re.sub(r"\s*,\s*", ", ", key).strip(", ")
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in _REDUNDANT_SUFFIXES:
+            if key.endswith(suffix) and len(key) > len(suffix):
+                key = key[: -len(suffix)].rstrip(", ")
+                stripped = True
+    return key
+
+
+class SQLiteTier:
+    """Shared on-disk tier. Rows with NULL lat/lon are cached negative results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        # WAL lets several worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str):
+        """Returns (value, seconds_left) or (MISSING, 0)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lon, expires_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+        seconds_left = row[2] - time.time() if row else 0
+        if seconds_left <= 0:
+            return MISSING, 0
+        if row[0] is None:
+            return None, seconds_left
+        return (row[0], row[1]), seconds_left
+
+    def set(self, key: str, coords: Optional[Tuple[float, float]], ttl: float):
+        lat, lon = coords if coords else (None, None)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, lat, lon, expires_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lon, time.time() + ttl)
+            )
+
+
+class GeocodeCache:
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL_SECONDS,
+                 negative_ttl: float = NEGATIVE_TTL_SECONDS, db_path: Optional[str] = CACHE_DB_PATH):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = TTLCache(max_size=max_size, ttl=ttl)
+        self.disk = None
+        self.disk_hits = 0
+        if db_path:
+            try:
+                self.disk = SQLiteTier(db_path)
+            except sqlite3.Error as e:
+                logger.warning("Geocode disk cache disabled (%s): %s", db_path, e)
+
+    def get(self, address: str):
+        """
+        Returns (lat, lon), None for a cached "not found", or MISSING.
+        """
+        key = normalize_address(address)
+        value = self.memory.get(key)
+        if value is not MISSING or self.disk is None:
+            return value
+        try:
+            value, seconds_left = self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.warning("Geocode disk cache read failed: %s", e)
+            return MISSING
+        if value is not MISSING:
+            self.disk_hits += 1
+            # Promote into memory for whatever lifetime the disk row has left
+            self.memory.set(key, value, ttl=seconds_left)
+        return value
+
+    def set(self, address: str, coords: Optional[Tuple[float, float]]):
+        key = normalize_address(address)
+        ttl = self.ttl if coords else self.negative_ttl
+        self.memory.set(key, coords, ttl=ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, coords, ttl)
+            except sqlite3.Error as e:
+                logger.warning("Geocode disk cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        return stats
+
+
+geocode_cache = GeocodeCache()
+metrics.watch_cache("geocode", geocode_cache.stats)
@@ -0,0 +1,118 @@
+# services/geometry.py
+# Compact route geometry for API responses.
+#
+# OSRM's overview=full LineStrings carry thousands of points, far more than a
+# map needs. For display they are simplified with Douglas-Peucker and can be
+# sent as an encoded polyline (Google's format, 1e-5 degree precision), which
+# is roughly 5-6 bytes per point instead of ~40 for a GeoJSON pair.
+# Hazard matching always uses the full-resolution geometry.
+
+from typing import List, Sequence
+
+import numpy as np
+
+from services.spatial_index import METERS_PER_DEG_LAT
+
+# Max deviation from the full route, in meters; well under a line's width on screen
+DISPLAY_TOLERANCE_M = 5.0
+
+
+def simplify(coordinates: Sequence[Sequence[float]], tolerance_m: float = DISPLAY_TOLERANCE_M) -> List[List[float]]:
+    """
+    Douglas-Peucker simplification of GeoJSON [lon, lat] pairs. Every dropped
+    point lies within tolerance_m of the simplified line.
+    """
+    n = len(coordinates)
+    if n <= 2 or tolerance_m <= 0:
+        return [list(c) for c in coordinates]
+
+    pts = np.asarray(coordinates, dtype=np.float64)[:, :2]
+    # Local equirectangular projection to meters, like spatial_index
+    kx = METERS_PER_DEG_LAT * np.cos(np.radians(pts[:, 1].mean()))
+    x = (pts[:, 0] - pts[0, 0]) * kx
+    y = (pts[:, 1] - pts[0, 1]) * METERS_PER_DEG_LAT
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    # Explicit stack: long routes would overflow Python's recursion limit
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        seg_len_sq = dx * dx + dy * dy
+        if seg_len_sq == 0:
+            dist = np.hypot(px, py)
+        else:
+            # Distance to the segment (not the infinite line), so loops are kept
+            t = np.clip((px * dx + py * dy) / seg_len_sq, 0.0, 1.0)
+            dist = np.hypot(px - t * dx, py - t * dy)
+        i = int(dist.argmax())
+        if dist[i] > tolerance_m:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return pts[keep].tolist()
+
+
+def _encode_value(value: int, out: List[str]):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_polyline(coordinates: Sequence[Sequence[float]], precision: int = 5) -> str:
+    """Encodes GeoJSON [lon, lat] pairs as a polyline string (lat first, as the format requires)."""
+    factor = 10 ** precision
+    out: List[str] = []
+    prev_lat = prev_lon = 0
+    for lon, lat, *_ in coordinates:
+        lat_i, lon_i = int(round(lat * factor)), int(round(lon * factor))
+        _encode_value(lat_i - prev_lat, out)
+        _encode_value(lon_i - prev_lon, out)
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(out)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[List[float]]:
+    """Inverse of encode_polyline; returns GeoJSON [lon, lat] pairs."""
+    factor = 10 ** precision
+    coords = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coords.append([lon / factor, lat / factor])
+    return coords
+
+
+def display_geometry(geometry: dict, geometry_format: str, tolerance_m: float = DISPLAY_TOLERANCE_M):
+    """
+    Route geometry as sent to clients:
+      "geojson"    - the full LineString, unchanged
+      "simplified" - a simplified LineString
+      "polyline"   - the simplified line as an encoded polyline string
+    """
+    if geometry_format == "geojson" or not geometry or not geometry.get("coordinates"):
+        return geometry
+    coords = simplify(geometry["coordinates"], tolerance_m)
+    if geometry_format == "polyline":
+        return encode_polyline(coords)
+    return {"type": "LineString", "coordinates": coords}
@@ -0,0 +1,93 @@
+# services/hazard_events.py
+# Fan-out of live hazard changes to streaming (SSE) clients.
+#
+# The report index (services.spatial_index) tells us when reports are added or
+# expire; each change is JSON-encoded ONCE here and pushed to every connected
+# viewer's queue. Viewers therefore cost O(new events), not a full re-read of
+# the city's hazards every few seconds.
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per viewer before it is considered too slow and disconnected
+# (the client reconnects and gets a fresh snapshot)
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def hazard_payload(rep) -> Dict:
+    """Same fields as /hazards/live (main.ReportResponse)."""
+    return {"id": rep.id, "report_type": rep.report_type, "lat": rep.lat, "lon": rep.lon}
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class HazardBroadcaster:
+    def __init__(self, city_id: Optional[int] = None):
+        # Only reports for this city are streamed (None = all cities)
+        self.city_id = city_id
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.events_published = 0
+        self.subscribers_dropped = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Binds to the app's event loop; called once at startup."""
+        self._loop = loop
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def on_index_change(self, kind: str, reports: List):
+        """
+        Listener for LiveReportIndex.add_listener. May be called from worker
+        threads (crud runs in the threadpool), so hand over to the loop.
+        """
+        if self.city_id is not None:
+            reports = [r for r in reports if r.city_id == self.city_id]
+        if not reports or self._loop is None or self._loop.is_closed():
+            return
+        if kind == "add":
+            message = format_sse("add", [hazard_payload(r) for r in reports])
+        else:
+            message = format_sse("expire", [r.id for r in reports])
+        try:
+            self._loop.call_soon_threadsafe(self._publish, message)
+        except RuntimeError:
+            pass  # loop shutting down
+
+    def _publish(self, message: Optional[str]):
+        self.events_published += 1
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Drop the slow viewer; None tells its stream to end
+                self._subscribers.discard(queue)
+                self.subscribers_dropped += 1
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def close(self):
+        """Ends every open stream (app shutdown)."""
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                queue.get_nowait()
+                queue.put_nowait(None)
+        self._subscribers.clear()
@@ -0,0 +1,94 @@
+# services/http_client.py
+# One shared async HTTP client for every upstream (OSRM, Nominatim, OpenWeather).
+#
+# Keeping a single httpx.AsyncClient means TCP/TLS connections are reused
+# (keep-alive) instead of reconnecting on every call, and requests wait on the
+# event loop rather than holding a worker thread. Each upstream host also gets
+# its own concurrency limit so one slow service can't eat the whole pool.
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services import metrics
+
+DEFAULT_TIMEOUT = httpx.Timeout(8.0, connect=3.0)
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0
+)
+
+# Max in-flight requests per upstream host. Public Nominatim asks for about
+# one request per second, so it gets a much tighter limit than the others.
+DEFAULT_HOST_LIMIT = int(os.getenv("HTTP_DEFAULT_HOST_LIMIT", "16"))
+HOST_LIMITS = {
+    "nominatim.openstreetmap.org": int(os.getenv("NOMINATIM_MAX_CONCURRENCY", "2")),
+}
+
+USER_AGENT = "traffix_app_v1"
+
+_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=POOL_LIMITS,
+            headers={"User-Agent": USER_AGENT}
+        )
+    return _client
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).hostname or ""
+    sem = _host_semaphores.get(host)
+    if sem is None:
+        sem = asyncio.Semaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        _host_semaphores[host] = sem
+    return sem
+
+
+async def get(url: str, params: Optional[dict] = None, timeout: Optional[float] = None,
+              headers: Optional[dict] = None, service: str = "other") -> httpx.Response:
+    """
+    GET through the shared pool, respecting the per-host concurrency limit.
+    Raises httpx.HTTPError subclasses just like httpx does. `service` labels
+    the call's latency metrics (nominatim, osrm, weather).
+    """
+    queued = time.perf_counter()
+    async with _host_semaphore(url):
+        started = time.perf_counter()
+        metrics.UPSTREAM_QUEUE_SECONDS.labels(service).observe(started - queued)
+        outcome = "error"
+        try:
+            resp = await get_client().get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=DEFAULT_TIMEOUT if timeout is None else timeout
+            )
+            outcome = f"{resp.status_code // 100}xx"
+            return resp
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        finally:
+            metrics.UPSTREAM_SECONDS.labels(service, outcome).observe(time.perf_counter() - started)
+
+
+async def close():
+    """Closes pooled connections. Called from the app's shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_semaphores.clear()
@@ -0,0 +1,128 @@
+# services/inference.py
+# Low-overhead inference for the congestion model (congestion_model.pkl).
+#
+# XGBClassifier.predict() on a one-row pandas DataFrame spends most of its time
+# on DataFrame construction and validation, not on the 50 trees. Here features
+# go straight into a float32 NumPy array in the fixed training order and are
+# scored with Booster.inplace_predict. MicroBatcher also groups rows from
+# concurrent requests into a single predict call.
+
+import asyncio
+import time
+from typing import List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from services import metrics
+
+# Must match the column order in train_model.py
+FEATURES = ("static_hazard_score", "active_reports", "is_raining", "hour_of_day")
+
+# XGBClassifier.predict() labels a row 1 when P(congestion) > 0.5
+DEFAULT_THRESHOLD = 0.5
+
+
+def feature_matrix(rows: Sequence[Sequence[float]]) -> np.ndarray:
+    """Packs feature rows (in FEATURES order) into a contiguous float32 array."""
+    X = np.asarray(rows, dtype=np.float32)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != len(FEATURES):
+        raise ValueError(f"expected {len(FEATURES)} features per row, got {X.shape[1]}")
+    return X
+
+
+class CongestionModel:
+    def __init__(self, path: str = "congestion_model.pkl", threshold: float = DEFAULT_THRESHOLD):
+        model = joblib.load(path)
+        # Accept either the sklearn wrapper saved by train_model.py or a raw Booster
+        self.booster = model.get_booster() if hasattr(model, "get_booster") else model
+        names = self.booster.feature_names
+        if names and tuple(names) != FEATURES:
+            raise ValueError(f"{path} was trained on {names}, expected {list(FEATURES)}")
+        self.threshold = threshold
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """P(congestion) for each row of a (n, 4) float32 array."""
+        return self.booster.inplace_predict(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """0/1 labels, same as XGBClassifier.predict() on the equivalent DataFrame."""
+        return (self.predict_proba(X) > self.threshold).astype(np.int8)
+
+
+class MicroBatcher:
+    """
+    Collects rows from concurrent callers for up to `max_wait_ms` (or until
+    `max_batch` rows) and scores them with one CongestionModel.predict call.
+    """
+
+    def __init__(self, model: CongestionModel, max_batch: int = 256, max_wait_ms: float = 2.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def predict_many(self, rows: Sequence[Sequence[float]]) -> List[int]:
+        if not rows:
+            return []
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for row in rows:
+            fut = loop.create_future()
+            self._queue.put_nowait((row, fut))
+            futures.append(fut)
+        return list(await asyncio.gather(*futures))
+
+    async def predict(self, row: Sequence[float]) -> int:
+        return (await self.predict_many([row]))[0]
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                # Take whatever is already queued without waiting
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            live = [(row, fut) for row, fut in batch if not fut.done()]
+            if not live:
+                continue
+            metrics.INFERENCE_BATCH_ROWS.observe(len(live))
+            try:
+                with metrics.INFERENCE_SECONDS.time():
+                    preds = self.model.predict(feature_matrix([row for row, _ in live]))
+            except Exception as e:
+                for _, fut in live:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(live)
+            for (_, fut), pred in zip(live, preds):
+                if not fut.done():
+                    fut.set_result(int(pred))
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
@@ -0,0 +1,320 @@
+# services/metrics.py
+# In-process metrics, served by GET /metrics in the Prometheus text format.
+#
+# Counter / Gauge / Histogram follow prometheus_client's API (labels(),
+# inc(), observe(), set_function()) so the backend needs no extra dependency
+# and could switch to the real client without touching call sites.
+# Values live per process: with several uvicorn workers, each one reports
+# its own numbers and the scraper sums them.
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers cache hits (~1 ms) up to upstream timeouts (8 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, "_Family"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, family: "_Family"):
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f"metric {family.name} is already registered")
+            self._families[family.name] = family
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines: List[str] = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.samples():
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # so unlabelled metrics are exported before their first update
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values, **named):
+        if named:
+            values = tuple(named[n] for n in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[Tuple[str, str]], float]]:
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = list(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                yield suffix, labels + extra, value
+
+
+class _Value:
+    """Counter/gauge value; either stored or read from a callback at scrape time."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def set_function(self, fn: Callable[[], float]):
+        self._fn = fn
+
+    def get(self) -> float:
+        if self._fn is not None:
+            return float(self._fn())
+        return self._value
+
+    def samples(self):
+        yield "", [], self.get()
+
+
+class _GaugeValue(_Value):
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = float(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self._upper = list(buckets)
+        self._counts = [0] * (len(self._upper) + 1)  # last one is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._upper, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for upper, count in zip(self._upper + [float("inf")], counts):
+            cumulative += count
+            yield "_bucket", [("le", _format_value(upper))], cumulative
+        yield "_sum", [], total
+        yield "_count", [], cumulative
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self.labels().set_function(fn)
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ----------------- Backend metrics -----------------
+
+HTTP_IN_FLIGHT = Gauge("traffix_http_requests_in_flight", "Requests currently being served")
+HTTP_REQUEST_SECONDS = Histogram(
+    "traffix_http_request_duration_seconds", "Time to last response byte, by route template",
+    ["method", "route", "status"]
+)
+ROUTE_STAGE_SECONDS = Histogram(
+    "traffix_route_stage_seconds", "Route request stages (the Server-Timing entries)", ["stage"]
+)
+
+UPSTREAM_SECONDS = Histogram(
+    "traffix_upstream_request_seconds", "External API calls, from send to response headers",
+    ["service", "outcome"]
+)
+UPSTREAM_QUEUE_SECONDS = Histogram(
+    "traffix_upstream_queue_seconds", "Wait for the per-host concurrency limit", ["service"]
+)
+UPSTREAM_RETRIES = Counter("traffix_upstream_retries_total", "Retried external API calls", ["service"])
+
+DB_QUERY_SECONDS = Histogram("traffix_db_query_seconds", "crud queries, including reading their rows", ["query"])
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "traffix_db_pool_checkout_seconds", "Wait for a pooled DB connection (or a new one)"
+)
+DB_POOL_CONNECTIONS = Gauge("traffix_db_pool_connections", "DB pool connections by state", ["state"])
+
+INFERENCE_SECONDS = Histogram("traffix_inference_seconds", "Congestion model predict calls")
+INFERENCE_BATCH_ROWS = Histogram(
+    "traffix_inference_batch_rows", "Rows per micro-batched predict call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+HASH_SECONDS = Histogram("traffix_password_hash_seconds", "scrypt hash/verify time on the hashing pool")
+HASH_QUEUE_SECONDS = Histogram("traffix_password_hash_queue_seconds", "Wait for a hashing pool thread")
+HASH_REJECTED = Counter("traffix_password_hash_rejected_total", "Auth requests refused because the pool was full")
+
+HAZARD_STREAM_CLIENTS = Gauge("traffix_hazard_stream_clients", "Open /hazards/stream connections")
+BACKGROUND_ERRORS = Counter("traffix_background_errors_total", "Errors caught and logged instead of raised", ["task"])
+
+CACHE_HITS = Counter("traffix_cache_hits_total", "Cache hits (fresh or stale)", ["cache"])
+CACHE_MISSES = Counter("traffix_cache_misses_total", "Cache misses", ["cache"])
+CACHE_HIT_RATIO = Gauge("traffix_cache_hit_ratio", "Hits / lookups since start", ["cache"])
+CACHE_ENTRIES = Gauge("traffix_cache_entries", "Entries currently held", ["cache"])
+
+
+def _hits_misses(stats: dict) -> Tuple[float, float]:
+    # Stale weather answers and geocode disk-tier answers count as hits;
+    # a disk hit was first counted as a memory miss
+    hits = stats["hits"] + stats.get("stale_hits", 0) + stats.get("disk_hits", 0)
+    return hits, stats["misses"] - stats.get("disk_hits", 0)
+
+
+def watch_cache(name: str, stats: Callable[[], dict]):
+    """
+    Exposes a cache's stats() (TTLCache, WeatherCache, GeocodeCache, ...) under
+    traffix_cache_*{cache=name}; the numbers are read at scrape time.
+    """
+    def ratio():
+        hits, misses = _hits_misses(stats())
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    CACHE_HITS.labels(name).set_function(lambda: _hits_misses(stats())[0])
+    CACHE_MISSES.labels(name).set_function(lambda: _hits_misses(stats())[1])
+    CACHE_HIT_RATIO.labels(name).set_function(ratio)
+    CACHE_ENTRIES.labels(name).set_function(lambda: stats()["size"])
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting in-flight requests and timing each one until its
+    last body chunk, labelled with the matched route template (not the raw
+    path) so ids in URLs don't create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,282 @@
+# services/pothole_batch.py
+# Offline pothole detection over large road-survey image archives, for
+# backfilling hazard scores.
+#
+# The sorted image list is cut into shards of about --shard-size files, at
+# points picked by a hash of the path, so adding files to the archive only
+# changes the shards they land in. Shards run on a process pool where each
+# worker loads one PotholeDetector and pins torch/OpenCV to its share of the
+# cores, so N workers don't start N x cores threads. Every finished shard is
+# written as its own part file (Parquet or CSV, one row per detection) and
+# then appended to manifest.jsonl; a rerun skips the shards already listed
+# there, so an interrupted backfill resumes where it stopped. Part files of
+# shards that no longer exist (their file list changed) are deleted, so the
+# parts on disk never overlap.
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import polars as pl
+
+from services import pothole_detection
+
+SHARD_SIZE = 256
+# A shard is cut at this many times SHARD_SIZE even without a hash boundary
+MAX_SHARD_FACTOR = 4
+MANIFEST_NAME = "manifest.jsonl"
+
+# One row per detection; images without detections only show up in the manifest counts
+SCHEMA = {
+    "image": pl.Utf8,
+    "lat": pl.Float64,
+    "lon": pl.Float64,
+    "label": pl.Utf8,
+    "confidence": pl.Float32,
+    "x1": pl.Float32,
+    "y1": pl.Float32,
+    "x2": pl.Float32,
+    "y2": pl.Float32,
+}
+
+
+@dataclass
+class BatchConfig:
+    root: str                       # image archive directory
+    out_dir: str                    # part files + manifest
+    model_path: str = pothole_detection.MODEL_PATH
+    conf: float = 0.4
+    imgsz: int = 640
+    batch_size: int = 8
+    threads_per_worker: int = 1
+    output_format: str = "parquet"  # or "csv"
+    geotags: Optional[Dict[str, Tuple[float, float]]] = None  # relative path -> (lat, lon)
+    # Builds the detector in each worker; must be picklable (a top-level
+    # callable). None means PotholeDetector with the settings above.
+    detector_factory: Optional[Callable[[], object]] = None
+
+
+def list_images(root: str) -> List[str]:
+    """Image paths under root (recursively), relative to it and sorted."""
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in pothole_detection.IMAGE_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(found)
+
+
+def _shard_id(chunk: List[str]) -> str:
+    return hashlib.sha1("\n".join(chunk).encode()).hexdigest()[:16]
+
+
+def make_shards(paths: List[str], shard_size: int = SHARD_SIZE) -> List[Tuple[str, List[str]]]:
+    """
+    (shard id, paths) chunks of about shard_size sorted paths. A shard ends
+    after each path whose hash is 0 mod shard_size (content-defined
+    chunking), not every shard_size positions, so a file added or removed
+    only changes the id of the shard it falls in and the rest are still
+    recognised on resume. The id is a hash of the shard's file list.
+    """
+    shards, chunk = [], []
+    for path in paths:
+        chunk.append(path)
+        boundary = int(hashlib.sha1(path.encode()).hexdigest()[:8], 16) % shard_size == 0
+        # The size cap is positional, but only matters inside unusually long runs
+        if boundary or len(chunk) >= MAX_SHARD_FACTOR * shard_size:
+            shards.append((_shard_id(chunk), chunk))
+            chunk = []
+    if chunk:
+        shards.append((_shard_id(chunk), chunk))
+    return shards
+
+
+def read_manifest(out_dir: str) -> Dict[str, dict]:
+    """Finished shards by id. A torn last line (crash mid-write) is ignored."""
+    done = {}
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if os.path.exists(os.path.join(out_dir, entry["part"])):
+                done[entry["shard"]] = entry
+    return done
+
+
+def append_manifest(out_dir: str, entry: dict):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    line = json.dumps(entry) + "\n"
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Torn last line from a crash: end it so this entry gets a line of its own
+                line = "\n" + line
+    with open(path, "a") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_part(rows: List[tuple], path: str, output_format: str):
+    """Writes to a temp name first, so a part file on disk is always complete."""
+    frame = pl.DataFrame(rows, schema=SCHEMA, orient="row") if rows else pl.DataFrame(schema=SCHEMA)
+    tmp = path + ".tmp"
+    if output_format == "csv":
+        frame.write_csv(tmp)
+    else:
+        frame.write_parquet(tmp)
+    os.replace(tmp, path)
+
+
+# ----------------- Worker side -----------------
+
+_worker_config: Optional[BatchConfig] = None
+_worker_detector = None
+
+
+def _pin_threads(threads: int):
+    # Must run before torch is imported in this process for OMP/MKL to honour it
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    cv2.setNumThreads(threads)
+
+
+def init_worker(config: BatchConfig):
+    """Process pool initializer: one detector per worker, loaded once."""
+    global _worker_config, _worker_detector
+    _pin_threads(config.threads_per_worker)
+    _worker_config = config
+    if config.detector_factory is not None:
+        _worker_detector = config.detector_factory()
+    else:
+        _worker_detector = pothole_detection.PotholeDetector(
+            config.model_path, conf=config.conf, imgsz=config.imgsz, threads=config.threads_per_worker
+        )
+
+
+def _load(config: BatchConfig, rel_path: str):
+    path = os.path.join(config.root, rel_path)
+    image = cv2.imread(path)
+    if image is None:
+        return None, None, None
+    if config.geotags and rel_path in config.geotags:
+        lat, lon = config.geotags[rel_path]
+    else:
+        lat, lon = pothole_detection.exif_location(path)
+    return pothole_detection.downscale(image, config.imgsz), lat, lon
+
+
+def process_shard(shard_id: str, paths: List[str]) -> dict:
+    """Detects potholes in one shard's images and writes its part file. Returns its manifest entry."""
+    config, detector = _worker_config, _worker_detector
+    started = time.perf_counter()
+    rows = []
+    unreadable = 0
+    for i in range(0, len(paths), config.batch_size):
+        batch = []
+        for rel_path in paths[i:i + config.batch_size]:
+            image, lat, lon = _load(config, rel_path)
+            if image is None:
+                unreadable += 1
+            else:
+                batch.append((rel_path, image, lat, lon))
+        if not batch:
+            continue
+        results = detector.detect([image for _, image, _, _ in batch])
+        for (rel_path, _, lat, lon), detections in zip(batch, results):
+            for d in detections:
+                rows.append((rel_path, lat, lon, d.label, d.confidence, *d.box))
+
+    part = f"part-{shard_id}.{'csv' if config.output_format == 'csv' else 'parquet'}"
+    write_part(rows, os.path.join(config.out_dir, part), config.output_format)
+    return {
+        "shard": shard_id,
+        "part": part,
+        "images": len(paths),
+        "unreadable": unreadable,
+        "detections": len(rows),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+# ----------------- Driver -----------------
+
+@dataclass
+class BatchSummary:
+    shards: int = 0
+    completed_shards: int = 0
+    skipped_shards: int = 0  # already in the manifest
+    stale_shards: int = 0    # finished earlier, but their file list changed; parts deleted
+    failed_shards: int = 0   # left out of the manifest; retried on the next run
+    images: int = 0
+    detections: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def run_batch(config: BatchConfig, workers: int, shard_size: int = SHARD_SIZE,
+              progress: Callable[[str], None] = print) -> BatchSummary:
+    """
+    Processes every shard not yet in the manifest. workers=0 runs in this
+    process (handy for debugging and tests).
+    """
+    os.makedirs(config.out_dir, exist_ok=True)
+    shards = make_shards(list_images(config.root), shard_size)
+    done = read_manifest(config.out_dir)
+    todo = [(sid, paths) for sid, paths in shards if sid not in done]
+    summary = BatchSummary(shards=len(shards), skipped_shards=len(shards) - len(todo))
+    current = {sid for sid, _ in shards}
+    for sid, entry in done.items():
+        if sid not in current:
+            # Its images now belong to other shards; keeping it would count them twice
+            os.remove(os.path.join(config.out_dir, entry["part"]))
+            summary.stale_shards += 1
+    started = time.perf_counter()
+
+    def finished(entry: dict):
+        append_manifest(config.out_dir, entry)
+        summary.images += entry["images"]
+        summary.detections += entry["detections"]
+        summary.completed_shards += 1
+        progress(f"{summary.skipped_shards + summary.completed_shards}/{summary.shards} shards, "
+                 f"{summary.images / (time.perf_counter() - started):.1f} images/s")
+
+    if workers <= 0:
+        init_worker(config)
+        for sid, paths in todo:
+            finished(process_shard(sid, paths))
+    else:
+        # spawn: each worker imports torch fresh, after its thread limits are set
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=init_worker, initargs=(config,)) as pool:
+            futures = {pool.submit(process_shard, sid, paths): sid for sid, paths in todo}
+            for future in as_completed(futures):
+                try:
+                    entry = future.result()
+                except BrokenProcessPool:
+                    # A worker died or its initializer failed (e.g. bad model); nothing else will run
+                    raise
+                except Exception as e:
+                    summary.failed_shards += 1
+                    progress(f"shard {futures[future]} failed: {e!r}")
+                    continue
+                finished(entry)
+
+    summary.elapsed_seconds = time.perf_counter() - started
+    return summary
@@ -0,0 +1,442 @@
+# services/pothole_detection.py
+# Pothole detection over image folders, video files and camera streams,
+# feeding geotagged 'Pothole' reports into the reports table.
+#
+# The YOLO model is loaded once per PotholeDetector and reused for every
+# frame. Frames are decoded on a producer thread into a bounded queue, so
+# decoding overlaps inference and a fast reader can't fill memory, and the
+# consumer scores them in batches (one model.predict call per batch).
+# Frames whose location is within a few meters of an earlier detection are
+# dropped before reports are written, in bulk, through crud.create_reports_bulk.
+#
+# Dashcam video is mostly near-identical consecutive frames, so video can be
+# decimated (sample_fps), filtered to frames that differ from the last one
+# sent to the model (ChangeFilter, a difference hash), and downsized to the
+# inference size before it is queued.
+
+import csv
+import math
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from services.spatial_index import METERS_PER_DEG_LAT
+
+MODEL_PATH = os.getenv("POTHOLE_MODEL", "yolov8n.pt")
+# Class names counted as potholes; the model must have at least one of them
+POTHOLE_CLASSES = ("pothole", "potholes")
+REPORT_TYPE = "Pothole"
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Detections closer than this to an earlier one are treated as the same pothole
+DEDUPE_RADIUS_M = 15.0
+
+# Max differing bits (of 64) for a frame to count as unchanged; 0-4 is
+# recompression noise, a car moving a few meters flips well over 10
+DEFAULT_MAX_HASH_DISTANCE = 6
+
+
+@dataclass
+class Frame:
+    image: np.ndarray  # BGR, as decoded by OpenCV
+    source: str        # file name, or "<video>#<frame index>"
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    timestamp: Optional[float] = None  # seconds into the video
+
+
+@dataclass
+class Detection:
+    label: str
+    confidence: float
+    box: Tuple[float, float, float, float]  # x1, y1, x2, y2 in frame pixels
+
+
+class PotholeDetector:
+    """A YOLO model loaded once, scoring lists of frames in one predict call."""
+
+    def __init__(self, model_path: str = MODEL_PATH, conf: float = 0.4, imgsz: int = 640,
+                 classes: Sequence[str] = POTHOLE_CLASSES, threads: Optional[int] = None):
+        # Imported here: torch + ultralytics take seconds to import and only
+        # the detection jobs need them
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.conf = conf
+        self.imgsz = imgsz
+        wanted = {c.lower() for c in classes}
+        self.class_ids = [i for i, name in self.model.names.items() if name.lower() in wanted]
+        if not self.class_ids:
+            # A generic COCO model would report every car and person as a pothole
+            raise ValueError(f"{model_path} has none of the classes {sorted(wanted)}; "
+                             f"it knows {sorted(self.model.names.values())}")
+
+    def detect(self, images: List[np.ndarray]) -> List[List[Detection]]:
+        """Detections for each image, in input order."""
+        if not images:
+            return []
+        results = self.model.predict(images, conf=self.conf, imgsz=self.imgsz, classes=self.class_ids,
+                                     device="cpu", verbose=False)
+        out = []
+        for result in results:
+            boxes = result.boxes
+            out.append([
+                Detection(result.names[int(c)], float(p), tuple(b))
+                for c, p, b in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist())
+            ])
+        return out
+
+
+# ----------------- Geotags -----------------
+
+def read_geotags(path: str) -> Dict[str, Tuple[float, float]]:
+    """CSV with name,lat,lon columns -> {file name: (lat, lon)}."""
+    with open(path, newline="") as f:
+        return {row["name"]: (float(row["lat"]), float(row["lon"])) for row in csv.DictReader(f)}
+
+
+class GpsTrack:
+    """Positions over time (CSV with t,lat,lon; t in seconds from the video start)."""
+
+    def __init__(self, times: Sequence[float], lats: Sequence[float], lons: Sequence[float]):
+        order = np.argsort(times)
+        self.t = np.asarray(times, dtype=np.float64)[order]
+        self.lat = np.asarray(lats, dtype=np.float64)[order]
+        self.lon = np.asarray(lons, dtype=np.float64)[order]
+
+    @classmethod
+    def from_csv(cls, path: str) -> "GpsTrack":
+        with open(path, newline="") as f:
+            rows = [(float(r["t"]), float(r["lat"]), float(r["lon"])) for r in csv.DictReader(f)]
+        return cls(*zip(*rows))
+
+    def at(self, t: float) -> Tuple[Optional[float], Optional[float]]:
+        """Linearly interpolated position; None outside the recorded time range."""
+        if len(self.t) == 0 or t < self.t[0] or t > self.t[-1]:
+            return None, None
+        return float(np.interp(t, self.t, self.lat)), float(np.interp(t, self.t, self.lon))
+
+
+def _exif_degrees(dms, ref) -> float:
+    degrees = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+    return -degrees if ref in ("S", "W") else degrees
+
+
+def exif_location(path: str) -> Tuple[Optional[float], Optional[float]]:
+    """(lat, lon) from a photo's EXIF GPS block, or (None, None)."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            gps = img.getexif().get_ifd(0x8825)  # GPSInfo
+        if 2 in gps and 4 in gps:
+            return _exif_degrees(gps[2], gps.get(1, "N")), _exif_degrees(gps[4], gps.get(3, "E"))
+    except (OSError, ValueError, ZeroDivisionError, TypeError):
+        pass
+    return None, None
+
+
+# ----------------- Frame sources -----------------
+
+def iter_images(directory: str, geotags: Optional[Dict[str, Tuple[float, float]]] = None) -> Iterator[Frame]:
+    """Images in `directory` (sorted by name), located by `geotags` or else EXIF GPS."""
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        path = os.path.join(directory, name)
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        lat, lon = geotags[name] if geotags and name in geotags else exif_location(path)
+        yield Frame(image, name, lat, lon)
+
+
+def iter_video(source: str, track: Optional[GpsTrack] = None, sample_fps: Optional[float] = None) -> Iterator[Frame]:
+    """
+    Frames of a video file or stream URL (anything cv2.VideoCapture opens).
+    With sample_fps, only about that many frames per second of footage are
+    returned; the others are grabbed but never converted to images.
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video source {source!r}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = fps / sample_fps if sample_fps and sample_fps < fps else 1.0
+    name = os.path.basename(source) or source
+    index = 0
+    next_sample = 0.0
+    try:
+        while True:
+            if index < next_sample - 1e-9:
+                if not capture.grab():
+                    return
+                index += 1
+                continue
+            ok, image = capture.read()
+            if not ok:
+                return
+            next_sample += step
+            t = index / fps
+            lat, lon = track.at(t) if track is not None else (None, None)
+            yield Frame(image, f"{name}#{index}", lat, lon, t)
+            index += 1
+    finally:
+        capture.release()
+
+
+# ----------------- Frame sampling -----------------
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Difference hash: one bit per horizontally adjacent pixel pair of a
+    (hash_size+1) x hash_size grayscale thumbnail. Similar frames differ in few bits.
+    """
+    # INTER_AREA straight down to 9x8 costs ~3 ms on a 720p frame; striding to
+    # ~8x the thumbnail first is ~20x cheaper and gives nearly the same bits
+    h, w = image.shape[:2]
+    step = max(1, min(h // (hash_size * 8), w // ((hash_size + 1) * 8)))
+    image = image[::step, ::step]
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class ChangeFilter:
+    """
+    Passes a frame only if its dHash differs from the last passed frame's by
+    more than max_distance bits. Comparing against the last *passed* frame
+    (not the previous one) means slow drift still triggers eventually.
+    max_gap forces a frame through after that many skipped in a row.
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_HASH_DISTANCE, hash_size: int = 8,
+                 max_gap: Optional[int] = None):
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.max_gap = max_gap
+        self._last: Optional[int] = None
+        self._skipped_in_row = 0
+        self.seen = 0
+        self.passed = 0
+
+    def changed(self, image: np.ndarray) -> bool:
+        self.seen += 1
+        h = dhash(image, self.hash_size)
+        if (self._last is not None and bin(h ^ self._last).count("1") <= self.max_distance
+                and (self.max_gap is None or self._skipped_in_row < self.max_gap)):
+            self._skipped_in_row += 1
+            return False
+        self._last = h
+        self._skipped_in_row = 0
+        self.passed += 1
+        return True
+
+
+def downscale(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Shrinks so the longer side is at most max_side (never enlarges)."""
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def sample_frames(frames: Iterable[Frame], change_filter: Optional[ChangeFilter] = None,
+                  max_side: Optional[int] = None) -> Iterator[Frame]:
+    """
+    Drops frames the filter considers unchanged and downsizes the rest.
+    Runs on the reader thread when passed to DetectionPipeline.run, so the
+    work overlaps inference. Boxes are then in downsized pixels.
+    """
+    for frame in frames:
+        if change_filter is not None and not change_filter.changed(frame.image):
+            continue
+        if max_side:
+            frame.image = downscale(frame.image, max_side)
+        yield frame
+
+
+# ----------------- Dedupe -----------------
+
+class LocationDeduper:
+    """Remembers accepted locations and rejects new ones within radius_m of any of them."""
+
+    def __init__(self, radius_m: float = DEDUPE_RADIUS_M):
+        self.radius_m = radius_m
+        self.cell_deg = radius_m / METERS_PER_DEG_LAT
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        # Square-ish cells in degrees of latitude; the neighbour search below
+        # widens in longitude so cells are never narrower than radius_m
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def accept(self, lat: float, lon: float) -> bool:
+        """True (and remembers the point) if nothing accepted so far is within radius_m."""
+        kx = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+        span = max(1, math.ceil(METERS_PER_DEG_LAT / max(kx, 1e-6)))
+        ci, cj = self._cell(lat, lon)
+        for i in range(ci - 1, ci + 2):
+            for j in range(cj - span, cj + span + 1):
+                for plat, plon in self._cells.get((i, j), ()):
+                    if math.hypot((lon - plon) * kx, (lat - plat) * METERS_PER_DEG_LAT) <= self.radius_m:
+                        return False
+        self._cells.setdefault((ci, cj), []).append((lat, lon))
+        return True
+
+
+# ----------------- Pipeline -----------------
+
+@dataclass
+class PipelineStats:
+    frames: int = 0
+    batches: int = 0
+    detections: int = 0
+    unlocated: int = 0   # frames with detections but no position; not reported
+    duplicates: int = 0  # frames with detections near an earlier report
+    reports: int = 0
+    inference_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def fps(self) -> float:
+        """End-to-end frames per second (decode, inference and writes)."""
+        return self.frames / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def inference_fps(self) -> float:
+        return self.frames / self.inference_seconds if self.inference_seconds else 0.0
+
+
+_DONE = object()
+
+
+@dataclass
+class _Failed:
+    error: BaseException
+
+
+def _put(out: "queue.Queue", item, stop: threading.Event) -> bool:
+    # Blocks while the queue is full, but gives up once the consumer has stopped
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class DetectionPipeline:
+    """
+    Runs `detector` over frames from any iterable and hands new pothole
+    reports (dicts for crud.create_reports_bulk) to `write_reports` in groups
+    of up to `flush_every`.
+    """
+
+    def __init__(self, detector: PotholeDetector, write_reports: Callable[[List[dict]], None], user_id: int,
+                 batch_size: int = 8, queue_size: int = 64, flush_every: int = 200,
+                 dedupe_radius_m: float = DEDUPE_RADIUS_M):
+        self.detector = detector
+        self.write_reports = write_reports
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.flush_every = flush_every
+        self.dedupe = LocationDeduper(dedupe_radius_m)
+        self.stats = PipelineStats()
+
+    def _produce(self, frames: Iterable[Frame], out: "queue.Queue", stop: threading.Event):
+        try:
+            for frame in frames:
+                if not _put(out, frame, stop):
+                    return
+            _put(out, _DONE, stop)
+        except BaseException as e:
+            _put(out, _Failed(e), stop)
+
+    def _next_batch(self, frames: "queue.Queue") -> Tuple[List[Frame], bool]:
+        """Blocks for one frame, then takes whatever else is already decoded. Returns (batch, finished)."""
+        batch: List[Frame] = []
+        item = frames.get()
+        while True:
+            if item is _DONE:
+                return batch, True
+            if isinstance(item, _Failed):
+                raise item.error
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = frames.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+    def _reports_for(self, batch: List[Frame], results: List[List[Detection]]) -> List[dict]:
+        stats = self.stats
+        reports = []
+        for frame, detections in zip(batch, results):
+            if not detections:
+                continue
+            stats.detections += len(detections)
+            if frame.lat is None or frame.lon is None:
+                stats.unlocated += 1
+                continue
+            # One report per location; boxes in the same frame share its position
+            if not self.dedupe.accept(frame.lat, frame.lon):
+                stats.duplicates += 1
+                continue
+            reports.append({
+                "report_type": REPORT_TYPE, "lat": frame.lat, "lon": frame.lon, "user_id": self.user_id,
+                # Extra keys for crud.create_pothole_detections_bulk
+                "confidence": max(d.confidence for d in detections), "source": frame.source,
+            })
+        return reports
+
+    def run(self, frames: Iterable[Frame]) -> PipelineStats:
+        stats = self.stats
+        pending: List[dict] = []
+        decoded: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(frames, decoded, stop),
+                                    name="frame-reader", daemon=True)
+        started = time.perf_counter()
+        producer.start()
+        try:
+            finished = False
+            while not finished:
+                batch, finished = self._next_batch(decoded)
+                if not batch:
+                    continue
+                t0 = time.perf_counter()
+                results = self.detector.detect([f.image for f in batch])
+                stats.inference_seconds += time.perf_counter() - t0
+                stats.batches += 1
+                stats.frames += len(batch)
+
+                pending.extend(self._reports_for(batch, results))
+                if len(pending) >= self.flush_every:
+                    self._flush(pending)
+            self._flush(pending)
+        finally:
+            stop.set()
+            producer.join(timeout=5)
+            stats.elapsed_seconds = time.perf_counter() - started
+        return stats
+
+    def _flush(self, pending: List[dict]):
+        if pending:
+            self.write_reports(list(pending))
+            self.stats.reports += len(pending)
+            pending.clear()
@@ -0,0 +1,60 @@
+# services/route_cache.py
+# Cache of finished /route/predict-risk responses.
+#
+# Entries are keyed on the snapped start/end coordinates and the hour of day
+# (a model feature). An entry is only served while its risk inputs are
+# unchanged: no report was added or expired near any of its routes
+# (spatial_index.HazardStamp) and the start cell's weather epoch is the same.
+# Road scores and OSRM routes change rarely and are covered by the TTL.
+
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from services.cache import TTLCache, MISSING
+from services.spatial_index import HazardStamp, LiveReportIndex
+
+# ~110 m; requests whose endpoints geocode within a cell share an entry
+DEFAULT_SNAP_DEG = 0.001
+
+
+@dataclass
+class CachedRoute:
+    body: bytes  # encoded RouteResponse JSON
+    hazards: HazardStamp
+    weather_epoch: int
+
+
+class RouteResponseCache:
+    def __init__(self, index: LiveReportIndex, max_size: int = 2048, ttl: float = 600.0,
+                 snap_deg: float = DEFAULT_SNAP_DEG):
+        self.index = index
+        self.snap_deg = snap_deg
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.invalidated = 0
+
+    def key(self, start: dict, end: dict, hour: int, geometry_format: str = "geojson") -> Hashable:
+        snap = lambda v: round(v / self.snap_deg)
+        return (snap(start["lat"]), snap(start["lon"]), snap(end["lat"]), snap(end["lon"]), hour, geometry_format)
+
+    def get(self, key: Hashable) -> Optional[CachedRoute]:
+        """
+        The entry for `key` if no report near its routes changed since it was
+        stored. The caller still compares entry.weather_epoch.
+        """
+        entry = self._cache.get(key)
+        if entry is MISSING:
+            return None
+        if not self.index.is_current(entry.hazards):
+            self._cache.pop(key)
+            self.invalidated += 1
+            return None
+        return entry
+
+    def set(self, key: Hashable, body: bytes, hazards: HazardStamp, weather_epoch: int):
+        self._cache.set(key, CachedRoute(body, hazards, weather_epoch))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "invalidated": self.invalidated}
@@ -1,39 +1,54 @@
 # services/routing.py
-import requests
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError, GeocoderUnavailable, GeocoderRateLimited
-import time
+import asyncio
+import os
+import httpx
 import logging
 from typing import Optional, Tuple
 
+from services import http_client, metrics
+from services.geocode_cache import geocode_cache, MISSING
+
 logger = logging.getLogger(__name__)
 TIMEOUT_SECONDS = 8
 
-# Configure geolocator with a descriptive user_agent
-geolocator = Nominatim(user_agent="traffix_app_v1", timeout=TIMEOUT_SECONDS)
+# Nominatim search API (same service geopy's Nominatim geocoder talks to).
+# Overridable, e.g. to point at benchmarks/stub_upstreams.py for load tests.
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 
-# Simple in-memory cache for geocoding results within this process
-_geocode_cache = {}
+# Upstream answers worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
-def geocode_with_retry(address: str, max_retries: int = 4, initial_delay: float = 0.5) -> Optional[Tuple[float, float]]:
-    key = address.strip().lower()
-    if key in _geocode_cache:
-        return _geocode_cache[key]
+async def geocode_with_retry(address: str, max_retries: int = 4, initial_delay: float = 0.5) -> Optional[Tuple[float, float]]:
+    cached = geocode_cache.get(address)
+    if cached is not MISSING:
+        return cached
 
+    params = {"q": f"{address}, Delhi, India", "format": "jsonv2", "limit": 1}
     delay = initial_delay
     for attempt in range(max_retries):
         try:
-            loc = geolocator.geocode(f"{address}, Delhi, India")
-            if loc:
-                coords = (loc.latitude, loc.longitude)
-                _geocode_cache[key] = coords
+            resp = await http_client.get(NOMINATIM_URL, params=params, timeout=TIMEOUT_SECONDS, service="nominatim")
+            if resp.status_code in RETRY_STATUS_CODES:
+                raise httpx.HTTPStatusError(f"HTTP {resp.status_code}", request=resp.request, response=resp)
+            resp.raise_for_status()
+            results = resp.json()
+            if results:
+                coords = (float(results[0]["lat"]), float(results[0]["lon"]))
+                geocode_cache.set(address, coords)
                 return coords
             else:
                 logger.info("Geocoder returned no result for '%s' (attempt %d)", address, attempt + 1)
+                # Negative results are cached briefly so typos don't keep hitting Nominatim
+                geocode_cache.set(address, None)
+                return None
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRY_STATUS_CODES:
+                logger.error("Geocoder rejected '%s' with HTTP %d", address, e.response.status_code)
                 return None
-        except (GeocoderTimedOut, GeocoderServiceError, GeocoderUnavailable, GeocoderRateLimited) as e:
             logger.warning("Geocode attempt %d failed for '%s' with %s. Retrying after %.1fs", attempt + 1, address, type(e).__name__, delay)
-            time.sleep(delay)
+            metrics.UPSTREAM_RETRIES.labels("nominatim").inc()
+            # Back off without blocking the event loop
+            await asyncio.sleep(delay)
             delay *= 2
         except Exception as e:
             logger.exception("Unexpected geocoding error for '%s': %s", address, e)
@@ -41,21 +56,21 @@ def geocode_with_retry(address: str, max_retries: int = 4, initial_delay: float
     logger.error("Geocode failed for '%s' after %d attempts", address, max_retries)
     return None
 
-def get_coords_from_address(address: str):
+async def get_coords_from_address(address: str):
     """
     Returns {'lat': float, 'lon': float} or None on failure.
     """
     if not address:
         return None
-    coords = geocode_with_retry(address)
+    coords = await geocode_with_retry(address)
     if not coords:
         return None
     return {"lat": coords[0], "lon": coords[1]}
 
-# OSRM routing
-BASE_URL = "http://router.project-osrm.org/route/v1/driving/"
+# OSRM routing (OSRM_BASE_URL must end with /route/v1/driving/)
+BASE_URL = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org/route/v1/driving/")
 
-def get_routes_from_osrm(start_lat, start_lon, end_lat, end_lon):
+async def get_routes_from_osrm(start_lat, start_lon, end_lat, end_lon):
     """
     Requests OSRM for routes (primary + alternatives). Returns a list of dicts with distance,duration,geometry.
     Geometry is returned as GeoJSON-like dict under 'geometry'.
@@ -64,7 +79,7 @@ def get_routes_from_osrm(start_lat, start_lon, end_lat, end_lon):
     url = f"{BASE_URL}{coordinates}?alternatives=true&steps=false&overview=full&geometries=geojson"
 
     try:
-        resp = requests.get(url, timeout=TIMEOUT_SECONDS)
+        resp = await http_client.get(url, timeout=TIMEOUT_SECONDS, service="osrm")
         resp.raise_for_status()
         data = resp.json()
         routes = []
@@ -75,6 +90,6 @@ def get_routes_from_osrm(start_lat, start_lon, end_lat, end_lon):
                 "geometry": r.get("geometry")
             })
         return routes
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         logger.exception("OSRM request failed: %s", e)
         return None
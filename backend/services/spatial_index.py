@@ -0,0 +1,347 @@
+# services/spatial_index.py
+# In-process spatial index of live hazard reports.
+#
+# Reports are bucketed into a fixed lat/lon grid and removed again through a
+# min-heap keyed on expires_at, so "how many live reports are near this route"
+# is answered from memory instead of a PostGIS ST_DWithin scan per request.
+
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Same radius as the PostGIS query in benchmarks/bench_report_history.py
+HAZARD_RADIUS_M = 300
+
+# ~550 m of latitude per cell; routes only ever probe a handful of cells per segment
+DEFAULT_CELL_DEG = 0.005
+
+METERS_PER_DEG_LAT = 111_320.0
+
+logger = logging.getLogger(__name__)
+
+# Change listeners get ("add", [reports]) or ("expire", [reports])
+Listener = Callable[[str, List["IndexedReport"]], None]
+
+Cell = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class HazardStamp:
+    """Index version plus the versions of the cells some cached result read."""
+    version: int
+    cells: Dict[Cell, int]
+
+
+@dataclass
+class IndexedReport:
+    id: int
+    city_id: int
+    report_type: str
+    lat: float
+    lon: float
+    expires_at: float  # unix timestamp
+
+
+def _to_timestamp(value) -> float:
+    """Accepts datetimes (naive = UTC, like crud's utcnow()) or plain timestamps."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+def _segment_distance_m(lat, lon, a, b) -> float:
+    """
+    Distance in meters from (lat, lon) to the segment a-b, where a and b are
+    GeoJSON [lon, lat] pairs. Uses a local equirectangular projection, which is
+    accurate to well under a meter at the few-hundred-meter scale we care about.
+    """
+    kx = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+    ky = METERS_PER_DEG_LAT
+    ax, ay = (a[0] - lon) * kx, (a[1] - lat) * ky
+    bx, by = (b[0] - lon) * kx, (b[1] - lat) * ky
+    dx, dy = bx - ax, by - ay
+    seg_len_sq = dx * dx + dy * dy
+    if seg_len_sq == 0:
+        return math.hypot(ax, ay)
+    # Project the origin (our point) onto the segment and clamp to its ends
+    t = max(0.0, min(1.0, -(ax * dx + ay * dy) / seg_len_sq))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+
+class LiveReportIndex:
+    """
+    Thread-safe grid index of active reports.
+
+    Expired entries are dropped lazily (on every query) by popping the expiry
+    heap, so the index never needs a background sweeper to stay correct.
+    """
+
+    def __init__(self, cell_deg: float = DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._lock = threading.RLock()
+        self._reports: Dict[int, IndexedReport] = {}
+        self._cells: Dict[Cell, Set[int]] = defaultdict(set)
+        self._expiry_heap: List[Tuple[float, int]] = []
+        self._listeners: List[Listener] = []
+        # Bumped whenever a report appears in / leaves a cell (see stamp())
+        self._cell_versions: Dict[Cell, int] = {}
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        # Write counter, and the count at each report's last add/remove; lets
+        # load() tell which local changes are newer than its DB snapshot
+        self._generation = 0
+        self._touched: Dict[int, int] = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._reports)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def _bump(self, rep: IndexedReport):
+        cell = self._cell(rep.lat, rep.lon)
+        self._cell_versions[cell] = self._cell_versions.get(cell, 0) + 1
+        self.version += 1
+
+    # ----------------- Change notifications -----------------
+
+    def add_listener(self, fn: Listener):
+        """
+        Registers fn(kind, reports), called after reports are added ("add")
+        or dropped ("expire"). Called outside the index lock, possibly from
+        a worker thread.
+        """
+        self._listeners.append(fn)
+
+    def _notify(self, kind: str, reports: List[IndexedReport]):
+        if not reports:
+            return
+        for fn in self._listeners:
+            try:
+                fn(kind, reports)
+            except Exception:
+                logger.exception("Report index listener failed")
+
+    # ----------------- Writes -----------------
+
+    def add(self, report_id: int, city_id: int, report_type: str, lat: float, lon: float, expires_at):
+        with self._lock:
+            rep, changed = self._add_locked(report_id, city_id, report_type, lat, lon, _to_timestamp(expires_at))
+        if changed:
+            self._notify("add", [rep])
+
+    def _touch(self, report_id: int):
+        self._generation += 1
+        self._touched[report_id] = self._generation
+
+    def _add_locked(self, report_id, city_id, report_type, lat, lon, expires_ts) -> Tuple[IndexedReport, bool]:
+        old = self._remove_locked(report_id)
+        self._touch(report_id)
+        rep = IndexedReport(report_id, city_id, report_type, lat, lon, expires_ts)
+        self._reports[report_id] = rep
+        self._cells[self._cell(lat, lon)].add(report_id)
+        heapq.heappush(self._expiry_heap, (expires_ts, report_id))
+        # A pure expiry bump isn't news for map viewers
+        changed = old is None or (old.lat, old.lon, old.report_type) != (lat, lon, report_type)
+        if changed:
+            if old is not None:
+                self._bump(old)
+            self._bump(rep)
+        return rep, changed
+
+    def remove(self, report_id: int):
+        with self._lock:
+            rep = self._remove_locked(report_id)
+            if rep is not None:
+                self._bump(rep)
+        if rep is not None:
+            self._notify("expire", [rep])
+
+    def _remove_locked(self, report_id: int) -> Optional[IndexedReport]:
+        rep = self._reports.pop(report_id, None)
+        if rep is None:
+            return None
+        self._touch(report_id)
+        cell = self._cell(rep.lat, rep.lon)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(report_id)
+            if not bucket:
+                del self._cells[cell]
+        # The heap entry is left behind and skipped when it surfaces
+        return rep
+
+    def expire(self, now: Optional[float] = None) -> List[IndexedReport]:
+        """Drops every report whose expires_at has passed. Returns what was dropped."""
+        now = time.time() if now is None else now
+        dropped = []
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_ts, report_id = heapq.heappop(self._expiry_heap)
+                rep = self._reports.get(report_id)
+                # Skip stale heap entries left by remove() or a re-add with a new expiry
+                if rep is not None and rep.expires_at == expires_ts:
+                    dropped.append(self._remove_locked(report_id))
+                    self._bump(rep)
+        self._notify("expire", dropped)
+        return dropped
+
+    def begin_load(self) -> int:
+        """Call BEFORE reading the DB snapshot for load(); pass the result as `since`."""
+        with self._lock:
+            return self._generation
+
+    def load(self, rows: Iterable, since: Optional[int] = None):
+        """
+        Replaces the whole index with `rows`, each having
+        id, city_id, report_type, lat, lon and expires_at attributes.
+        Listeners are told only about the difference to the previous contents.
+
+        With `since` (from begin_load()), reports added or removed here after
+        the snapshot was taken keep their local state, so a report filed
+        while the rows were being read isn't dropped again.
+        """
+        # Drain the (possibly streaming) rows before taking the lock
+        rows = [r for r in rows if r.lat is not None and r.lon is not None]
+        with self._lock:
+            newer = set() if since is None else {rid for rid, gen in self._touched.items() if gen > since}
+            previous = self._reports
+            self._reports = {}
+            self._cells = defaultdict(set)
+            added = []
+            for report_id in newer:
+                rep = previous.get(report_id)
+                if rep is not None:
+                    self._reports[report_id] = rep
+                    self._cells[self._cell(rep.lat, rep.lon)].add(report_id)
+            for r in rows:
+                if r.id in newer:
+                    continue
+                rep = IndexedReport(r.id, r.city_id, r.report_type, r.lat, r.lon, _to_timestamp(r.expires_at))
+                self._reports[rep.id] = rep
+                self._cells[self._cell(rep.lat, rep.lon)].add(rep.id)
+                old = previous.get(rep.id)
+                if old is None or (old.lat, old.lon, old.report_type) != (rep.lat, rep.lon, rep.report_type):
+                    added.append(rep)
+                    if old is not None:
+                        self._bump(old)
+                    self._bump(rep)
+            self._expiry_heap = [(rep.expires_at, rep.id) for rep in self._reports.values()]
+            heapq.heapify(self._expiry_heap)
+            removed = [rep for report_id, rep in previous.items() if report_id not in self._reports]
+            for rep in removed:
+                self._bump(rep)
+            self._touched = {rid: self._touched[rid] for rid in newer}
+            self.loaded_at = time.time()
+        self._notify("add", added)
+        self._notify("expire", removed)
+
+    def snapshot(self, city_id: Optional[int] = None) -> List[IndexedReport]:
+        """All live reports (optionally for one city), e.g. for a stream's first message."""
+        self.expire()
+        with self._lock:
+            return [rep for rep in self._reports.values() if city_id is None or rep.city_id == city_id]
+
+    # ----------------- Change versions -----------------
+
+    def stamp(self, lines: Iterable[Sequence[Sequence[float]]], radius_m: float = HAZARD_RADIUS_M) -> HazardStamp:
+        """
+        Records the versions of every cell within radius_m of the given
+        LineStrings. Take it BEFORE reading the index for a cached result;
+        is_current() then tells whether any report near those lines changed.
+        """
+        cells: Set[Cell] = set()
+        for coordinates in lines:
+            for _, chunk_cells in self._line_chunks(coordinates, radius_m):
+                cells.update(chunk_cells)
+        self.expire()
+        with self._lock:
+            return HazardStamp(self.version, {cell: self._cell_versions.get(cell, 0) for cell in cells})
+
+    def is_current(self, stamp: HazardStamp) -> bool:
+        self.expire()
+        with self._lock:
+            if stamp.version == self.version:
+                return True
+            return all(self._cell_versions.get(cell, 0) == v for cell, v in stamp.cells.items())
+
+    # ----------------- Queries -----------------
+
+    def count_near_line(self, coordinates: Sequence[Sequence[float]], radius_m: float = HAZARD_RADIUS_M,
+                        city_id: Optional[int] = None, now: Optional[float] = None) -> int:
+        return len(self.reports_near_line(coordinates, radius_m, city_id, now))
+
+    def reports_near_line(self, coordinates: Sequence[Sequence[float]], radius_m: float = HAZARD_RADIUS_M,
+                          city_id: Optional[int] = None, now: Optional[float] = None) -> List[IndexedReport]:
+        """
+        Live reports within radius_m of a LineString given as GeoJSON [lon, lat] pairs.
+        """
+        if not coordinates:
+            return []
+        self.expire(now)
+
+        found: Dict[int, IndexedReport] = {}
+        with self._lock:
+            for segments, cells in self._line_chunks(coordinates, radius_m):
+                for cell in cells:
+                    for report_id in self._cells.get(cell, ()):
+                        if report_id in found:
+                            continue
+                        rep = self._reports[report_id]
+                        if city_id is not None and rep.city_id != city_id:
+                            continue
+                        if any(_segment_distance_m(rep.lat, rep.lon, a, b) <= radius_m for a, b in segments):
+                            found[report_id] = rep
+        return list(found.values())
+
+    def _line_chunks(self, coordinates: Sequence[Sequence[float]], radius_m: float):
+        """
+        Splits a line into runs of consecutive segments spanning at most about
+        one cell, and yields (segments, cells within radius_m of the run).
+        OSRM lines have a point every few meters, so this enumerates cells
+        once per ~cell of route instead of once per segment.
+        """
+        if len(coordinates) == 1:
+            coordinates = [coordinates[0], coordinates[0]]
+        segments = []
+        min_lon = max_lon = coordinates[0][0]
+        min_lat = max_lat = coordinates[0][1]
+        cell_deg = self.cell_deg
+        for a, b in zip(coordinates, coordinates[1:]):
+            lon, lat = b[0], b[1]
+            # Conditional expressions rather than min()/max(); this loop runs per route point
+            lo_lon = lon if lon < min_lon else min_lon
+            hi_lon = lon if lon > max_lon else max_lon
+            lo_lat = lat if lat < min_lat else min_lat
+            hi_lat = lat if lat > max_lat else max_lat
+            if segments and (hi_lon - lo_lon > cell_deg or hi_lat - lo_lat > cell_deg):
+                yield segments, self._cells_near_box(min_lat, min_lon, max_lat, max_lon, radius_m)
+                segments = []
+                lo_lon, hi_lon = (a[0], lon) if a[0] < lon else (lon, a[0])
+                lo_lat, hi_lat = (a[1], lat) if a[1] < lat else (lat, a[1])
+            segments.append((a, b))
+            min_lon, max_lon, min_lat, max_lat = lo_lon, hi_lon, lo_lat, hi_lat
+        if segments:
+            yield segments, self._cells_near_box(min_lat, min_lon, max_lat, max_lon, radius_m)
+
+    def _cells_near_box(self, min_lat, min_lon, max_lat, max_lon, radius_m: float) -> List[Cell]:
+        pad_lat = radius_m / METERS_PER_DEG_LAT
+        # Widest longitude padding happens at the latitude closest to a pole
+        widest_lat = max(abs(min_lat), abs(max_lat))
+        pad_lon = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(widest_lat)), 1e-6))
+        lo = self._cell(min_lat - pad_lat, min_lon - pad_lon)
+        hi = self._cell(max_lat + pad_lat, max_lon + pad_lon)
+        return [(i, j) for i in range(lo[0], hi[0] + 1) for j in range(lo[1], hi[1] + 1)]
+
+
+# Process-wide index used by the API
+live_reports = LiveReportIndex()
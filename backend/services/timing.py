@@ -0,0 +1,38 @@
+# services/timing.py
+# Per-request stage timings, reported to clients through the standard
+# Server-Timing header (visible in browser dev tools and easy to log).
+
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, TypeVar
+
+from services import metrics
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}  # stage name -> milliseconds
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.stages[name] = elapsed * 1000
+            metrics.ROUTE_STAGE_SECONDS.labels(name).observe(elapsed)
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Awaits `awaitable` and records how long it took under `name`."""
+        with self.stage(name):
+            return await awaitable
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={total:.1f}")
+        return ", ".join(parts)
@@ -0,0 +1,294 @@
+# services/training.py
+# Training set and training loop for the congestion model (train_model.py),
+# sized for tens of millions of rows.
+#
+# History is read through server-side cursors (crud.stream_*), one chunk at
+# a time, and turned into features with polars:
+#   1. reports and weather_observations are reduced to one row per city and
+#      hour as they stream in, so their size no longer grows with history.
+#   2. Window aggregates (reports in the last 1/6/24 h, rainy hours in the
+#      last 6 h) are computed on that hourly grid. Each window ends where the
+#      trip's hour starts, so nothing from after the trip leaks in.
+#   3. route_outcomes chunks are joined to the grid and written out as
+#      Parquet shards, split into train / eval by id.
+#   4. XGBoost reads the shards through a DataIter into a QuantileDMatrix:
+#      one shard in memory at a time, and the matrix itself is stored as
+#      histogram bin indices rather than floats.
+
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import joblib
+import polars as pl
+import xgboost
+
+from services.inference import FEATURES, CongestionModel
+
+# Extra columns for offline experiments; the API only computes inference.FEATURES
+WINDOW_FEATURES = ("reports_1h", "reports_6h", "reports_24h", "rain_hours_6h")
+REPORT_WINDOWS_H = {"reports_1h": 1, "reports_6h": 6, "reports_24h": 24}
+RAIN_WINDOW_H = 6
+# How long a rain reading still counts when no newer one exists
+RAIN_FILL_H = 2
+
+LABEL = "congested"
+# A trip that took this much longer than the OSRM estimate was congested
+CONGESTION_RATIO = 1.3
+# Same fallback main.py uses for routes with no matched road segments
+DEFAULT_ROAD_SCORE = 5
+# Every n-th outcome id goes to the evaluation set (0: none)
+EVAL_EVERY = 10
+
+MODEL_FILE = "congestion_model.pkl"   # what inference.CongestionModel loads
+NATIVE_MODEL_FILE = "model.ubj"       # XGBoost's own format, readable by later versions
+METADATA_FILE = "metadata.json"
+
+OUTCOME_COLUMNS = [
+    "id", "city_id", "started_at", "static_hazard_score", "active_reports",
+    "expected_duration_s", "actual_duration_s",
+]
+
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    # Early stopping watches the last metric
+    "eval_metric": ["auc", "logloss"],
+    "tree_method": "hist",
+    "max_depth": 6,
+    "eta": 0.1,
+    "max_bin": 256,
+    "nthread": os.cpu_count() or 1,
+}
+
+_HOUR = pl.Datetime("us", "UTC")
+# Partial hourly aggregates are merged once this many rows pile up
+_COMPACT_ROWS = 1_000_000
+
+
+def _as_utc(df: pl.DataFrame, column: str) -> pl.DataFrame:
+    # psycopg2 hands back aware datetimes; naive ones are taken to be UTC
+    if getattr(df.schema[column], "time_zone", None) is None:
+        expr = pl.col(column).dt.replace_time_zone("UTC")
+    else:
+        expr = pl.col(column).dt.convert_time_zone("UTC")
+    return df.with_columns(expr.dt.cast_time_unit("us"))
+
+
+class _HourlyAccumulator:
+    """Collects per-chunk (city_id, hour) partials and merges them as it goes."""
+
+    def __init__(self, merge: Callable[[pl.DataFrame], pl.DataFrame], schema: dict):
+        self.merge = merge
+        self.schema = schema
+        self.parts: List[pl.DataFrame] = []
+        self.rows = 0
+
+    def add(self, part: pl.DataFrame):
+        self.parts.append(part)
+        self.rows += len(part)
+        if self.rows > _COMPACT_ROWS:
+            self.parts = [self.result()]
+            self.rows = len(self.parts[0])
+
+    def result(self) -> pl.DataFrame:
+        if not self.parts:
+            return pl.DataFrame(schema=self.schema)
+        return self.merge(pl.concat(self.parts)).select(list(self.schema)).cast(self.schema)
+
+
+def report_hours(chunks: Iterable[Sequence[tuple]]) -> pl.DataFrame:
+    """(city_id, hour, reports) from streamed (city_id, created_at) rows."""
+    acc = _HourlyAccumulator(
+        lambda df: df.group_by("city_id", "hour").agg(pl.col("reports").sum()),
+        {"city_id": pl.Int64, "hour": _HOUR, "reports": pl.Int64},
+    )
+    for rows in chunks:
+        df = _as_utc(pl.DataFrame(rows, schema=["city_id", "created_at"], orient="row"), "created_at")
+        acc.add(df.group_by("city_id", pl.col("created_at").dt.truncate("1h").alias("hour"))
+                  .agg(pl.len().cast(pl.Int64).alias("reports")))
+    return acc.result()
+
+
+def weather_hours(chunks: Iterable[Sequence[tuple]]) -> pl.DataFrame:
+    """
+    (city_id, hour, raining, rained, last_at) from streamed (city_id,
+    observed_at, is_raining) rows: raining is the hour's last reading,
+    rained whether any reading in it was rain.
+    """
+    acc = _HourlyAccumulator(
+        lambda df: df.group_by("city_id", "hour").agg(
+            pl.col("raining").sort_by("last_at").last(),
+            pl.col("rained").any(),
+            pl.col("last_at").max(),
+        ),
+        {"city_id": pl.Int64, "hour": _HOUR, "raining": pl.Boolean, "rained": pl.Boolean, "last_at": _HOUR},
+    )
+    for rows in chunks:
+        df = _as_utc(pl.DataFrame(rows, schema=["city_id", "observed_at", "is_raining"], orient="row"),
+                     "observed_at")
+        acc.add(df.group_by("city_id", pl.col("observed_at").dt.truncate("1h").alias("hour")).agg(
+            pl.col("is_raining").sort_by("observed_at").last().alias("raining"),
+            pl.col("is_raining").any().alias("rained"),
+            pl.col("observed_at").max().alias("last_at"),
+        ))
+    return acc.result()
+
+
+def hourly_context(reports: pl.DataFrame, weather: pl.DataFrame) -> pl.DataFrame:
+    """
+    One row per city and hour, from the first hour seen to a day after the
+    last, holding is_raining and WINDOW_FEATURES as of the start of that hour.
+    """
+    columns = {"city_id": pl.Int64, "hour": _HOUR, "is_raining": pl.Int8,
+               **{name: pl.Int64 for name in WINDOW_FEATURES}}
+    keys = pl.concat([reports.select("city_id", "hour"), weather.select("city_id", "hour")])
+    if keys.is_empty():
+        return pl.DataFrame(schema=columns)
+
+    # Carries on past the last record so the windows can run down to zero
+    grid = keys.group_by("city_id").agg(
+        pl.col("hour").min().alias("first"),
+        (pl.col("hour").max() + pl.duration(hours=max(REPORT_WINDOWS_H.values()))).alias("last"),
+    ).select(
+        "city_id", pl.datetime_ranges("first", "last", "1h").alias("hour")
+    ).explode("hour").with_columns(pl.col("hour").cast(_HOUR))
+
+    grid = (
+        grid.join(reports, on=["city_id", "hour"], how="left")
+            .join(weather.select("city_id", "hour", "raining", "rained"), on=["city_id", "hour"], how="left")
+            .sort("city_id", "hour")
+            .with_columns(pl.col("reports").fill_null(0), pl.col("rained").fill_null(False).cast(pl.Int64))
+    )
+    # shift(1): a row's windows cover the hours before it, not the hour itself
+    return grid.with_columns(
+        pl.col("raining").forward_fill(limit=RAIN_FILL_H).shift(1).over("city_id")
+          .fill_null(False).cast(pl.Int8).alias("is_raining"),
+        *[pl.col("reports").rolling_sum(hours, min_samples=1).shift(1).over("city_id").fill_null(0).alias(name)
+          for name, hours in REPORT_WINDOWS_H.items()],
+        pl.col("rained").rolling_sum(RAIN_WINDOW_H, min_samples=1).shift(1).over("city_id")
+          .fill_null(0).alias("rain_hours_6h"),
+    ).select(list(columns)).cast(columns)
+
+
+def outcome_features(rows: Sequence[tuple], context: pl.DataFrame, tz: str = "UTC") -> pl.DataFrame:
+    """
+    id, FEATURES, WINDOW_FEATURES and LABEL (all float32 but id) for a chunk
+    of stream_route_outcomes rows. hour_of_day is local time in `tz`, which
+    must be the API server's time zone.
+    """
+    df = _as_utc(pl.DataFrame(rows, schema=OUTCOME_COLUMNS, orient="row"), "started_at")
+    df = df.with_columns(pl.col("city_id").cast(pl.Int64), pl.col("started_at").dt.truncate("1h").alias("hour"))
+    return df.join(context, on=["city_id", "hour"], how="left").select(
+        pl.col("id"),
+        pl.col("static_hazard_score").fill_null(DEFAULT_ROAD_SCORE).cast(pl.Float32),
+        pl.col("active_reports").fill_null(0).cast(pl.Float32),
+        pl.col("is_raining").fill_null(0).cast(pl.Float32),
+        pl.col("started_at").dt.convert_time_zone(tz).dt.hour().cast(pl.Float32).alias("hour_of_day"),
+        *[pl.col(name).fill_null(0).cast(pl.Float32) for name in WINDOW_FEATURES],
+        (pl.col("actual_duration_s") > pl.col("expected_duration_s") * CONGESTION_RATIO)
+          .cast(pl.Float32).alias(LABEL),
+    )
+
+
+@dataclass
+class ShardSet:
+    train: List[str] = field(default_factory=list)
+    eval: List[str] = field(default_factory=list)
+    train_rows: int = 0
+    eval_rows: int = 0
+    positives: int = 0
+
+
+def write_shards(outcome_chunks: Iterable[Sequence[tuple]], context: pl.DataFrame, out_dir: str,
+                 tz: str = "UTC", eval_every: int = EVAL_EVERY) -> ShardSet:
+    """Builds features chunk by chunk and writes each as train-/eval-NNNNN.parquet."""
+    os.makedirs(out_dir, exist_ok=True)
+    shards = ShardSet()
+    for i, rows in enumerate(outcome_chunks):
+        df = outcome_features(rows, context, tz)
+        is_eval = (pl.col("id") % eval_every == 0) if eval_every else pl.lit(False)
+        for name, part in (("train", df.filter(~is_eval)), ("eval", df.filter(is_eval))):
+            if part.is_empty():
+                continue
+            path = os.path.join(out_dir, f"{name}-{i:05d}.parquet")
+            part.drop("id").write_parquet(path)
+            getattr(shards, name).append(path)
+            setattr(shards, f"{name}_rows", getattr(shards, f"{name}_rows") + len(part))
+        shards.positives += int(df[LABEL].sum())
+    return shards
+
+
+class ShardIter(xgboost.DataIter):
+    """Hands Parquet shards to XGBoost one at a time."""
+
+    def __init__(self, paths: Sequence[str], features: Sequence[str]):
+        self.paths = list(paths)
+        self.features = list(features)
+        self._next = 0
+        super().__init__()
+
+    def next(self, input_data) -> bool:
+        if self._next == len(self.paths):
+            return False
+        df = pl.read_parquet(self.paths[self._next], columns=self.features + [LABEL])
+        input_data(data=df.select(self.features).to_numpy(), label=df[LABEL].to_numpy(),
+                   feature_names=self.features)
+        self._next += 1
+        return True
+
+    def reset(self):
+        self._next = 0
+
+
+def train(shards: ShardSet, features: Sequence[str] = FEATURES, params: Optional[dict] = None,
+          num_boost_round: int = 300, early_stopping_rounds: Optional[int] = 20, verbose_eval=False):
+    """
+    Trains with the hist tree method on all cores. With eval shards, stops
+    once the eval logloss hasn't improved for early_stopping_rounds and keeps
+    only the trees up to the best round. Returns (booster, eval history).
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    dtrain = xgboost.QuantileDMatrix(ShardIter(shards.train, features),
+                                     max_bin=params["max_bin"], nthread=params["nthread"])
+    evals = []
+    if shards.eval:
+        deval = xgboost.QuantileDMatrix(ShardIter(shards.eval, features), ref=dtrain, nthread=params["nthread"])
+        evals = [(deval, "eval")]
+    else:
+        early_stopping_rounds = None
+
+    history: Dict[str, dict] = {}
+    booster = xgboost.train(params, dtrain, num_boost_round, evals=evals, evals_result=history,
+                            early_stopping_rounds=early_stopping_rounds, verbose_eval=verbose_eval)
+    if early_stopping_rounds and booster.best_iteration + 1 < booster.num_boosted_rounds():
+        booster = booster[:booster.best_iteration + 1]
+    return booster, history
+
+
+def save_artifact(booster: xgboost.Booster, out_root: str, metadata: dict) -> str:
+    """
+    Writes <out_root>/<version>/ with the model (pickle + native format) and
+    metadata.json. The version is the UTC time of the run. Returns the
+    directory.
+    """
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(out_root, version)
+    os.makedirs(path)
+    joblib.dump(booster, os.path.join(path, MODEL_FILE))
+    booster.save_model(os.path.join(path, NATIVE_MODEL_FILE))
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump({"version": version, "created_at": datetime.now(timezone.utc).isoformat(), **metadata},
+                  f, indent=2, default=str)
+    return path
+
+
+def publish(artifact_dir: str, target: str):
+    """Replaces the model file the API loads, if the artifact has the API's features."""
+    source = os.path.join(artifact_dir, MODEL_FILE)
+    CongestionModel(source)  # raises ValueError on a feature mismatch
+    tmp = target + ".tmp"
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
@@ -0,0 +1,44 @@
+# services/viewport.py
+# Map viewport helpers for the hazard endpoints: bbox parsing and the
+# zoom level -> clustering grid size mapping.
+
+from typing import NamedTuple, Optional
+
+MAX_ZOOM = 22
+
+# Clusters are roughly this many screen pixels apart (256 px web-mercator tiles)
+CLUSTER_CELL_PX = 64
+
+
+class BBox(NamedTuple):
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+
+
+def parse_bbox(value: Optional[str]) -> Optional[BBox]:
+    """
+    Parses "min_lon,min_lat,max_lon,max_lat" (the usual WMS/GeoJSON order).
+    Returns None for an empty value; raises ValueError if it's malformed.
+    """
+    if not value:
+        return None
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    try:
+        bbox = BBox(*(float(p) for p in parts))
+    except ValueError:
+        raise ValueError("bbox values must be numbers")
+    if not (-180 <= bbox.min_lon < bbox.max_lon <= 180):
+        raise ValueError("bbox longitudes must satisfy -180 <= min_lon < max_lon <= 180")
+    if not (-90 <= bbox.min_lat < bbox.max_lat <= 90):
+        raise ValueError("bbox latitudes must satisfy -90 <= min_lat < max_lat <= 90")
+    return bbox
+
+
+def cluster_cell_deg(zoom: int) -> float:
+    """Grid size in degrees so that cells are ~CLUSTER_CELL_PX wide at `zoom`."""
+    zoom = max(0, min(MAX_ZOOM, zoom))
+    return 360.0 / (2 ** zoom) * CLUSTER_CELL_PX / 256
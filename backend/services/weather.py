@@ -1,25 +1,27 @@
 # services/weather.py
 
 import os
-import requests
+import httpx
 from dotenv import load_dotenv
 
+from services import http_client, metrics
+from services.weather_cache import WeatherCache
+
 # Load the api key in secure way using the .env 
 load_dotenv()
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
 # This is the base URL for the weather API
-BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+BASE_URL = os.getenv("OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
+
+# Returned when there is no API key or the API can't be reached
+DEFAULT_WEATHER = {"is_raining": False, "temp": 25.0}
 
-def get_current_weather(lat, lon):
+async def fetch_current_weather(lat, lon):
     """
-    Fetches the current weather for a given location.
-    Includes timeout and retry logic.
+    Fetches the current weather for a given location straight from OpenWeather.
+    Includes timeout and retry logic. Returns None if every attempt failed.
     """
-    # If no API key, return safe defaults
-    if not API_KEY:
-        return {"is_raining": False, "temp": 25.0}
-
     params = {
         "lat": lat,
         "lon": lon,
@@ -28,8 +30,10 @@ def get_current_weather(lat, lon):
     }
 
     for attempt in range(2):
+        if attempt:
+            metrics.UPSTREAM_RETRIES.labels("weather").inc()
         try:
-            response = requests.get(BASE_URL, params=params, timeout=5)
+            response = await http_client.get(BASE_URL, params=params, timeout=5, service="weather")
             response.raise_for_status()
             data = response.json()
 
@@ -38,7 +42,27 @@ def get_current_weather(lat, lon):
                 temp = data["main"]["temp"]
                 is_raining = any(word in condition for word in ["rain", "drizzle", "thunder"])
                 return {"is_raining": is_raining, "temp": temp}
-        except requests.exceptions.RequestException:
+        except (httpx.HTTPError, ValueError):
             continue
 
-    return {"is_raining": False, "temp": 25.0}
+    return None
+
+# One upstream call per grid cell per TTL, shared by every route request
+weather_cache = WeatherCache(
+    fetch_current_weather,
+    resolution_deg=float(os.getenv("WEATHER_CELL_DEG", "0.1")),
+    ttl=float(os.getenv("WEATHER_TTL", "300")),
+    stale_ttl=float(os.getenv("WEATHER_STALE_TTL", "1800"))
+)
+metrics.watch_cache("weather", weather_cache.stats)
+
+async def get_current_weather(lat, lon):
+    """
+    Returns the current weather for a location, served from the grid-cell cache.
+    """
+    # If no API key, return safe defaults
+    if not API_KEY:
+        return dict(DEFAULT_WEATHER)
+
+    w = await weather_cache.get(lat, lon)
+    return w if w is not None else dict(DEFAULT_WEATHER)
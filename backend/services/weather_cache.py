@@ -0,0 +1,127 @@
+# services/weather_cache.py
+# Weather cache keyed by a rounded lat/lon grid cell.
+#
+# All of Delhi is only a handful of cells at the default 0.1 degree (~11 km)
+# resolution and conditions change every few minutes, so one upstream call per
+# cell per TTL is plenty:
+#
+#   - fresh entry (age < ttl)            -> served straight from memory
+#   - stale entry (ttl <= age < stale)   -> served immediately, refreshed in the background
+#   - missing / too old                  -> fetched, with concurrent callers for the
+#                                           same cell sharing ONE upstream request
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+
+@dataclass
+class WeatherEntry:
+    value: dict
+    fetched_at: float
+    # Bumped whenever the cached conditions actually change, so callers can
+    # tell if something derived from this cell's weather is still valid
+    epoch: int
+
+
+class WeatherCache:
+    def __init__(self, fetch: Callable[[float, float], Awaitable[Optional[dict]]],
+                 resolution_deg: float = 0.1, ttl: float = 300.0, stale_ttl: float = 1800.0,
+                 max_cells: int = 1024):
+        self.fetch = fetch
+        self.resolution_deg = resolution_deg
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_cells = max_cells
+        self._entries: Dict[Cell, WeatherEntry] = {}
+        self._inflight: Dict[Cell, asyncio.Task] = {}
+        self._last_epoch = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+
+    def cell(self, lat: float, lon: float) -> Cell:
+        return (round(lat / self.resolution_deg), round(lon / self.resolution_deg))
+
+    def cell_center(self, cell: Cell) -> Tuple[float, float]:
+        return (cell[0] * self.resolution_deg, cell[1] * self.resolution_deg)
+
+    def epoch(self, lat: float, lon: float) -> int:
+        entry = self._entries.get(self.cell(lat, lon))
+        return entry.epoch if entry else 0
+
+    async def get(self, lat: float, lon: float) -> Optional[dict]:
+        """
+        Returns cached/fetched weather for the cell containing (lat, lon),
+        or None if nothing is cached and the upstream call failed.
+        """
+        cell = self.cell(lat, lon)
+        entry = self._entries.get(cell)
+        age = time.monotonic() - entry.fetched_at if entry else None
+
+        if entry and age < self.ttl:
+            self.hits += 1
+            return entry.value
+        if entry and age < self.stale_ttl:
+            self.stale_hits += 1
+            self._refresh(cell)  # stale-while-revalidate, not awaited
+            return entry.value
+
+        self.misses += 1
+        # shield() so one caller being cancelled doesn't cancel the shared fetch
+        return await asyncio.shield(self._refresh(cell))
+
+    def _refresh(self, cell: Cell) -> asyncio.Task:
+        task = self._inflight.get(cell)
+        if task is None:
+            task = asyncio.create_task(self._fetch_cell(cell))
+            self._inflight[cell] = task
+            task.add_done_callback(lambda _t, c=cell: self._inflight.pop(c, None))
+        return task
+
+    async def _fetch_cell(self, cell: Cell) -> Optional[dict]:
+        lat, lon = self.cell_center(cell)
+        self.upstream_calls += 1
+        try:
+            value = await self.fetch(lat, lon)
+        except Exception as e:
+            logger.warning("Weather refresh failed for cell %s: %s", cell, e)
+            value = None
+
+        old = self._entries.get(cell)
+        if value is None:
+            # Keep serving whatever we had rather than caching a failure
+            return old.value if old else None
+
+        epoch = old.epoch if old else 0
+        if old is None or old.value != value:
+            # Epochs come from one counter so an evicted-and-refetched cell
+            # can never reuse an epoch number
+            self._last_epoch += 1
+            epoch = self._last_epoch
+        self._entries[cell] = WeatherEntry(value, time.monotonic(), epoch)
+        if len(self._entries) > self.max_cells:
+            oldest = min(self._entries, key=lambda c: self._entries[c].fetched_at)
+            del self._entries[oldest]
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "upstream_calls": self.upstream_calls,
+            "hit_ratio": ((self.hits + self.stale_hits) / lookups) if lookups else 0.0,
+        }
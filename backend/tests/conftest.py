@@ -0,0 +1,21 @@
+# tests/conftest.py
+
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND)
+
+
+@pytest.fixture
+def main_module(monkeypatch):
+    """The FastAPI app module, imported without a database."""
+    import models
+    # main creates tables and loads congestion_model.pkl (relative path) on import
+    monkeypatch.chdir(BACKEND)
+    with patch.object(models.Base.metadata, "create_all"):
+        import main
+    return main
@@ -0,0 +1,34 @@
+# tests/test_auth.py
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from auth import create_token, verify_token, remember_user, is_known_user
+
+
+def test_token_round_trip():
+    token = create_token(42)
+    assert verify_token(token) == 42
+
+
+def test_tampered_or_expired_tokens_are_rejected():
+    token = create_token(42)
+    user_id, expires, signature = token.split(".")
+
+    # Claiming another user id breaks the signature
+    assert verify_token(f"43.{expires}.{signature}") is None
+    # So does extending the expiry
+    assert verify_token(f"{user_id}.{int(expires) + 1}.{signature}") is None
+    assert verify_token(create_token(42, ttl=-1)) is None
+    assert verify_token("42") is None
+    assert verify_token("") is None
+    # Non-ASCII signatures are rejected, not a TypeError (500)
+    assert verify_token("1.99999999999.é") is None
+
+
+def test_known_user_cache():
+    assert not is_known_user(987654)
+    remember_user(987654)
+    assert is_known_user(987654)
@@ -0,0 +1,62 @@
+# tests/test_batch_stream.py
+
+import sys
+import os
+import asyncio
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def test_batch_lines_stream_before_the_batch_finishes(main_module, monkeypatch):
+    main = main_module
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def geocode(address):
+            if address == "slow":
+                await release.wait()
+            return None  # every pair ends as a 404 line, no DB or OSRM needed
+
+        monkeypatch.setattr(main.routing, "get_coords_from_address", geocode)
+
+        body = json.dumps({"pairs": [
+            {"start_address": "nowhere", "end_address": "x"},
+            {"start_address": "slow", "end_address": "x"},
+        ]}).encode()
+        sent = asyncio.Queue()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/route/predict-risk/batch",
+            "raw_path": b"/route/predict-risk/batch", "root_path": "", "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"accept-encoding", b"gzip, deflate")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        app_task = asyncio.create_task(main.app(scope, receive, sent.put))
+
+        start = await asyncio.wait_for(sent.get(), 5)
+        headers = dict(start["headers"])
+        assert b"content-encoding" not in headers
+        first = await asyncio.wait_for(sent.get(), 5)
+        # The slow pair is still geocoding, yet the first line is already out
+        assert not app_task.done()
+        assert json.loads(first["body"]) == {"index": 0, "status": 404, "detail": "Location not found: nowhere"}
+
+        release.set()
+        await asyncio.wait_for(app_task, 5)
+        rest = []
+        while not sent.empty():
+            rest.append(sent.get_nowait().get("body", b""))
+        assert json.loads(b"".join(rest))["index"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,80 @@
+# tests/test_bulk_reports.py
+
+import sys
+import os
+import json
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+import auth
+
+REPORT = {"report_type": "Pothole", "lat": 28.6139, "lon": 77.2090}
+
+
+def test_token_callers_file_only_as_themselves(main_module, monkeypatch):
+    inserted = []
+    monkeypatch.setattr(main_module.crud, "get_existing_user_ids", lambda db, ids: set(ids))
+    monkeypatch.setattr(main_module.crud, "create_reports_bulk",
+                        lambda db, reports, city_id: inserted.extend(reports) or list(range(len(reports))))
+
+    result = main_module.ingest_bulk_reports(MagicMock(), [REPORT, {**REPORT, "user_id": 99}], submitter_id=7)
+
+    assert [r.status for r in result.results] == ["created", "rejected"]
+    assert [r["user_id"] for r in inserted] == [7]
+
+
+def test_stale_cached_user_is_rejected_not_a_500(main_module, monkeypatch):
+    auth.remember_user(424242)  # cached, but the account is gone
+    calls = []
+
+    def create_reports_bulk(db, reports, city_id):
+        calls.append([r["user_id"] for r in reports])
+        if 424242 in calls[-1]:
+            raise IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        return list(range(len(reports)))
+
+    monkeypatch.setattr(main_module.crud, "get_existing_user_ids", lambda db, ids: set(ids) - {424242})
+    monkeypatch.setattr(main_module.crud, "create_reports_bulk", create_reports_bulk)
+
+    items = [{**REPORT, "user_id": 424242}, {**REPORT, "user_id": 1}]
+    result = main_module.ingest_bulk_reports(MagicMock(), items, submitter_id=None)
+
+    assert (result.created, result.rejected) == (1, 1)
+    assert result.results[0].detail == "User not found"
+    assert calls[-1] == [1] and not auth.is_known_user(424242)
+
+
+def test_bulk_endpoint_needs_credentials_and_caps_the_body(main_module, monkeypatch):
+    client = TestClient(main_module.app)
+    assert client.post("/report/bulk", json=[REPORT]).status_code == 401
+    assert client.post("/report/bulk", json=[REPORT], headers={"X-Fleet-Key": "guess"}).status_code == 401
+
+    token = auth.create_token(7)
+    body = (b'{"report_type": "Pothole", "lat": 28.6, "lon": 77.2}\n' * (main_module.MAX_BULK_REPORTS + 1))
+    response = client.post("/report/bulk", content=body, headers={
+        "Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"
+    })
+    assert response.status_code == 413
+
+
+def test_pretty_printed_json_array_is_not_capped_by_lines(main_module, monkeypatch):
+    monkeypatch.setattr(main_module.crud, "get_existing_user_ids", lambda db, ids: set(ids))
+    monkeypatch.setattr(main_module.crud, "create_reports_bulk",
+                        lambda db, reports, city_id: list(range(len(reports))))
+    main_module.app.dependency_overrides[main_module.get_db] = lambda: MagicMock()
+    try:
+        client = TestClient(main_module.app)
+        # ~5 lines per report, so well over MAX_BULK_REPORTS lines in total
+        body = json.dumps([REPORT] * 1000, indent=2).encode()
+        assert body.count(b"\n") > main_module.MAX_BULK_REPORTS
+        response = client.post("/report/bulk", content=body, headers={
+            "Authorization": f"Bearer {auth.create_token(7)}", "Content-Type": "application/json"
+        })
+    finally:
+        main_module.app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json()["created"] == 1000
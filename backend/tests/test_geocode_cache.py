@@ -0,0 +1,51 @@
+# tests/test_geocode_cache.py
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.cache import MISSING
+from services.geocode_cache import GeocodeCache, normalize_address
+
+
+def test_normalize_address_drops_city_suffix():
+    assert normalize_address("  Qutub   Minar , Delhi, India ") == "qutub minar"
+    assert normalize_address("Shahdara, New Delhi") == "shahdara"
+    assert normalize_address("Delhi") == "delhi"
+
+
+def test_memory_tier_lru_and_negative_results():
+    cache = GeocodeCache(max_size=2, db_path=None)
+    cache.set("Shahdara", (28.67, 77.29))
+    cache.set("Nowhere", None)
+    assert cache.get("shahdara, delhi") == (28.67, 77.29)
+    assert cache.get("nowhere") is None
+
+    # Third entry evicts the least recently used one ("shahdara")
+    cache.set("Qutub Minar", (28.52, 77.18))
+    assert cache.get("Shahdara") is MISSING
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "geocode.db")
+    GeocodeCache(db_path=path).set("India Gate", (28.61, 77.23))
+
+    # A second process/worker sees the entry through the SQLite file
+    other = GeocodeCache(db_path=path)
+    assert other.get("india gate") == (28.61, 77.23)
+    assert other.stats()["disk_hits"] == 1
+    # ...and then serves it from memory
+    assert other.get("india gate") == (28.61, 77.23)
+    assert other.stats()["disk_hits"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = GeocodeCache(ttl=-1, negative_ttl=-1, db_path=str(tmp_path / "g.db"))
+    cache.set("Red Fort", (28.66, 77.24))
+    assert cache.get("Red Fort") is MISSING
@@ -0,0 +1,36 @@
+# tests/test_geometry.py
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.geometry import simplify, encode_polyline, decode_polyline, display_geometry
+from services.spatial_index import _segment_distance_m
+
+
+def test_polyline_matches_reference_encoding():
+    # Example from Google's polyline format documentation, as [lon, lat]
+    coords = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    encoded = encode_polyline(coords)
+    assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline(encoded) == coords
+
+
+def test_simplify_keeps_shape_within_tolerance():
+    # A straight run with a 1 m wobble, then a right-angle turn
+    line = [[77.2 + i * 1e-4, 28.6 + (1e-5 if i % 2 else 0)] for i in range(50)]
+    line += [[line[-1][0], 28.6 + i * 1e-4] for i in range(1, 50)]
+    simplified = simplify(line, tolerance_m=5)
+    assert simplified[0] == line[0] and simplified[-1] == line[-1]
+    assert len(simplified) == 3
+    # Every original point is still within the tolerance of the simplified line
+    for lon, lat in line:
+        assert min(_segment_distance_m(lat, lon, a, b) for a, b in zip(simplified, simplified[1:])) <= 5
+
+
+def test_display_geometry_formats():
+    geom = {"type": "LineString", "coordinates": [[77.2, 28.6], [77.2005, 28.6], [77.201, 28.6]]}
+    assert display_geometry(geom, "geojson") is geom
+    assert display_geometry(geom, "simplified")["coordinates"] == [[77.2, 28.6], [77.201, 28.6]]
+    assert decode_polyline(display_geometry(geom, "polyline")) == [[77.2, 28.6], [77.201, 28.6]]
@@ -0,0 +1,91 @@
+# tests/test_hashing.py
+
+import sys
+import os
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from passlib.context import CryptContext
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from hashing import Hash, HashingPool, HashingBusy
+
+# Cheap scrypt settings so the tests run fast
+FAST_CONTEXT = CryptContext(schemes=["scrypt"], scrypt__rounds=4)
+
+
+def test_hash_and_verify_on_pool():
+
+    @patch('hashing.pwd_context', FAST_CONTEXT)
+    def run_test():
+        async def flow():
+            hashed = await Hash.get_password_hash_async("s3cret")
+            return hashed, await Hash.verify_and_update_async("s3cret", hashed), \
+                await Hash.verify_and_update_async("wrong", hashed)
+
+        hashed, (ok, new_hash), (bad, _) = asyncio.run(flow())
+        assert hashed.startswith("$scrypt$")
+        assert ok and new_hash is None
+        assert not bad
+
+    run_test()
+
+
+def test_rehash_when_cost_settings_change():
+    old_hash = CryptContext(schemes=["scrypt"], scrypt__rounds=3).hash("s3cret")
+
+    @patch('hashing.pwd_context', FAST_CONTEXT)
+    def run_test():
+        ok, new_hash = asyncio.run(Hash.verify_and_update_async("s3cret", old_hash))
+        assert ok
+        assert new_hash is not None and new_hash != old_hash
+        assert FAST_CONTEXT.verify("s3cret", new_hash)
+
+    run_test()
+
+
+def test_pool_rejects_work_when_full():
+    pool = HashingPool(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def flow():
+        blocked = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HashingBusy):
+            await pool.run(lambda: None)
+        release.set()
+        await blocked
+
+    asyncio.run(flow())
+    stats = pool.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 1
+    assert stats["pending"] == 0
+
+
+def test_cancelled_queued_calls_give_their_slot_back():
+    pool = HashingPool(workers=1, max_pending=3)
+    release = threading.Event()
+
+    async def flow():
+        blocked = asyncio.ensure_future(pool.run(release.wait, 5))
+        queued = [asyncio.ensure_future(pool.run(lambda: None)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        # e.g. the clients disconnected while their hashes were still waiting
+        for task in queued:
+            task.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+        assert pool.stats()["pending"] == 1
+
+        release.set()
+        await blocked
+        assert await asyncio.gather(*(pool.run(lambda: "ok") for _ in range(3))) == ["ok"] * 3
+
+    asyncio.run(flow())
+    stats = pool.stats()
+    assert stats["pending"] == 0
+    assert stats["rejected"] == 0
+    assert stats["completed"] == 4
@@ -0,0 +1,137 @@
+# tests/test_hazard_events.py
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import hazard_events
+from services.hazard_events import HazardBroadcaster
+from services.spatial_index import IndexedReport, LiveReportIndex
+
+LATER = time.time() + 600
+
+
+def report(report_id, city_id=1):
+    return IndexedReport(report_id, city_id, "Pothole", 28.6139, 77.2090, LATER)
+
+
+def parse_sse(message):
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def with_ids(event):
+    name, hazards = event
+    return name, [h["id"] for h in hazards]
+
+
+def test_events_published_from_a_worker_thread_reach_subscribers():
+    async def scenario():
+        broadcaster = HazardBroadcaster()
+        broadcaster.attach(asyncio.get_running_loop())
+        queue = broadcaster.subscribe()
+
+        # crud writes run in FastAPI's threadpool, not on the loop
+        worker = threading.Thread(target=broadcaster.on_index_change, args=("add", [report(1)]))
+        worker.start()
+        worker.join()
+        message = await asyncio.wait_for(queue.get(), 5)
+        assert parse_sse(message) == ("add", [{"id": 1, "report_type": "Pothole", "lat": 28.6139, "lon": 77.2090}])
+
+        await asyncio.to_thread(broadcaster.on_index_change, "expire", [report(1), report(2)])
+        assert parse_sse(await asyncio.wait_for(queue.get(), 5)) == ("expire", [1, 2])
+        assert broadcaster.events_published == 2
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_is_dropped_without_blocking_the_others(monkeypatch):
+    monkeypatch.setattr(hazard_events, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def scenario():
+        broadcaster = HazardBroadcaster()
+        broadcaster.attach(asyncio.get_running_loop())
+        slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+
+        received = []
+        for i in range(3):
+            broadcaster.on_index_change("add", [report(i)])
+            await asyncio.sleep(0)  # let call_soon_threadsafe run _publish
+            received.append(parse_sse(fast.get_nowait())[1][0]["id"])
+
+        assert received == [0, 1, 2]
+        assert broadcaster.subscriber_count == 1 and broadcaster.subscribers_dropped == 1
+        # The oldest buffered event makes room for the None that ends its stream
+        assert parse_sse(slow.get_nowait())[1][0]["id"] == 1
+        assert slow.get_nowait() is None
+
+    asyncio.run(scenario())
+
+
+def test_only_the_broadcasters_city_is_streamed():
+    async def scenario():
+        broadcaster = HazardBroadcaster(city_id=1)
+        broadcaster.attach(asyncio.get_running_loop())
+        queue = broadcaster.subscribe()
+
+        broadcaster.on_index_change("add", [report(1, city_id=2)])
+        broadcaster.on_index_change("add", [report(2, city_id=2), report(3, city_id=1)])
+        await asyncio.sleep(0)
+
+        assert [h["id"] for h in parse_sse(queue.get_nowait())[1]] == [3]
+        assert queue.empty() and broadcaster.events_published == 1
+
+    asyncio.run(scenario())
+
+
+def test_stream_sends_snapshot_then_changes(main_module, monkeypatch):
+    main = main_module
+    index = LiveReportIndex()
+    broadcaster = HazardBroadcaster(city_id=1)
+    index.add_listener(broadcaster.on_index_change)
+    monkeypatch.setattr(main.spatial_index, "live_reports", index)
+    monkeypatch.setattr(main, "hazard_broadcaster", broadcaster)
+    index.add(1, 1, "Accident", 28.61, 77.20, LATER)
+    index.add(2, 2, "Pothole", 28.62, 77.21, LATER)  # other city, not in the snapshot
+
+    async def scenario():
+        broadcaster.attach(asyncio.get_running_loop())
+        sent = asyncio.Queue()
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/hazards/stream",
+            "raw_path": b"/hazards/stream", "root_path": "", "query_string": b"",
+            "headers": [(b"accept-encoding", b"gzip")],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        app_task = asyncio.create_task(main.app(scope, receive, sent.put))
+
+        async def next_event():
+            while True:
+                message = await asyncio.wait_for(sent.get(), 5)
+                if message.get("body"):
+                    return parse_sse(message["body"].decode())
+
+        start = await asyncio.wait_for(sent.get(), 5)
+        assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+        assert with_ids(await next_event()) == ("snapshot", [1])
+
+        await asyncio.to_thread(index.add, 3, 1, "Traffic", 28.63, 77.22, LATER)
+        assert with_ids(await next_event()) == ("add", [3])
+        await asyncio.to_thread(index.remove, 1)
+        assert await next_event() == ("expire", [1])
+
+        broadcaster.close()
+        await asyncio.wait_for(app_task, 5)
+        assert broadcaster.subscriber_count == 0
+
+    asyncio.run(scenario())
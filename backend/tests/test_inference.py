@@ -0,0 +1,46 @@
+# tests/test_inference.py
+
+import sys
+import os
+import asyncio
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.inference import CongestionModel, MicroBatcher, FEATURES, feature_matrix
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'congestion_model.pkl')
+
+ROWS = [
+    (8, 3, 1, 17),
+    (2, 0, 0, 10),
+    (5, 1, 1, 16),
+    (1, 0, 0, 11),
+    (9, 4, 1, 18),
+]
+
+
+def test_numpy_path_matches_dataframe_path():
+    import joblib
+    sklearn_model = joblib.load(MODEL_PATH)
+    expected = sklearn_model.predict(pd.DataFrame(ROWS, columns=list(FEATURES)))
+
+    model = CongestionModel(MODEL_PATH)
+    assert list(model.predict(feature_matrix(ROWS))) == list(expected)
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    model = CongestionModel(MODEL_PATH)
+    batcher = MicroBatcher(model, max_batch=64, max_wait_ms=20)
+
+    async def many_requests():
+        results = await asyncio.gather(*[batcher.predict(row) for row in ROWS * 4])
+        await batcher.close()
+        return results
+
+    results = asyncio.run(many_requests())
+    assert results == list(model.predict(feature_matrix(ROWS * 4)))
+    # 20 concurrent single-row requests -> one predict call
+    assert batcher.batches == 1
+    assert batcher.rows == 20
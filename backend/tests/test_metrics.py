@@ -0,0 +1,62 @@
+# tests/test_metrics.py
+
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi import FastAPI
+
+from services import metrics
+from services.cache import TTLCache
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    hist = metrics.Histogram("t_seconds", "test", ["service"], buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.labels("osrm").observe(value)
+
+    text = registry.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{service="osrm",le="0.1"} 2' in text  # le is inclusive
+    assert 't_seconds_bucket{service="osrm",le="1"} 3' in text
+    assert 't_seconds_bucket{service="osrm",le="+Inf"} 4' in text
+    assert 't_seconds_count{service="osrm"} 4' in text
+
+
+def test_cache_stats_are_read_at_scrape_time():
+    cache = TTLCache()
+    metrics.watch_cache("test_cache", cache.stats)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    text = metrics.render()
+    assert 'traffix_cache_hits_total{cache="test_cache"} 1' in text
+    assert 'traffix_cache_misses_total{cache="test_cache"} 1' in text
+    assert 'traffix_cache_hit_ratio{cache="test_cache"} 0.5' in text
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/items/1")
+            await client.get("/items/2")
+            await client.get("/nope")
+
+    asyncio.run(main())
+    text = metrics.render()
+    assert 'traffix_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in text
+    assert 'route="unmatched",status="404"' in text
+    assert "traffix_http_requests_in_flight 0" in text
@@ -0,0 +1,75 @@
+# tests/test_pothole_aggregation.py
+
+import sys
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.dialects import postgresql
+
+import crud
+
+
+def test_aggregation_advances_watermark_per_batch():
+    batches = [
+        SimpleNamespace(last_id=500, detections=500, snapped=480, segments=40),
+        SimpleNamespace(last_id=730, detections=200, snapped=190, segments=25),
+        SimpleNamespace(last_id=None, detections=0, snapped=0, segments=0),
+    ]
+    watermark = [0]
+    executed = []
+
+    def execute(statement, params=None):
+        executed.append((statement, params))
+        result = MagicMock()
+        if statement is crud._LOCK_WATERMARK_SQL:
+            result.scalar.return_value = watermark[0]
+        elif statement is crud._AGGREGATE_POTHOLES_SQL:
+            assert params["after_id"] == watermark[0]
+            result.one.return_value = batches.pop(0)
+        elif statement is crud._SET_WATERMARK_SQL:
+            watermark[0] = params["last_id"]
+        return result
+
+    db = MagicMock()
+    db.execute.side_effect = execute
+    totals = crud.aggregate_pothole_detections(db, batch_size=500, now=datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+    assert totals == {"detections": 700, "snapped": 670, "segments": 65}
+    assert watermark[0] == 730
+    # claim + 3 x (lock, aggregate) + 2 watermark updates, each batch committed
+    assert len(executed) == 9 and db.commit.call_count == 4
+
+
+def test_detection_insert_skips_known_sources():
+    db = MagicMock()
+    db.execute.return_value.rowcount = 1
+    crud.create_pothole_detections_bulk(db, [{
+        "lat": 28.6139, "lon": 77.2090, "confidence": 0.8,
+        "detected_at": datetime(2025, 1, 1, tzinfo=timezone.utc), "source_key": "survey/a.jpg#0"
+    }], city_id=1)
+
+    sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (source_key) DO NOTHING" in sql
+
+
+def test_imports_of_same_layout_archives_get_distinct_keys(tmp_path, monkeypatch):
+    import aggregate_potholes
+    from services import pothole_batch
+
+    keys = []
+    monkeypatch.setattr(crud, "create_pothole_detections_bulk",
+                        lambda db, rows, city_id: keys.extend(r["source_key"] for r in rows) or len(rows))
+    row = ("day1/img001.png", 28.6, 77.2, "pothole", 0.8, 1.0, 2.0, 3.0, 4.0)
+    for survey in ("survey_a", "survey_b"):
+        os.makedirs(tmp_path / survey)
+        pothole_batch.write_part([row], str(tmp_path / survey / "part-0.csv"), "csv")
+        # A shard without detections: header only
+        pothole_batch.write_part([], str(tmp_path / survey / "part-1.csv"), "csv")
+        aggregate_potholes.import_detections(MagicMock(), str(tmp_path / survey),
+                                             datetime(2025, 1, 1, tzinfo=timezone.utc), 1, survey)
+
+    assert keys == ["survey_a/day1/img001.png#1,2,3,4", "survey_b/day1/img001.png#1,2,3,4"]
@@ -0,0 +1,102 @@
+# tests/test_pothole_batch.py
+
+import sys
+import os
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+import polars as pl
+
+from services import pothole_batch
+from services.pothole_detection import Detection
+
+
+class BrightDetector:
+    """Finds one pothole in every bright image."""
+
+    def detect(self, images):
+        return [[Detection("pothole", 0.8, (1.0, 2.0, 3.0, 4.0))] if img.mean() > 128 else [] for img in images]
+
+
+def add_image(root, geotags, name, bright, lat):
+    os.makedirs(os.path.join(root, os.path.dirname(name)), exist_ok=True)
+    cv2.imwrite(os.path.join(root, name), np.full((32, 32, 3), 255 if bright else 0, dtype=np.uint8))
+    geotags[name] = (lat, 77.2)
+
+
+def make_archive(root, count):
+    root = str(root)
+    geotags = {}
+    for i in range(count):
+        add_image(root, geotags, os.path.join("day1", f"img{i:03d}.png"), i % 2, round(28.6 + i * 0.001, 3))
+    return root, geotags
+
+
+def run(config, shard_size=4):
+    return pothole_batch.run_batch(config, workers=0, shard_size=shard_size, progress=lambda msg: None)
+
+
+def config_for(root, geotags, **kwargs):
+    return pothole_batch.BatchConfig(root=root, out_dir=os.path.join(root, "out"), geotags=geotags,
+                                     detector_factory=BrightDetector, batch_size=3, **kwargs)
+
+
+def test_resumes_from_manifest(tmp_path):
+    root, geotags = make_archive(tmp_path, 10)
+    config = config_for(root, geotags)
+
+    first = run(config)
+    assert first.completed_shards == first.shards > 1
+    assert (first.images, first.detections) == (10, 5)
+
+    # Lose the last shard's checkpoint, as if the run had died writing it
+    manifest = os.path.join(config.out_dir, pothole_batch.MANIFEST_NAME)
+    lines = open(manifest).read().splitlines()
+    lost = json.loads(lines[-1])
+    with open(manifest, "w") as f:
+        f.write("\n".join(lines[:-1]) + "\n" + lines[-1][:10])  # torn last line
+
+    second = run(config)
+    assert (second.skipped_shards, second.completed_shards, second.images) == (first.shards - 1, 1, lost["images"])
+    # The torn text stays on a line of its own and the shard is now recorded
+    third = run(config)
+    assert (third.skipped_shards, third.completed_shards) == (first.shards, 0)
+    entries = [line for line in open(manifest).read().splitlines() if line != lines[-1][:10]]
+    assert all(json.loads(line)["shard"] for line in entries)
+
+    frame = pl.read_parquet(os.path.join(config.out_dir, "*.parquet"))
+    assert frame.height == 5
+    assert frame.columns == list(pothole_batch.SCHEMA)
+    assert sorted(frame["image"].to_list())[0] == os.path.join("day1", "img001.png")
+
+
+def test_added_file_reruns_only_its_shard(tmp_path):
+    root, geotags = make_archive(tmp_path, 40)
+    config = config_for(root, geotags)
+    first = run(config)
+
+    add_image(root, geotags, os.path.join("day1", "img000a.png"), True, 28.7)
+    second = run(config)
+    assert second.completed_shards == 1 and second.stale_shards == 1
+    assert second.skipped_shards == second.shards - 1
+    # The replaced shard's old part file is gone, so nothing is counted twice
+    frame = pl.read_parquet(os.path.join(config.out_dir, "*.parquet"))
+    assert frame.height == first.detections + 1
+
+
+def test_process_pool_writes_csv_parts(tmp_path):
+    root, geotags = make_archive(tmp_path, 8)
+    config = config_for(root, geotags, output_format="csv")
+
+    summary = pothole_batch.run_batch(config, workers=2, shard_size=3, progress=lambda msg: None)
+    assert summary.completed_shards == summary.shards > 1
+    assert (summary.failed_shards, summary.detections) == (0, 4)
+
+    entries = [json.loads(line) for line in open(os.path.join(config.out_dir, pothole_batch.MANIFEST_NAME))]
+    assert sum(e["images"] for e in entries) == 8
+    frame = pl.concat([pl.read_csv(os.path.join(config.out_dir, e["part"]), schema=pothole_batch.SCHEMA)
+                       for e in entries])
+    assert sorted(frame["lat"].to_list()) == [28.601, 28.603, 28.605, 28.607]
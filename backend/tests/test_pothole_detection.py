@@ -0,0 +1,110 @@
+# tests/test_pothole_detection.py
+
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+from services.pothole_detection import (
+    ChangeFilter, Detection, DetectionPipeline, Frame, GpsTrack, LocationDeduper, iter_video, sample_frames
+)
+
+POTHOLE = Detection("pothole", 0.9, (0.0, 0.0, 10.0, 10.0))
+
+
+class FakeDetector:
+    """Finds a pothole in every frame whose first pixel is non-zero."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def detect(self, images):
+        self.batch_sizes.append(len(images))
+        return [[POTHOLE] if img[0, 0, 0] else [] for img in images]
+
+
+def frame(has_pothole, lat=28.6139, lon=77.2090):
+    image = np.full((4, 4, 3), 255 if has_pothole else 0, dtype=np.uint8)
+    return Frame(image, "test", lat, lon)
+
+
+def test_deduper_rejects_points_within_radius():
+    dedupe = LocationDeduper(radius_m=15)
+    assert dedupe.accept(28.6139, 77.2090)
+    assert not dedupe.accept(28.6140, 77.2091)   # ~15 m away at most
+    assert dedupe.accept(28.6149, 77.2090)       # ~110 m north
+
+
+def test_pipeline_batches_dedupes_and_flushes_reports():
+    written = []
+    detector = FakeDetector()
+    pipeline = DetectionPipeline(detector, written.append, user_id=7, batch_size=4, queue_size=2, flush_every=2)
+    frames = [
+        frame(True),
+        frame(True, lat=28.61391),            # same pothole, next frame
+        frame(False),
+        frame(True, lat=28.6200),
+        frame(True, lat=None, lon=None),      # no GPS fix
+        frame(True, lat=28.6300),
+    ]
+    stats = pipeline.run(iter(frames))
+
+    assert stats.frames == 6
+    assert stats.reports == 3 and stats.duplicates == 1 and stats.unlocated == 1
+    assert max(detector.batch_sizes) <= 4
+    reports = [r for chunk in written for r in chunk]
+    assert [r["lat"] for r in reports] == [28.6139, 28.6200, 28.6300]
+    assert all(r["user_id"] == 7 and r["report_type"] == "Pothole" for r in reports)
+
+
+def test_pipeline_raises_reader_errors():
+    def broken():
+        yield frame(True)
+        raise IOError("truncated video")
+
+    pipeline = DetectionPipeline(FakeDetector(), lambda reports: None, user_id=1)
+    try:
+        pipeline.run(broken())
+    except IOError as e:
+        assert "truncated" in str(e)
+    else:
+        raise AssertionError("reader error was swallowed")
+
+
+def test_track_interpolates_within_range_only():
+    track = GpsTrack([0.0, 10.0], [28.0, 29.0], [77.0, 77.5])
+    assert track.at(5.0) == (28.5, 77.25)
+    assert track.at(11.0) == (None, None)
+
+
+def test_change_filter_skips_near_duplicates():
+    rng = np.random.default_rng(0)
+    scene = rng.integers(0, 255, (360, 640, 3), dtype=np.uint8)
+    noisy = np.clip(scene.astype(np.int16) + rng.integers(-3, 4, scene.shape), 0, 255).astype(np.uint8)
+    other = rng.integers(0, 255, (360, 640, 3), dtype=np.uint8)
+
+    change = ChangeFilter(max_distance=6)
+    assert change.changed(scene)
+    assert not change.changed(noisy)
+    assert change.changed(other)
+    assert (change.seen, change.passed) == (3, 2)
+
+
+def test_video_is_sampled_filtered_and_downsized():
+    path = os.path.join(tempfile.mkdtemp(), "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (320, 240))
+    rng = np.random.default_rng(1)
+    still = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    for i in range(30):
+        # First half: a still picture; second half: a new picture every frame
+        writer.write(still if i < 15 else rng.integers(0, 255, (240, 320, 3), dtype=np.uint8))
+    writer.release()
+
+    frames = list(sample_frames(iter_video(path, sample_fps=10), ChangeFilter(), max_side=160))
+    # 10 of 30 frames sampled; of the 5 still ones only the first is kept
+    assert [f.source.split("#")[1] for f in frames] == ["0", "15", "18", "21", "24", "27"]
+    assert frames[0].image.shape == (120, 160, 3)
@@ -0,0 +1,46 @@
+# tests/test_route_cache.py
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.route_cache import RouteResponseCache
+from services.spatial_index import LiveReportIndex
+
+START = {"lat": 28.6139, "lon": 77.2000}
+END = {"lat": 28.6139, "lon": 77.2110}
+ROUTE = [[77.2000, 28.6139], [77.2100, 28.6139], [77.2110, 28.6139]]
+FAR = 10**10  # expiry far in the future
+
+
+def cached_route():
+    index = LiveReportIndex()
+    index.add(1, 1, "Accident", 28.6149, 77.2050, FAR)
+    cache = RouteResponseCache(index)
+    key = cache.key(START, END, hour=8)
+    cache.set(key, b"{}", index.stamp([ROUTE]), weather_epoch=3)
+    return index, cache, key
+
+
+def test_nearby_endpoints_share_an_entry():
+    _, cache, key = cached_route()
+    nudged = {"lat": START["lat"] + 0.0001, "lon": START["lon"]}
+    assert cache.key(nudged, END, hour=8) == key
+    assert cache.key(START, END, hour=9) != key
+    assert cache.get(key).body == b"{}"
+
+
+def test_report_near_route_invalidates():
+    index, cache, key = cached_route()
+    # Somewhere else entirely: entry survives
+    index.add(2, 1, "Pothole", 19.07, 72.87, FAR)
+    assert cache.get(key) is not None
+    index.add(3, 1, "Pothole", 28.6140, 77.2030, FAR)
+    assert cache.get(key) is None
+
+
+def test_expiry_near_route_invalidates():
+    index, cache, key = cached_route()
+    index.remove(1)
+    assert cache.get(key) is None
@@ -2,13 +2,17 @@
 
 import sys
 import os
-from unittest.mock import patch
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import httpx
 
 # Add the parent 'backend' folder to the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import your real routing service
-from services.routing import get_route_from_osrm
+from services.routing import get_routes_from_osrm, geocode_with_retry, BASE_URL
+from services.geocode_cache import GeocodeCache
 
 # This is a fake "canned response" from the OSRM API
 FAKE_ROUTE_RESPONSE = {
@@ -29,25 +33,50 @@ FAKE_ROUTE_RESPONSE = {
     ]
 }
 
+def fake_response(payload, status_code=200):
+    return httpx.Response(status_code, json=payload, request=httpx.Request("GET", BASE_URL))
+
 # This test checks if your function correctly pulls data from the OSRM response
 def test_routing_on_good_response():
     
-    # Patch 'requests.get' inside the routing.py file
-    @patch('services.routing.requests.get')
+    # Patch the shared HTTP client's 'get' used by routing.py
+    @patch('services.routing.http_client.get', new_callable=AsyncMock)
     def run_test(mock_get):
         
-        # Tell our fake 'requests.get' to return our canned route
-        mock_get.return_value.json.return_value = FAKE_ROUTE_RESPONSE
-        mock_get.return_value.raise_for_status.return_value = None
+        # Tell our fake 'get' to return our canned route
+        mock_get.return_value = fake_response(FAKE_ROUTE_RESPONSE)
 
         # Call your *real* routing function
-        route = get_route_from_osrm(40.75, -73.98, 40.76, -73.99)
+        routes = asyncio.run(get_routes_from_osrm(40.75, -73.98, 40.76, -73.99))
 
         # Check if your function correctly "cherry-picked" the data
-        assert route is not None
-        assert route["distance"] == 1000.0
-        assert route["duration"] == 120.0
-        assert route["steps"][0] == "Turn left onto Main St"
+        assert routes is not None
+        assert len(routes) == 1
+        assert routes[0]["distance"] == 1000.0
+        assert routes[0]["duration"] == 120.0
+        assert routes[0]["geometry"]["type"] == "LineString"
 
     # Run the test
-    run_test()
\ No newline at end of file
+    run_test()
+
+# This test checks that rate limiting is retried and the answer gets cached
+def test_geocode_retries_then_caches():
+
+    @patch('services.routing.geocode_cache', GeocodeCache(db_path=None))
+    @patch('services.routing.asyncio.sleep', new_callable=AsyncMock)
+    @patch('services.routing.http_client.get', new_callable=AsyncMock)
+    def run_test(mock_get, mock_sleep):
+        mock_get.side_effect = [
+            fake_response({}, status_code=429),
+            fake_response([{"lat": "28.5245", "lon": "77.1855"}]),
+        ]
+
+        coords = asyncio.run(geocode_with_retry("Qutub Minar"))
+        assert coords == (28.5245, 77.1855)
+        assert mock_sleep.await_count == 1
+
+        # Second lookup is served from the cache
+        assert asyncio.run(geocode_with_retry("qutub minar, Delhi")) == (28.5245, 77.1855)
+        assert mock_get.await_count == 2
+
+    run_test()
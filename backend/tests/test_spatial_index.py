@@ -0,0 +1,79 @@
+# tests/test_spatial_index.py
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.spatial_index import LiveReportIndex
+
+# A ~1.1 km east-west line through central Delhi, as GeoJSON [lon, lat] pairs
+ROUTE = [[77.2000, 28.6139], [77.2100, 28.6139], [77.2110, 28.6139]]
+NOW = 1_700_000_000.0
+
+
+def make_index():
+    index = LiveReportIndex()
+    # ~110 m north of the route
+    index.add(1, 1, "Accident", 28.6149, 77.2050, NOW + 600)
+    # ~1.1 km north of the route
+    index.add(2, 1, "Pothole", 28.6239, 77.2050, NOW + 600)
+    # On the route, but already expired
+    index.add(3, 1, "Traffic", 28.6139, 77.2020, NOW - 1)
+    # On the route, but in another city
+    index.add(4, 2, "Construction", 28.6139, 77.2080, NOW + 600)
+    return index
+
+
+def test_counts_only_live_reports_near_route():
+    index = make_index()
+    assert index.count_near_line(ROUTE, 300, city_id=1, now=NOW) == 1
+    assert index.count_near_line(ROUTE, 300, now=NOW) == 2
+
+
+def test_expired_reports_are_dropped_from_heap():
+    index = make_index()
+    dropped = index.expire(now=NOW + 601)
+    assert sorted(r.id for r in dropped) == [1, 2, 3, 4]
+    assert len(index) == 0
+
+
+def test_readding_a_report_moves_it():
+    index = make_index()
+    index.add(2, 1, "Pothole", 28.6140, 77.2060, NOW + 600)
+    assert index.count_near_line(ROUTE, 300, city_id=1, now=NOW) == 2
+    # The old heap entry for id 2 must not drop the re-added report early
+    index.remove(1)
+    assert [r.id for r in index.reports_near_line(ROUTE, 300, city_id=1, now=NOW)] == [2]
+
+
+def test_listeners_see_adds_expiries_and_reload_diff():
+    index = make_index()
+    events = []
+    index.add_listener(lambda kind, reps: events.append((kind, sorted(r.id for r in reps))))
+
+    index.expire(now=NOW)
+    # Same position, new expiry: not a visible change
+    index.add(1, 1, "Accident", 28.6149, 77.2050, NOW + 900)
+    index.add(5, 1, "Pothole", 28.6140, 77.2030, NOW + 600)
+    assert events == [("expire", [3]), ("add", [5])]
+
+    events.clear()
+    index.load([r for r in index.reports_near_line(ROUTE, 5000, now=NOW) if r.id != 2])
+    assert events == [("expire", [2])]
+
+
+def test_reload_keeps_reports_added_after_the_snapshot():
+    index = make_index()
+    since = index.begin_load()
+    snapshot = index.reports_near_line(ROUTE, 5000, now=NOW)   # the "DB read"
+    index.add(6, 1, "Accident", 28.6140, 77.2040, NOW + 600)   # filed meanwhile
+    events = []
+    index.add_listener(lambda kind, reps: events.append((kind, sorted(r.id for r in reps))))
+
+    index.load(snapshot, since=since)
+    assert events == []
+    assert 6 in {r.id for r in index.reports_near_line(ROUTE, 300, now=NOW)}
+    # The next reload no longer needs to special-case it
+    index.load([r for r in index.reports_near_line(ROUTE, 5000, now=NOW) if r.id != 6], since=index.begin_load())
+    assert events == [("expire", [6])]
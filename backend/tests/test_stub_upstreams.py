@@ -0,0 +1,65 @@
+# tests/test_stub_upstreams.py
+# The load-test stub must speak the same formats our upstream clients parse.
+
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stub_upstreams import create_app, ServiceConfig, SERVICES
+from services import routing, weather
+from services.geocode_cache import GeocodeCache
+
+
+def run_against_stub(coro_fn, **service_settings):
+    """Runs coro_fn() with services' HTTP calls answered in-process by the stub."""
+    config = {name: ServiceConfig(**service_settings) for name in SERVICES}
+    app = create_app(config, seed=1)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport) as client:
+            async def stub_get(url, params=None, timeout=None, headers=None, service="other"):
+                return await client.get(url, params=params)
+
+            with patch('services.http_client.get', stub_get):
+                return await coro_fn()
+
+    return asyncio.run(main())
+
+
+@patch('services.routing.NOMINATIM_URL', "http://stub/search")
+@patch('services.routing.BASE_URL', "http://stub/route/v1/driving/")
+@patch('services.routing.geocode_cache', GeocodeCache(db_path=None))
+def test_routing_client_parses_stub_responses():
+    async def scenario():
+        start = await routing.get_coords_from_address("Shahdara")
+        end = await routing.get_coords_from_address("Qutub Minar")
+        routes = await routing.get_routes_from_osrm(start["lat"], start["lon"], end["lat"], end["lon"])
+        return start, end, routes
+
+    start, end, routes = run_against_stub(scenario)
+    # Deterministic: the same address always lands on the same point
+    assert start == run_against_stub(lambda: routing.get_coords_from_address("Shahdara"))
+    assert start != end
+    assert len(routes) == 3
+    first, last = routes[0]["geometry"]["coordinates"][0], routes[0]["geometry"]["coordinates"][-1]
+    assert (first[1], first[0]) == (round(start["lat"], 6), round(start["lon"], 6))
+    assert (last[1], last[0]) == (round(end["lat"], 6), round(end["lon"], 6))
+    assert all(r["distance"] > 0 and r["duration"] > 0 for r in routes)
+
+
+@patch('services.weather.BASE_URL', "http://stub/data/2.5/weather")
+def test_weather_client_parses_stub_response():
+    w = run_against_stub(lambda: weather.fetch_current_weather(28.61, 77.20))
+    assert set(w) == {"is_raining", "temp"}
+
+
+@patch('services.routing.BASE_URL', "http://stub/route/v1/driving/")
+def test_injected_failures_surface_as_upstream_errors():
+    routes = run_against_stub(lambda: routing.get_routes_from_osrm(28.6, 77.2, 28.7, 77.3), error_rate=1.0)
+    assert routes is None
@@ -0,0 +1,67 @@
+# tests/test_training.py
+
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from services import training
+from services.inference import CongestionModel, feature_matrix
+
+T0 = datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc)
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def test_windows_only_look_at_earlier_hours():
+    # Streamed in two chunks, one with a non-UTC offset
+    reports = training.report_hours([
+        [(1, T0 + timedelta(minutes=5)), (1, T0 + timedelta(minutes=50))],
+        [(1, (T0 + timedelta(hours=2, minutes=1)).astimezone(IST))],
+    ])
+    weather = training.weather_hours([[(1, T0, False), (1, T0 + timedelta(minutes=40), True)]])
+    context = training.hourly_context(reports, weather)
+
+    trips = [
+        (1, 1, T0 + timedelta(minutes=30), 7, 2, 600.0, 900.0),           # same hour as the reports
+        (2, 1, T0 + timedelta(hours=1, minutes=30), None, 0, 600.0, 610.0),
+        (3, 1, T0 + timedelta(hours=5), 3, 0, 600.0, 600.0),              # rain reading too old
+    ]
+    df = training.outcome_features(trips, context, tz="Asia/Kolkata")
+
+    assert df["reports_1h"].to_list() == [0, 2, 0]
+    assert df["reports_6h"].to_list() == [0, 2, 3]
+    assert df["is_raining"].to_list() == [0, 1, 0]
+    assert df["static_hazard_score"].to_list() == [7, training.DEFAULT_ROAD_SCORE, 3]
+    assert df["hour_of_day"].to_list() == [16, 17, 20]   # 10:30 UTC is 16:00 in Delhi
+    assert df[training.LABEL].to_list() == [1, 0, 0]
+
+
+def test_trains_from_shards_into_a_loadable_model(tmp_path):
+    rng = np.random.default_rng(0)
+
+    def outcome_chunks(n, size):
+        for start in range(0, n, size):
+            rows = []
+            for i in range(start, min(n, start + size)):
+                score, count = int(rng.integers(0, 11)), int(rng.integers(0, 5))
+                slowdown = 1 + 0.05 * score + 0.1 * count + rng.normal(0, 0.1)
+                rows.append((i, 1, T0 + timedelta(minutes=int(rng.integers(0, 60 * 24 * 7))),
+                             score, count, 600.0, 600.0 * slowdown))
+            yield rows
+
+    context = training.hourly_context(training.report_hours([]), training.weather_hours([]))
+    work_dir = str(tmp_path)
+    shards = training.write_shards(outcome_chunks(5000, 1000), context, work_dir)
+    assert len(shards.train) == 5 and shards.train_rows + shards.eval_rows == 5000
+
+    booster, history = training.train(shards, num_boost_round=50)
+    assert history["eval"]["auc"][-1] > 0.8
+
+    artifact = training.save_artifact(booster, os.path.join(work_dir, "artifacts"), {"train_rows": shards.train_rows})
+    target = os.path.join(work_dir, "congestion_model.pkl")
+    training.publish(artifact, target)
+    model = CongestionModel(target)
+    assert list(model.predict(feature_matrix([(10, 4, 0, 18), (0, 0, 0, 3)]))) == [1, 0]
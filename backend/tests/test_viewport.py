@@ -0,0 +1,28 @@
+# tests/test_viewport.py
+
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.viewport import BBox, parse_bbox, cluster_cell_deg
+
+
+def test_parse_bbox():
+    assert parse_bbox("77.1,28.5,77.3,28.7") == BBox(77.1, 28.5, 77.3, 28.7)
+    assert parse_bbox(None) is None
+    assert parse_bbox("") is None
+
+
+@pytest.mark.parametrize("value", ["77.1,28.5,77.3", "a,b,c,d", "77.3,28.5,77.1,28.7", "77.1,28.5,77.3,95"])
+def test_parse_bbox_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_cluster_cells_halve_per_zoom_level():
+    assert cluster_cell_deg(12) == pytest.approx(2 * cluster_cell_deg(13))
+    # Out-of-range zooms are clamped
+    assert cluster_cell_deg(-3) == cluster_cell_deg(0)
@@ -2,14 +2,18 @@
 
 import sys
 import os
-from unittest.mock import patch
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import httpx
 
 # This is a bit of a hack to help Python find your 'services' folder
 # It adds the parent 'backend' folder to the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Now we can import your real weather service
-from services.weather import get_current_weather
+from services.weather import get_current_weather, weather_cache, BASE_URL
+from services.weather_cache import WeatherCache
 
 # This is our fake "canned response" from the weather API
 # It pretends to be a rainy day
@@ -22,21 +26,28 @@ FAKE_WEATHER_RESPONSE = {
     }
 }
 
+def fake_response(payload, status_code=200):
+    return httpx.Response(status_code, json=payload, request=httpx.Request("GET", BASE_URL))
+
 # This test checks if your function works on a rainy day
 def test_weather_on_rainy_day():
     
-    # This is the magic: "patch" finds the 'requests.get' function
+    # This is the magic: "patch" finds the shared HTTP client's 'get'
     # and temporarily replaces it with our fake data.
     # It stops our test from *actually* calling the internet.
-    @patch('services.weather.requests.get')
+    # A dummy API key makes sure the real request path is used.
+    @patch('services.weather.API_KEY', 'test-key')
+    @patch('services.weather.http_client.get', new_callable=AsyncMock)
     def run_test(mock_get):
         
-        # Tell our fake 'requests.get' to return our canned response
-        mock_get.return_value.json.return_value = FAKE_WEATHER_RESPONSE
-        mock_get.return_value.raise_for_status.return_value = None # Pretend it was a 200 OK
+        # Start from an empty cache so the fake API is really called
+        weather_cache.clear()
+
+        # Tell our fake 'get' to return our canned response
+        mock_get.return_value = fake_response(FAKE_WEATHER_RESPONSE)
 
         # Now, call your *real* function
-        weather = get_current_weather(lat=28.61, lon=77.23)
+        weather = asyncio.run(get_current_weather(lat=28.61, lon=77.23))
 
         # Check the results
         # Did your function correctly identify the rain?
@@ -45,4 +56,67 @@ def test_weather_on_rainy_day():
         assert weather["temp"] == 15.0
 
     # This line just runs the test function we defined above
-    run_test()
\ No newline at end of file
+    run_test()
+
+# This test checks that upstream errors fall back to the safe defaults
+def test_weather_falls_back_on_errors():
+
+    @patch('services.weather.API_KEY', 'test-key')
+    @patch('services.weather.http_client.get', new_callable=AsyncMock)
+    def run_test(mock_get):
+        weather_cache.clear()
+        mock_get.side_effect = httpx.ConnectTimeout("timed out")
+
+        weather = asyncio.run(get_current_weather(lat=28.61, lon=77.23))
+
+        assert weather == {"is_raining": False, "temp": 25.0}
+        # One try plus one retry
+        assert mock_get.await_count == 2
+
+    run_test()
+
+# This test checks that a burst of requests in one grid cell makes ONE upstream call
+def test_weather_cache_coalesces_requests_per_cell():
+    calls = []
+
+    async def fake_fetch(lat, lon):
+        calls.append((lat, lon))
+        await asyncio.sleep(0.01)
+        return {"is_raining": False, "temp": 30.0}
+
+    async def burst():
+        cache = WeatherCache(fake_fetch, resolution_deg=0.1, ttl=60)
+        # 500 requests spread over the same ~11 km cell
+        results = await asyncio.gather(*[
+            cache.get(28.61 + i * 0.00001, 77.23) for i in range(500)
+        ])
+        # A later request is a plain cache hit
+        await cache.get(28.62, 77.21)
+        return cache, results
+
+    cache, results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert all(r["temp"] == 30.0 for r in results)
+    assert cache.stats()["hits"] == 1
+
+# This test checks stale entries are served at once and refreshed in the background
+def test_weather_cache_serves_stale_while_revalidating():
+    temps = iter([30.0, 18.0])
+
+    async def fake_fetch(lat, lon):
+        return {"is_raining": False, "temp": next(temps)}
+
+    async def run():
+        cache = WeatherCache(fake_fetch, ttl=0, stale_ttl=60)
+        first = await cache.get(28.61, 77.23)
+        epoch = cache.epoch(28.61, 77.23)
+        stale = await cache.get(28.61, 77.23)
+        await asyncio.sleep(0.01)  # let the background refresh finish
+        return first, stale, epoch, cache
+
+    first, stale, epoch, cache = asyncio.run(run())
+    assert first["temp"] == 30.0
+    assert stale["temp"] == 30.0
+    assert cache.stats()["stale_hits"] == 1
+    # The refresh changed the conditions, so the cell's epoch moved on
+    assert cache.epoch(28.61, 77.23) > epoch
@@ -1,47 +1,117 @@
 # train_model.py
-# This script trains our statring prediction model.
-
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from xgboost import XGBClassifier
-import joblib # for saving the model
-
-# We are using a small, sample dataset to build the first version
-# of our model. This simulates real-world data patterns.
-# 'congestion_risk' is our target (1 = Yes, 0 = No)
-sample_training_data = {
-    'static_hazard_score': [8, 2, 5, 7, 1, 9, 3, 6], # manual road score (0-10)
-    'active_reports':      [3, 0, 1, 2, 0, 4, 1, 2], # num of live reports
-    'is_raining':          [1, 0, 1, 0, 0, 1, 1, 0], # 1 = Yes, 0 = No
-    'hour_of_day':         [17, 10, 16, 8, 11, 18, 9, 14], # 5pm, 10am, etc.
-    'congestion_risk':     [1, 0, 1, 0, 0, 1, 1, 0] # Did it get congested?
-}
-
-print("Loading sample training data...")
-df = pd.DataFrame(sample_training_data)
-
-# Define our features (X) and the target (y)
-features = ['static_hazard_score', 'active_reports', 'is_raining', 'hour_of_day']
-target = 'congestion_risk'
-
-X = df[features]
-y = df[target]
-
-# Create the XGBoost model
-model = XGBClassifier(
-    use_label_encoder=False, 
-    eval_metric='logloss',
-    n_estimators=50, # small and fast
-    random_state=42
-)
-
-# Train the model
-print("Training the initial congestion model...")
-model.fit(X, y)
-
-# Save the trained model to a .pkl file
-# This is the file our backend will load.
-model_filename = 'congestion_model.pkl'
-joblib.dump(model, model_filename)
-
-print(f"Success! Model was trained and saved as '{model_filename}'")
\ No newline at end of file
+# Trains the congestion model from history in Postgres: finished trips in
+# 'route_outcomes' (the label), 'reports' + 'reports_archive' and
+# 'weather_observations'. Writes a versioned artifact directory
+# (<out>/<UTC timestamp>/ with the model and metadata.json):
+#
+#   python train_model.py --since 2024-01-01 --out model_artifacts
+#   python train_model.py --since 2024-01-01 --publish congestion_model.pkl
+#
+# Rows are streamed in chunks and features written to Parquet shards under
+# --work-dir, so memory use doesn't grow with history (see
+# services/training.py). --publish replaces the model the API loads.
+# --window-features adds the windowed report/rain aggregates; such a model
+# is for offline comparison only, the API computes the base four features.
+# --timezone must be the API server's local time (it uses datetime.now().hour).
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import xgboost
+
+import crud
+from database import SessionLocal
+from services import training
+from services.inference import FEATURES
+
+
+def parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the congestion model from report and trip history")
+    parser.add_argument("--since", type=parse_date, help="first trip start (ISO date), default: all history")
+    parser.add_argument("--until", type=parse_date, help="trips starting before this (ISO date)")
+    parser.add_argument("--out", default="model_artifacts", help="artifact root directory")
+    parser.add_argument("--publish", help="also copy the model here, e.g. congestion_model.pkl")
+    parser.add_argument("--work-dir", help="where feature shards go (default: a temp dir, removed afterwards)")
+    parser.add_argument("--chunk-size", type=int, default=crud.TRAINING_CHUNK, help="rows per server-side fetch")
+    parser.add_argument("--timezone", default=os.getenv("TZ", "UTC"), help="zone for hour_of_day")
+    parser.add_argument("--window-features", action="store_true", help="also train on the windowed aggregates")
+    parser.add_argument("--eval-every", type=int, default=training.EVAL_EVERY,
+                        help="every n-th trip id is held out for evaluation (0: none)")
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--early-stopping", type=int, default=20, help="rounds without eval improvement")
+    parser.add_argument("--max-depth", type=int, default=training.DEFAULT_PARAMS["max_depth"])
+    parser.add_argument("--eta", type=float, default=training.DEFAULT_PARAMS["eta"])
+    parser.add_argument("--threads", type=int, default=training.DEFAULT_PARAMS["nthread"])
+    args = parser.parse_args()
+
+    features = list(FEATURES) + (list(training.WINDOW_FEATURES) if args.window_features else [])
+    params = {"max_depth": args.max_depth, "eta": args.eta, "nthread": args.threads}
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="traffix-train-")
+    # Windows at the start of the range look back this far
+    context_since = args.since - timedelta(hours=max(training.REPORT_WINDOWS_H.values())) if args.since else None
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        reports = training.report_hours(
+            crud.stream_report_history(db, context_since, args.until, args.chunk_size))
+        weather = training.weather_hours(
+            crud.stream_weather_observations(db, context_since, args.until, args.chunk_size))
+        context = training.hourly_context(reports, weather)
+        print(f"Hourly context: {len(context)} city-hours ({time.perf_counter() - started:.1f}s)")
+
+        shards = training.write_shards(
+            crud.stream_route_outcomes(db, args.since, args.until, args.chunk_size),
+            context, work_dir, tz=args.timezone, eval_every=args.eval_every
+        )
+    finally:
+        db.close()
+    print(f"Features: {shards.train_rows} train / {shards.eval_rows} eval row(s), "
+          f"{shards.positives} congested ({time.perf_counter() - started:.1f}s)")
+
+    try:
+        if not shards.train_rows:
+            parser.error("no finished trips in route_outcomes for this range")
+        fit_started = time.perf_counter()
+        booster, history = training.train(shards, features, params, num_boost_round=args.rounds,
+                                          early_stopping_rounds=args.early_stopping, verbose_eval=25)
+        fit_seconds = time.perf_counter() - fit_started
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    evaluation = {metric: values[-1] for metric, values in history.get("eval", {}).items()}
+    artifact = training.save_artifact(booster, args.out, {
+        "features": features,
+        "label": f"actual_duration_s > {training.CONGESTION_RATIO} * expected_duration_s",
+        "params": {**training.DEFAULT_PARAMS, **params},
+        "boosted_rounds": booster.num_boosted_rounds(),
+        "train_rows": shards.train_rows,
+        "eval_rows": shards.eval_rows,
+        "positives": shards.positives,
+        "eval": evaluation,
+        "since": args.since,
+        "until": args.until,
+        "timezone": args.timezone,
+        "xgboost_version": xgboost.__version__,
+        "fit_seconds": round(fit_seconds, 1),
+    })
+    print(f"Model: {booster.num_boosted_rounds()} rounds in {fit_seconds:.1f}s, eval {evaluation}")
+    print(f"Saved {artifact}")
+
+    if args.publish:
+        training.publish(artifact, args.publish)
+        print(f"Published to {args.publish}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+-- 001_report_indexes_and_archive.sql
+-- Brings an existing database up to schema.sql: GiST + composite indexes and
+-- the 'reports_archive' table used by archive_reports.py.
+--
+-- CREATE INDEX CONCURRENTLY doesn't lock writes but can't run inside a
+-- transaction, so apply with autocommit, e.g.
+--   psql -d traffix_db -f database/migrations/001_report_indexes_and_archive.sql
+
+CREATE TABLE IF NOT EXISTS reports_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    city_id INTEGER,
+    location GEOGRAPHY(POINT, 4326),
+    report_type VARCHAR(50) NOT NULL,
+    created_at TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_road_segments_path ON road_segments USING GIST (path);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_flood_hotspots_location ON flood_hotspots USING GIST (location);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_location ON reports USING GIST (location);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_city_expires ON reports (city_id, expires_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_expires_at ON reports (expires_at);
+
+-- one-off catch-up of the history that has piled up so far
+-- (afterwards archive_reports.py keeps it trimmed in small batches)
+WITH moved AS (
+    DELETE FROM reports
+    WHERE expires_at < NOW() - INTERVAL '1 hour'
+    RETURNING id, user_id, city_id, location, report_type, created_at, expires_at
+)
+INSERT INTO reports_archive (id, user_id, city_id, location, report_type, created_at, expires_at)
+SELECT id, user_id, city_id, location, report_type, created_at, expires_at FROM moved;
+
+ANALYZE reports;
@@ -0,0 +1,34 @@
+-- 002_pothole_detections.sql
+-- Tables for aggregate_potholes.py: raw pothole detections, per-segment
+-- decayed severity, and the job watermark.
+--
+-- Apply with autocommit (CREATE INDEX CONCURRENTLY), e.g.
+--   psql -d traffix_db -f database/migrations/002_pothole_detections.sql
+
+CREATE TABLE IF NOT EXISTS pothole_detections (
+    id BIGSERIAL PRIMARY KEY,
+    city_id INTEGER REFERENCES cities(id),
+    location GEOGRAPHY(POINT, 4326),
+    confidence DOUBLE PRECISION NOT NULL,
+    detected_at TIMESTAMPTZ NOT NULL,
+    source_key VARCHAR(512) UNIQUE,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    segment_id INTEGER REFERENCES road_segments(id)
+);
+
+CREATE TABLE IF NOT EXISTS segment_hazard_stats (
+    segment_id INTEGER PRIMARY KEY REFERENCES road_segments(id),
+    detection_count INTEGER NOT NULL DEFAULT 0,
+    severity DOUBLE PRECISION NOT NULL DEFAULT 0,
+    severity_at TIMESTAMPTZ NOT NULL,
+    base_score SMALLINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS job_watermarks (
+    job VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pothole_detections_location ON pothole_detections USING GIST (location);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_segment_hazard_stats_severity_at ON segment_hazard_stats (severity_at);
@@ -0,0 +1,27 @@
+-- 003_training_history.sql
+-- History tables read by train_model.py: weather readings and route
+-- outcomes (the congestion label).
+--
+-- Apply with autocommit (CREATE INDEX CONCURRENTLY), e.g.
+--   psql -d traffix_db -f database/migrations/003_training_history.sql
+
+CREATE TABLE IF NOT EXISTS weather_observations (
+    id BIGSERIAL PRIMARY KEY,
+    city_id INTEGER REFERENCES cities(id),
+    observed_at TIMESTAMPTZ NOT NULL,
+    is_raining BOOLEAN NOT NULL,
+    temp DOUBLE PRECISION
+);
+
+CREATE TABLE IF NOT EXISTS route_outcomes (
+    id BIGSERIAL PRIMARY KEY,
+    city_id INTEGER REFERENCES cities(id),
+    started_at TIMESTAMPTZ NOT NULL,
+    static_hazard_score SMALLINT,
+    active_reports INTEGER,
+    expected_duration_s DOUBLE PRECISION,
+    actual_duration_s DOUBLE PRECISION
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_weather_observations_observed_at ON weather_observations (observed_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_route_outcomes_started_at ON route_outcomes (started_at);
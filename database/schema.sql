@@ -14,7 +14,7 @@ CREATE TABLE users (
     id SERIAL PRIMARY KEY,
     email VARCHAR(255) NOT NULL UNIQUE,
     password_hash VARCHAR(255) NOT NULL, -- stores hashed password
-    created_at TIMESTAMT_PZ DEFAULT NOW()
+    created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 -- 'road_segments' table
@@ -46,4 +46,94 @@ CREATE TABLE reports (
     report_type VARCHAR(50) NOT NULL, -- "Construction", "Accident", etc.
     created_at TIMESTAMPTZ DEFAULT NOW(),
     expires_at TIMESTAMPTZ -- so reports can disappear after a few hours
-);
\ No newline at end of file
+);
+
+-- 'reports_archive' table
+-- expired reports moved out of 'reports' in bulk (see archive_reports.py),
+-- so the live table stays small no matter how much history piles up
+CREATE TABLE reports_archive (
+    id INTEGER PRIMARY KEY, -- same id the report had in 'reports'
+    user_id INTEGER,
+    city_id INTEGER,
+    location GEOGRAPHY(POINT, 4326),
+    report_type VARCHAR(50) NOT NULL,
+    created_at TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 'weather_observations' table
+-- weather readings kept as training history (train_model.py)
+CREATE TABLE weather_observations (
+    id BIGSERIAL PRIMARY KEY,
+    city_id INTEGER REFERENCES cities(id),
+    observed_at TIMESTAMPTZ NOT NULL,
+    is_raining BOOLEAN NOT NULL,
+    temp DOUBLE PRECISION
+);
+
+-- 'route_outcomes' table
+-- predicted routes and how long the trips really took; the training label.
+-- Feature columns hold the values used at prediction time.
+CREATE TABLE route_outcomes (
+    id BIGSERIAL PRIMARY KEY,
+    city_id INTEGER REFERENCES cities(id),
+    started_at TIMESTAMPTZ NOT NULL,
+    static_hazard_score SMALLINT, -- route's length-weighted segment score
+    active_reports INTEGER, -- live reports along the route
+    expected_duration_s DOUBLE PRECISION, -- OSRM estimate
+    actual_duration_s DOUBLE PRECISION -- NULL until the trip is reported back
+);
+
+-- 'pothole_detections' table
+-- raw model detections (detect_potholes.py, aggregate_potholes.py --import);
+-- aggregate_potholes.py folds them into road_segments.static_hazard_score
+CREATE TABLE pothole_detections (
+    id BIGSERIAL PRIMARY KEY,
+    city_id INTEGER REFERENCES cities(id),
+    location GEOGRAPHY(POINT, 4326),
+    confidence DOUBLE PRECISION NOT NULL,
+    detected_at TIMESTAMPTZ NOT NULL,
+    source_key VARCHAR(512) UNIQUE, -- image / video frame it came from
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    segment_id INTEGER REFERENCES road_segments(id) -- nearest segment, set by the aggregation
+);
+
+-- 'segment_hazard_stats' table
+-- running decayed pothole severity per road segment
+CREATE TABLE segment_hazard_stats (
+    segment_id INTEGER PRIMARY KEY REFERENCES road_segments(id),
+    detection_count INTEGER NOT NULL DEFAULT 0,
+    severity DOUBLE PRECISION NOT NULL DEFAULT 0,
+    severity_at TIMESTAMPTZ NOT NULL,
+    base_score SMALLINT NOT NULL DEFAULT 0 -- manual score before any detections
+);
+
+-- 'job_watermarks' table
+-- last processed row id of incremental jobs
+CREATE TABLE job_watermarks (
+    job VARCHAR(100) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+
+-- indexes
+-- GiST indexes make ST_DWithin / bbox searches index scans instead of full scans.
+-- Names match the ones GeoAlchemy2 uses when the backend runs create_all().
+CREATE INDEX idx_road_segments_path ON road_segments USING GIST (path);
+CREATE INDEX idx_flood_hotspots_location ON flood_hotspots USING GIST (location);
+CREATE INDEX idx_reports_location ON reports USING GIST (location);
+CREATE INDEX idx_pothole_detections_location ON pothole_detections USING GIST (location);
+
+-- live report lookups filter on city + expiry
+CREATE INDEX idx_reports_city_expires ON reports (city_id, expires_at);
+-- archive_reports.py picks expired rows across all cities, oldest first
+CREATE INDEX idx_reports_expires_at ON reports (expires_at);
+
+-- the pothole decay sweep only visits segments not refreshed recently
+CREATE INDEX idx_segment_hazard_stats_severity_at ON segment_hazard_stats (severity_at);
+
+-- training reads history by time range
+CREATE INDEX idx_weather_observations_observed_at ON weather_observations (observed_at);
+CREATE INDEX idx_route_outcomes_started_at ON route_outcomes (started_at);
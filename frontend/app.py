@@ -5,44 +5,143 @@ import folium
 from streamlit_folium import st_folium
 import requests
 import re
+import json
+import threading
+import time
 
 st.set_page_config(layout="wide")
 BACKEND_URL = "http://127.0.0.1:8000"
+# Below this zoom the map asks the backend for hazard clusters instead of points
+CLUSTER_BELOW_ZOOM = 14
 
 # -------------------------
 # API Functions
 # -------------------------
+class HazardFeed:
+    """Keeps a live copy of the hazards from the backend's /hazards/stream (SSE)."""
+    def __init__(self):
+        self.hazards = {}
+        self.synced = False
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                with requests.get(f"{BACKEND_URL}/hazards/stream", stream=True,
+                                  timeout=(6, 60)) as r:
+                    r.raise_for_status()
+                    event = None
+                    for line in r.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:") and event:
+                            self._apply(event, json.loads(line[5:]))
+            except:
+                pass
+            # Connection lost: fall back to polling until the next snapshot
+            self.synced = False
+            time.sleep(3)
+
+    def _apply(self, event, data):
+        with self.lock:
+            if event == "snapshot":
+                self.hazards = {h["id"]: h for h in data}
+                self.synced = True
+            elif event == "add":
+                for h in data: self.hazards[h["id"]] = h
+            elif event == "expire":
+                for i in data: self.hazards.pop(i, None)
+
+    def get(self):
+        with self.lock:
+            return list(self.hazards.values())
+
+@st.cache_resource
+def hazard_feed():
+    return HazardFeed()
+
+@st.cache_data(ttl=10)
+def poll_live_hazards(bbox=None):
+    try:
+        params = {"bbox": ",".join(map(str, bbox))} if bbox else None
+        r = requests.get(f"{BACKEND_URL}/hazards/live", params=params, timeout=6)
+        r.raise_for_status()
+        return r.json()
+    except:
+        return []
+
+def in_bbox(h, bbox):
+    return bbox[0] <= h["lon"] <= bbox[2] and bbox[1] <= h["lat"] <= bbox[3]
+
+def get_live_hazards(bbox=None):
+    feed = hazard_feed()
+    if feed.synced:
+        hazards = feed.get()
+        return [h for h in hazards if in_bbox(h, bbox)] if bbox else hazards
+    return poll_live_hazards(bbox)
+
 @st.cache_data(ttl=10)
-def get_live_hazards():
+def get_hazard_clusters(bbox, zoom):
     try:
-        r = requests.get(f"{BACKEND_URL}/hazards/live", timeout=6)
+        params = {"zoom": zoom}
+        if bbox: params["bbox"] = ",".join(map(str, bbox))
+        r = requests.get(f"{BACKEND_URL}/hazards/live/clusters", params=params, timeout=6)
         r.raise_for_status()
         return r.json()
     except:
         return []
 
 def clear_hazards_cache():
-    try: get_live_hazards.clear()
+    try:
+        poll_live_hazards.clear()
+        get_hazard_clusters.clear()
     except: pass
 
-def submit_fast_report(report_type, lat, lon, user_id):
+def submit_fast_report(report_type, lat, lon, token):
     try:
-        r = requests.post(f"{BACKEND_URL}/report/fast?user_id={user_id}",
+        r = requests.post(f"{BACKEND_URL}/report/fast",
                           json={"report_type":report_type,"lat":lat,"lon":lon},
+                          headers={"Authorization": f"Bearer {token}"},
                           timeout=8)
         r.raise_for_status()
         return True
     except:
         return False
 
+def decode_polyline(encoded, precision=5):
+    """Encoded polyline -> GeoJSON [lon, lat] pairs (see backend services/geometry.py)."""
+    coords, index, lat, lon = [], 0, 0, 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20: break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]; lon += deltas[1]
+        coords.append([lon / 10**precision, lat / 10**precision])
+    return coords
+
 def get_routes(start_address, end_address):
     try:
+        # polyline: simplified for display, a fraction of the GeoJSON size
         r = requests.post(f"{BACKEND_URL}/route/predict-risk",
                           json={"start_address": start_address,
-                                "end_address": end_address},
+                                "end_address": end_address,
+                                "geometry_format": "polyline"},
                           timeout=12)
         r.raise_for_status()
-        return r.json()
+        data = r.json()
+        for route in [data.get("original_route"), data.get("alternative_route")] + data.get("more_routes", []):
+            if route and isinstance(route.get("geometry"), str):
+                route["geometry"] = {"type": "LineString",
+                                     "coordinates": decode_polyline(route["geometry"])}
+        return data
     except:
         return None
 
@@ -52,7 +151,7 @@ def login_api(email, pw):
                           json={"email":email,"password":pw},
                           timeout=6)
         if r.status_code == 200:
-            return r.json().get("token")
+            return r.json()
     except:
         pass
     return None
@@ -167,17 +266,28 @@ def render_map_and_analysis():
     center = st.session_state.get("map_center",[28.61,77.20])
     google="https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}"
 
-    m=folium.Map(location=center,zoom_start=12,tiles=None)
+    m=folium.Map(location=center,zoom_start=st.session_state.get("map_zoom",12),tiles=None)
     folium.TileLayer(tiles=google,attr="Google",control=False).add_to(m)
 
-    # live hazards
-    for h in get_live_hazards():
-        try:
-            folium.Marker([h["lat"],h["lon"]],
-                          popup=h["report_type"],
-                          icon=hazard_icon(h["report_type"])
-                          ).add_to(m)
-        except: pass
+    # live hazards: only what the last map view showed; clustered when zoomed out
+    bbox=st.session_state.get("map_bbox")
+    zoom=st.session_state.get("map_zoom",12)
+    if zoom < CLUSTER_BELOW_ZOOM:
+        for c in get_hazard_clusters(bbox, zoom):
+            try:
+                folium.CircleMarker([c["lat"],c["lon"]],
+                                    radius=min(8+c["count"],30),
+                                    color="#d9534f",fill=True,fill_opacity=0.6,
+                                    tooltip=f'{c["count"]} hazards').add_to(m)
+            except: pass
+    else:
+        for h in get_live_hazards(bbox):
+            try:
+                folium.Marker([h["lat"],h["lon"]],
+                              popup=h["report_type"],
+                              icon=hazard_icon(h["report_type"])
+                              ).add_to(m)
+            except: pass
 
     # routes
     rinfo=st.session_state.get("route_info")
@@ -209,7 +319,7 @@ def render_map_and_analysis():
         else:
             c = map_data["last_clicked"]
             ok = submit_fast_report(st.session_state["selected_hazard"],
-                                    c["lat"], c["lng"], st.session_state["user_id"])
+                                    c["lat"], c["lng"], st.session_state["token"])
             if ok:
                 clear_hazards_cache()
                 st.success("Hazard reported.")
@@ -218,6 +328,18 @@ def render_map_and_analysis():
         st.session_state.pop("selected_hazard",None)
         st.rerun()
 
+    # remember the view so the next run only fetches what is visible
+    if map_data and map_data.get("bounds") and map_data["bounds"].get("_southWest"):
+        sw, ne = map_data["bounds"]["_southWest"], map_data["bounds"]["_northEast"]
+        if sw.get("lat") is not None and ne.get("lat") is not None:
+            view = ((round(sw["lng"],3), round(sw["lat"],3), round(ne["lng"],3), round(ne["lat"],3)),
+                    map_data.get("zoom") or zoom)
+            if view != (bbox, zoom):
+                st.session_state["map_bbox"], st.session_state["map_zoom"] = view
+                if map_data.get("center"):
+                    st.session_state["map_center"] = [map_data["center"]["lat"], map_data["center"]["lng"]]
+                st.rerun()
+
     st.markdown("---")
     live=len(get_live_hazards())
     st.write(f"Live hazards: **{live}**")
@@ -254,10 +376,11 @@ def page_login():
         email=st.text_input("Email")
         pw=st.text_input("Password",type="password")
         if st.form_submit_button("Login"):
-            token=login_api(email,pw)
-            if token:
+            session=login_api(email,pw)
+            if session:
                 st.session_state["logged_in"]=True
-                st.session_state["user_id"]=token
+                st.session_state["user_id"]=session["user_id"]
+                st.session_state["token"]=session["token"]
                 st.session_state["user_email"]=email
                 st.session_state["page"]="main"; st.rerun()
             else:
@@ -273,10 +396,11 @@ def page_signup():
         if st.form_submit_button("Create Account"):
             if p1!=p2: st.error("Mismatch")
             else:
-                if signup_api(email,p1):
-                    token=login_api(email,p1)
+                session=signup_api(email,p1) and login_api(email,p1)
+                if session:
                     st.session_state["logged_in"]=True
-                    st.session_state["user_id"]=token
+                    st.session_state["user_id"]=session["user_id"]
+                    st.session_state["token"]=session["token"]
                     st.session_state["user_email"]=email
                     st.session_state["page"]="main"; st.rerun()
                 else: